@@ -0,0 +1,61 @@
+"""
+Throughput of POST /transactions/batch against one POST /transactions per bill.
+
+Drives the app in-process with FastAPI's TestClient (requires httpx). Run from
+the repository root:
+    python -m benchmarks.batch_benchmark
+"""
+
+import argparse
+import time
+from fastapi.testclient import TestClient
+from main import app, store
+
+
+def make_bills(payer_ids, count):
+    """Small bills alternating between payers so wallets never run dry"""
+    return [
+        {"payer_id": payer_ids[i % len(payer_ids)], "total_amount": "1.00", "description": f"Statement line {i}"}
+        for i in range(count)
+    ]
+
+
+def bench_single(client: TestClient, bills) -> float:
+    """Bills per second posting one request per bill"""
+    start = time.perf_counter()
+    for bill in bills:
+        client.post("/transactions/", json=bill).raise_for_status()
+    return len(bills) / (time.perf_counter() - start)
+
+
+def bench_batch(client: TestClient, bills, batch_size: int) -> float:
+    """Bills per second posting `batch_size` bills per request"""
+    start = time.perf_counter()
+    for offset in range(0, len(bills), batch_size):
+        client.post("/transactions/batch", json=bills[offset:offset + batch_size]).raise_for_status()
+    return len(bills) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bills", type=int, default=5_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1_000, 5_000])
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    wallet = args.bills * 10
+
+    def reset():
+        client.post("/reset", params={"user_a_amount": wallet, "user_b_amount": wallet}).raise_for_status()
+        return [user.id for user in store.get_all_users()]
+
+    bills = make_bills(reset(), args.bills)
+    print(f"{args.bills} bills")
+    print(f"  single POST /transactions      {bench_single(client, bills):>10.0f} bills/s")
+    for batch_size in args.batch_sizes:
+        bills = make_bills(reset(), args.bills)
+        print(f"  POST /transactions/batch x{batch_size:<5} {bench_batch(client, bills, batch_size):>10.0f} bills/s")
+
+
+if __name__ == "__main__":
+    main()
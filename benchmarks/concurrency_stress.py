@@ -0,0 +1,148 @@
+"""
+Multi-threaded stress test for concurrent bills and settlements.
+
+Writer threads race POST /transactions and POST /settle against small wallets,
+so any check-then-apply gap shows up as an overdrawn wallet or drifting debt.
+Afterwards the ledger invariants are verified and read throughput is measured
+at increasing thread counts with a writer running alongside.
+
+Run from the repository root (requires httpx):
+    python -m benchmarks.concurrency_stress
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import threading
+import time
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from main import app, store
+
+
+def run_writers(threads: int, operations: int, user_ids) -> int:
+    """Race bills and settlements from several threads; returns successful mutations"""
+    successes = itertools.count()
+
+    def writer(seed: int):
+        client = TestClient(app)
+        rng = random.Random(seed)
+        for _ in range(operations):
+            payer_id, other_id = rng.sample(user_ids, 2)
+            if rng.random() < 0.7:
+                response = client.post("/transactions/", json={
+                    "payer_id": payer_id,
+                    "total_amount": str(Decimal(rng.randint(100, 5000)) / 100),
+                    "description": "Stress bill"
+                })
+            else:
+                response = client.post("/settle/", json={
+                    "from_user_id": payer_id,
+                    "to_user_id": other_id,
+                    "amount": str(Decimal(rng.randint(100, 3000)) / 100)
+                })
+            if response.status_code == 200:
+                next(successes)
+
+    workers = [threading.Thread(target=writer, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return next(successes)
+
+
+def check_invariants(initial_total: Decimal) -> list:
+    """Return a list of violated ledger invariants (empty when consistent)"""
+    problems = []
+    users = store.get_all_users()
+    for user in users:
+        if user.wallet_balance < 0:
+            problems.append(f"{user.name} overdrawn: {user.wallet_balance}")
+
+    # Settlements move money inside the group, so only bills leave it
+    spent = sum((expense.total_amount for expense in store.get_all_group_expenses()), Decimal("0.00"))
+    wallets = sum((user.wallet_balance for user in users), Decimal("0.00"))
+    if wallets != initial_total - spent:
+        problems.append(f"money not conserved: wallets {wallets} != {initial_total} - {spent}")
+
+    if sum(store.get_net_balances().values(), Decimal("0.00")) != 0:
+        problems.append("net balances do not sum to zero")
+    for debtor, creditor in itertools.permutations([user.id for user in users], 2):
+        if store.get_amount_owed(debtor, creditor) != store.scan_amount_owed(debtor, creditor):
+            problems.append(f"balance table drifted from history for {debtor} -> {creditor}")
+    for user in users:
+        recorded = sum((tx.amount for tx in store.get_user_transactions(user.id)), Decimal("0.00"))
+        if recorded != store.get_user_spending_total(user.id):
+            problems.append(f"spending total drifted for {user.name}")
+    return problems
+
+
+def bench_reads(threads: int, duration: float, with_writer: bool) -> float:
+    """GET /users requests per second across `threads` reader threads"""
+    stop = threading.Event()
+    completed = itertools.count()
+
+    def reader():
+        client = TestClient(app)
+        while not stop.is_set():
+            client.get("/users/")
+            next(completed)
+
+    def writer():
+        client = TestClient(app)
+        user_ids = [user.id for user in store.get_all_users()]
+        while not stop.is_set():
+            client.post("/transactions/", json={"payer_id": user_ids[0], "total_amount": "0.01", "description": "Tick"})
+
+    workers = [threading.Thread(target=reader) for _ in range(threads)]
+    if with_writer:
+        workers.append(threading.Thread(target=writer))
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return next(completed) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=200, help="operations per writer thread")
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--wallet", type=Decimal, default=Decimal("300.00"))
+    parser.add_argument("--read-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    client.post("/reset", params={"user_a_amount": str(args.wallet), "user_b_amount": str(args.wallet)})
+    for index in range(args.members - 2):
+        client.post("/users/", json={"name": f"Member {index + 3}", "wallet_balance": str(args.wallet)})
+    user_ids = [user.id for user in store.get_all_users()]
+    initial_total = args.wallet * len(user_ids)
+
+    start = time.perf_counter()
+    mutations = run_writers(args.writers, args.operations, user_ids)
+    elapsed = time.perf_counter() - start
+    print(f"{args.writers} writers: {mutations} successful mutations in {elapsed:.2f}s ({mutations / elapsed:.0f}/s)")
+
+    problems = check_invariants(initial_total)
+    for problem in problems:
+        print(f"  INVARIANT VIOLATED: {problem}")
+    if not problems:
+        print("  ledger invariants hold")
+
+    print("\nGET /users throughput (requests/s)")
+    for threads in (1, 2, 4, 8):
+        idle = bench_reads(threads, args.read_seconds, with_writer=False)
+        busy = bench_reads(threads, args.read_seconds, with_writer=True)
+        print(f"  {threads} readers: {idle:>8.0f} alone, {busy:>8.0f} with a concurrent writer")
+
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
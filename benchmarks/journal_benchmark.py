@@ -0,0 +1,85 @@
+"""
+Write-throughput and recovery-time benchmarks for the journaled store.
+
+Run from the repository root:
+    python -m benchmarks.journal_benchmark
+"""
+
+import argparse
+import random
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from models.transaction import GroupExpense
+from models.settlement import Settlement
+from storage.journaled_store import JournaledStore
+
+
+def fill_store(store: JournaledStore, operations: int, seed: int = 42) -> None:
+    """Apply a mix of expenses (~70%) and settlements (~30%)"""
+    rng = random.Random(seed)
+    user_ids = [user.id for user in store.get_all_users()]
+    for _ in range(operations):
+        payer_id, other_id = rng.sample(user_ids, 2)
+        if rng.random() < 0.7:
+            store.add_group_expense(GroupExpense.create(
+                payer_id=payer_id,
+                total_amount=Decimal(rng.randint(100, 20000)) / 100,
+                description="Benchmark expense",
+                participant_ids=[payer_id, other_id]
+            ))
+            continue
+        owed = store.get_amount_owed(payer_id, other_id)
+        if owed > 0:
+            store.add_settlement(Settlement.create(payer_id, other_id, owed))
+
+
+def bench_write_throughput(operations: int, sync_every: int) -> float:
+    """Mutations per second for a given group-commit batch size"""
+    directory = tempfile.mkdtemp(prefix="ledger-bench-")
+    try:
+        store = JournaledStore(directory, snapshot_every=operations + 1, sync_every=sync_every, sync_interval=1.0)
+        start = time.perf_counter()
+        fill_store(store, operations)
+        store.close()
+        return operations / (time.perf_counter() - start)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_recovery(history: int, snapshot_every: int) -> float:
+    """Seconds to reopen a store holding `history` mutations"""
+    directory = tempfile.mkdtemp(prefix="ledger-bench-")
+    try:
+        store = JournaledStore(directory, snapshot_every=snapshot_every, sync_every=1024)
+        fill_store(store, history)
+        store.close()
+
+        start = time.perf_counter()
+        JournaledStore(directory, snapshot_every=snapshot_every).close()
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=20_000, help="mutations per throughput run")
+    parser.add_argument("--histories", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--snapshot-every", type=int, default=1_000)
+    args = parser.parse_args()
+
+    print("Write throughput (group commit batch size -> mutations/s)")
+    for sync_every in (1, 16, 64, 1024):
+        print(f"  sync_every={sync_every:<5} {bench_write_throughput(args.operations, sync_every):>10.0f} ops/s")
+
+    print(f"\nRecovery time (history size -> seconds, snapshot every {args.snapshot_every} events)")
+    for history in args.histories:
+        with_snapshots = bench_recovery(history, args.snapshot_every)
+        journal_only = bench_recovery(history, history + 1)
+        print(f"  {history:>8} events: {with_snapshots:.3f}s with snapshots, {journal_only:.3f}s journal replay only")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Read throughput of uvicorn with several workers sharing one mmap ledger.
+
+For each worker count a server is started with LEDGER_STORAGE=mmap on a fresh
+data directory and seeded through the API; the bills land on whichever worker
+accepts each connection. Client processes then hammer the read endpoints over
+keep-alive connections. Before measuring, every worker must report the same
+ETag and expense count, i.e. they all serve the one shared ledger.
+
+The server listens on a Unix socket: with several workers uvicorn's TCP
+sockets can hit Nagle/delayed-ACK stalls of ~40ms per response, which would
+swamp what is being measured.
+
+Run from the repository root:
+    python -m benchmarks.multiworker_benchmark --workers 1 2 4
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROUTES = ("/users/", "/settle/status", "/transactions/?limit=50")
+
+
+class UnixConnection(http.client.HTTPConnection):
+    """HTTP/1.1 keep-alive connection over a Unix socket"""
+
+    def __init__(self, path: str):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def request(connection: http.client.HTTPConnection, method: str, path: str, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.getheader("ETag"), response.read()
+
+
+def wait_until_up(path: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request(UnixConnection(path), "GET", "/")
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def seed(path: str, bills: int) -> None:
+    """Post bills over fresh connections, so they are spread over the workers"""
+    users = json.loads(request(UnixConnection(path), "GET", "/users/")[2])["users"]
+    for i in range(bills):
+        status, _, body = request(UnixConnection(path), "POST", "/transactions/", {
+            "payer_id": users[i % 2]["id"], "total_amount": "1.00", "description": f"Seed bill {i}"
+        })
+        if status != 200:
+            raise RuntimeError(body)
+
+
+def check_shared(path: str, probes: int) -> str:
+    """ETag seen by `probes` fresh connections; they must all agree"""
+    etags = set()
+    counts = set()
+    for _ in range(probes):
+        connection = UnixConnection(path)
+        etags.add(request(connection, "GET", "/users/")[1])
+        insights = json.loads(request(connection, "GET", "/analytics/spending-insights")[2])
+        counts.add(insights["total_transactions"])
+    if len(etags) != 1 or len(counts) != 1:
+        raise AssertionError(f"workers disagree: etags={etags} counts={counts}")
+    return etags.pop()
+
+
+def client(path: str, duration: float, results) -> None:
+    connection = UnixConnection(path)
+    done = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        status, _, _ = request(connection, "GET", ROUTES[done % len(ROUTES)])
+        if status != 200:
+            raise RuntimeError(status)
+        done += 1
+    results.put(done)
+
+
+def measure(workers: int, clients: int, duration: float, bills: int) -> float:
+    data_dir = tempfile.mkdtemp(prefix="ledger-mmap-")
+    path = os.path.join(data_dir, "server.sock")
+    env = dict(os.environ, LEDGER_STORAGE="mmap", LEDGER_DATA_DIR=data_dir)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--uds", path, "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    try:
+        wait_until_up(path)
+        seed(path, bills)
+        etag = check_shared(path, probes=4 * workers)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=client, args=(path, duration, results)) for _ in range(clients)]
+        for process in processes:
+            process.start()
+        total = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        print(f"  shared ledger {etag}")
+        return total / duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=2 * (os.cpu_count() or 1))
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--bills", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes, routes {', '.join(ROUTES)}")
+    baseline = None
+    for workers in args.workers:
+        rate = measure(workers, args.clients, args.duration, args.bills)
+        baseline = baseline or rate
+        print(f"{workers} worker(s): {rate:>9.0f} req/s ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory and insert cost of storing history as pydantic models vs slotted records.
+
+Measures retained bytes per group expense (with its payer spending record)
+using tracemalloc, and the insert rate of SimpleStore.add_group_expenses.
+Run from the repository root:
+    python -m benchmarks.record_storage_benchmark
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from decimal import Decimal
+from models.transaction import Transaction, GroupExpense
+from storage.in_memory_store import SimpleStore
+from storage.records import ExpenseRecord, SpendingRecord
+
+DESCRIPTIONS = ["Groceries", "Dinner", "Uber ride", "Rent", "Utilities"]
+
+
+def make_expenses(payer_ids, participant_ids, count):
+    return [
+        GroupExpense.create(payer_ids[i % len(payer_ids)], Decimal("12.34"), DESCRIPTIONS[i % len(DESCRIPTIONS)],
+                            participant_ids)
+        for i in range(count)
+    ]
+
+
+def retained_bytes(build) -> int:
+    """Bytes still allocated after `build()` returns, with its result kept alive"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def build_models(expenses):
+    """What the store used to keep: the expense model plus a spending model"""
+    return [
+        (expense, Transaction.create_spending_record(expense.payer_id, expense.individual_share, expense.description))
+        for expense in expenses
+    ]
+
+
+def build_records(expenses):
+    """What the store keeps now"""
+    return [
+        (record, SpendingRecord.create(record.payer_id, record.share_cents, record.description))
+        for record in map(ExpenseRecord.from_model, expenses)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    args = parser.parse_args()
+
+    store = SimpleStore()
+    user_ids = [user.id for user in store.get_all_users()]
+    expenses = make_expenses(user_ids, user_ids, args.expenses)
+
+    model_bytes = retained_bytes(lambda: build_models(expenses)) / args.expenses
+    record_bytes = retained_bytes(lambda: build_records(expenses)) / args.expenses
+    print(f"{args.expenses} expenses, bytes retained per expense + spending record")
+    print(f"  pydantic models   {model_bytes:>8.0f}")
+    print(f"  slotted records   {record_bytes:>8.0f}  ({model_bytes / record_bytes:.1f}x smaller)")
+
+    start = time.perf_counter()
+    for offset in range(0, args.expenses, args.batch_size):
+        store.add_group_expenses(expenses[offset:offset + args.batch_size])
+    elapsed = time.perf_counter() - start
+    print(f"  add_group_expenses {args.expenses / elapsed:>8.0f} expenses/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Serialization throughput of GET /users and GET /transactions.
+
+Every request is a full build: the response cache is cleared before each one,
+so only the per-record row fragments are reused. As a reference the same
+payloads are also built the old way, through the pydantic response models.
+Run from the repository root (requires httpx):
+    python -m benchmarks.serialization_benchmark
+"""
+
+import argparse
+import time
+from decimal import Decimal
+from fastapi.testclient import TestClient
+from main import app, store
+from models.api_models import TransactionsPage, UserResponse, UsersResponse
+from models.transaction import GroupExpense
+from routers.conditional import response_cache
+
+
+def fill(expenses: int):
+    """Ledger with `expenses` bills alternating between two payers"""
+    store.reset_users(Decimal(expenses), Decimal(expenses))
+    user_ids = [user.id for user in store.get_all_users()]
+    store.add_group_expenses([
+        GroupExpense.create(user_ids[i % 2], Decimal("1.00"), f"Statement line {i}", user_ids) for i in range(expenses)
+    ])
+
+
+def models_users() -> bytes:
+    """GET /users payload through the pydantic response models"""
+    return UsersResponse(users=[
+        UserResponse(
+            id=user.id,
+            name=user.name,
+            wallet_balance=user.wallet_balance,
+            total_spent=store.get_user_spending_total(user.id),
+            transactions=[
+                {"id": tx.id, "amount": f"{float(tx.amount):.2f}", "description": tx.description,
+                 "timestamp": tx.timestamp.isoformat()}
+                for tx in store.get_user_transactions(user.id)
+            ],
+            net_balance=store.get_net_balance(user.id)
+        )
+        for user in store.get_all_users()
+    ]).model_dump_json().encode()
+
+
+def models_transactions(limit: int) -> bytes:
+    """GET /transactions page through the pydantic response models"""
+    user_names = {user.id: user.name for user in store.get_all_users()}
+    rows = []
+    for _, expense in store.iter_group_expenses(newest_first=True):
+        if len(rows) == limit:
+            break
+        rows.append({
+            "id": expense.id,
+            "payer": user_names.get(expense.payer_id, "Unknown"),
+            "total_amount": f"{float(expense.total_amount):.2f}",
+            "individual_share": f"{float(expense.individual_share):.2f}",
+            "description": expense.description,
+            "timestamp": expense.timestamp.isoformat(),
+            "is_settled": expense.is_settled
+        })
+    return TransactionsPage(transactions=rows, next_cursor=None).model_dump_json().encode()
+
+
+def throughput(request, repeat: int):
+    """(MB/s, ms per request) for a callable returning the response body"""
+    size = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        response_cache.clear()
+        size += len(request())
+    elapsed = time.perf_counter() - start
+    return size / elapsed / 1e6, elapsed / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    for expenses in args.expenses:
+        fill(expenses)
+        client.get("/users/")
+        client.get("/transactions/", params={"limit": 1000})
+        print(f"{expenses} expenses")
+        cases = [
+            ("GET /users (fast path)", lambda: client.get("/users/").content),
+            ("/users via pydantic models", models_users),
+            ("GET /transactions?limit=1000", lambda: client.get("/transactions/", params={"limit": 1000}).content),
+            ("/transactions via pydantic", lambda: models_transactions(1000)),
+        ]
+        for name, request in cases:
+            rate, latency = throughput(request, args.repeat)
+            print(f"  {name:<30} {rate:>8.1f} MB/s {latency:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
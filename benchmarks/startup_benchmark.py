@@ -0,0 +1,96 @@
+"""
+Cold start: time from launching a server process to its first response.
+
+Each run starts `uvicorn main:app` (in-memory engine) on a fresh Unix socket and
+polls GET /users/ every millisecond until it answers, so the time covers the
+interpreter, every import, create_app() and serving the first request. The
+slowest imports of `import main` (python -X importtime) are listed as well,
+to show what a regression pulled into startup. Exits non-zero when the median
+cold start is over --budget seconds.
+
+Run from the repository root:
+    python -m benchmarks.startup_benchmark --runs 10 --budget 1.0
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+from benchmarks.multiworker_benchmark import UnixConnection, request
+
+# Median seconds from process launch to first response that --budget defaults to
+STARTUP_BUDGET = 1.0
+# Packages counted as the app's own in the import breakdown
+APP_PACKAGES = ("main", "routers", "storage", "models")
+
+
+def cold_start(timeout: float = 30.0) -> float:
+    """Seconds from launching uvicorn to the first 200 response"""
+    directory = tempfile.mkdtemp(prefix="ledger-startup-")
+    path = os.path.join(directory, "server.sock")
+    began = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--uds", path, "--log-level", "warning"],
+        env=dict(os.environ, LEDGER_STORAGE="memory")
+    )
+    try:
+        deadline = began + timeout
+        while time.perf_counter() < deadline:
+            try:
+                status = request(UnixConnection(path), "GET", "/users/")[0]
+            except OSError:
+                time.sleep(0.001)
+                continue
+            if status != 200:
+                raise RuntimeError(f"first request failed with {status}")
+            return time.perf_counter() - began
+        raise RuntimeError("server did not start")
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def slowest_imports(count: int) -> List[Tuple[str, float]]:
+    """(module, cumulative ms) of the slowest imports made directly by `import main` or within the app"""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            capture_output=True, text=True, check=True).stderr
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nesting is shown as two spaces per level below main's one
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        module = name.strip()
+        if cumulative.strip().isdigit() and (depth <= 1 or module.split(".")[0] in APP_PACKAGES):
+            imports.append((module, int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="median cold start allowed, in seconds")
+    parser.add_argument("--imports", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    times = sorted(cold_start() for _ in range(args.runs))
+    median = statistics.median(times)
+    print(f"Cold start over {args.runs} runs: median {median * 1000:.0f} ms, "
+          f"min {times[0] * 1000:.0f} ms, max {times[-1] * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+    print("Slowest imports of main:")
+    for name, ms in slowest_imports(args.imports):
+        print(f"  {ms:>8.1f} ms  {name}")
+    if median > args.budget:
+        print("OVER BUDGET")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Headless benchmark suite: store methods and API routes on synthetic ledgers.
+
+For every size a deterministic ledger of `size` expenses among a few members
+is generated, with about one settlement per ten expenses, then measured three ways:
+  store    individual store methods called directly
+  asgi     every route through the in-process TestClient; GET routes are
+           measured as clients see them (response cache warm) and uncached
+  uvicorn  every route over keep-alive HTTP to a local uvicorn process that
+           loads the same ledger from a journal snapshot
+The startup target (size 0) times a fresh uvicorn process from launch to its
+first response, and create_app() building another app in this process.
+Each case runs for up to --seconds (and at least --min-samples calls). Write
+cases run after the reads, since they grow the ledger. Throughput and
+p50/p99/max latency are printed and written as JSON; with --baseline the run is
+compared to an earlier results file and exits non-zero when a case's p50
+latency grew by more than --threshold.
+
+Run from the repository root (requires httpx):
+    python -m benchmarks.suite --sizes 1000 10000 100000 1000000 --output results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from fastapi.testclient import TestClient
+from main import app, create_app, store, LEDGER_STORAGE
+from models.money import from_cents, to_cents
+from models.settlement import Settlement
+from models.transaction import GroupExpense
+from routers.conditional import response_cache
+from storage.in_memory_store import SimpleStore
+from storage.journal import LedgerJournal
+from storage.journaled_store import snapshot_state
+from benchmarks.multiworker_benchmark import UnixConnection, request, wait_until_up
+from benchmarks.startup_benchmark import cold_start
+
+MEMBERS = 6
+WALLET = Decimal("1000000000.00")
+DESCRIPTIONS = ("Groceries", "Dinner", "Rent", "Utilities", "Taxi", "Cinema", "Coffee", "Hotel")
+READ_ROUTES = (
+    "/users/",
+    "/transactions/?limit=50",
+    "/settle/status",
+    "/settle/plan",
+    "/analytics/spending-insights",
+    "/analytics/timeseries?interval=week",
+)
+# Latencies below this are timer noise and are left out of baseline comparisons
+NOISE_FLOOR_MS = 0.01
+
+Case = Tuple[str, str, Callable[[], bool]]
+
+
+def build_ledger(size: int, seed: int = 0) -> None:
+    """Fill the app's store with `size` expenses spread over a year and about one settlement per ten.
+
+    Each settlement pays off a run of the pair's oldest unsettled shares exactly, as
+    members settling specific bills would. The builder mirrors those queues itself:
+    amounts that stop short of a share make add_settlement walk the rest of the
+    pair's queue, and the add_settlement case measures that separately.
+    """
+    rng = random.Random(seed)
+    store.reset_users(WALLET, WALLET)
+    for number in range(3, MEMBERS + 1):
+        store.add_user(f"Member {number}", WALLET)
+    user_ids = [user.id for user in store.get_all_users()]
+    unsettled: Dict[Tuple[str, str], Deque[int]] = defaultdict(deque)
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=365) / size
+    batch = []
+    for index in range(size):
+        payer_id = rng.choice(user_ids)
+        participant_ids = rng.sample(user_ids, rng.randint(2, MEMBERS))
+        expense = GroupExpense.create(payer_id, Decimal(rng.randint(100, 20_000)) / 100,
+                                      rng.choice(DESCRIPTIONS), participant_ids)
+        expense.timestamp = start + step * index
+        batch.append(expense)
+        for debtor_id in expense.debtor_ids():
+            unsettled[(debtor_id, payer_id)].append(to_cents(expense.individual_share))
+        if len(batch) < 10 and index < size - 1:
+            continue
+        store.add_group_expenses(batch)
+        batch = []
+
+        debtor_id, creditor_id, _ = rng.choice(store.get_outstanding_debts())
+        shares = unsettled[(debtor_id, creditor_id)]
+        owed_cents = to_cents(store.get_amount_owed(debtor_id, creditor_id))
+        cents = 0
+        for _ in range(rng.randint(1, 10)):
+            if not shares or cents + shares[0] > owed_cents:
+                break
+            cents += shares.popleft()
+        if cents:
+            store.add_settlement(Settlement.create(debtor_id, creditor_id, from_cents(cents)))
+
+
+def write_snapshot(directory: str) -> None:
+    """Save the app's store where a journal-engine server will load it"""
+    journal = LedgerJournal(directory)
+    journal.load()
+    journal.write_snapshot(snapshot_state(store))
+    journal.close()
+
+
+def largest_debt() -> Tuple[str, str]:
+    debtor_id, creditor_id, _ = max(store.get_outstanding_debts(), key=lambda debt: debt[2])
+    return debtor_id, creditor_id
+
+
+def store_cases(debtor_id: str, creditor_id: str) -> Tuple[List[Case], List[Case]]:
+    """(read, write) cases calling store methods directly"""
+    reads = [
+        ("get_amount_owed", lambda: store.get_amount_owed(debtor_id, creditor_id) is not None),
+        ("get_user", lambda: store.get_user(debtor_id) is not None),
+        ("get_user_transactions", lambda: store.get_user_transactions(debtor_id) is not None),
+        ("get_user_spending_total", lambda: store.get_user_spending_total(debtor_id) is not None),
+        ("get_net_balances", lambda: store.get_net_balances() is not None),
+        ("get_outstanding_debts", lambda: store.get_outstanding_debts() is not None),
+        ("iter_group_expenses[:50]", lambda: sum(1 for _, _ in zip(range(50), store.iter_group_expenses(newest_first=True))) >= 0),
+        ("get_expense_columns", lambda: store.get_expense_columns() is not None),
+        ("get_expense_stats", lambda: store.get_expense_stats() is not None),
+        ("scan_amount_owed", lambda: store.scan_amount_owed(debtor_id, creditor_id) is not None),
+    ]
+    writes = [
+        ("add_group_expense", lambda: store.add_group_expense(
+            GroupExpense.create(creditor_id, Decimal("1.00"), "Benchmark bill", [creditor_id, debtor_id])) is None),
+        ("add_settlement", lambda: store.add_settlement(Settlement.create(debtor_id, creditor_id, Decimal("0.01"))) is None),
+    ]
+    return [("store", name, call) for name, call in reads], [("store", name, call) for name, call in writes]
+
+
+def http_cases(target: str, send: Callable[[str, str, Optional[dict]], int], debtor_id: str, creditor_id: str,
+               uncached: bool = False) -> Tuple[List[Case], List[Case]]:
+    """(read, write) cases for every route through `send(method, path, body) -> status`"""
+    reads = []
+    for path in READ_ROUTES:
+        reads.append((target, f"GET {path}", lambda path=path: send("GET", path, None) == 200))
+        if uncached:
+            reads.append((target, f"GET {path} (uncached)",
+                          lambda path=path: response_cache.clear() or send("GET", path, None) == 200))
+    writes = [
+        (target, "POST /transactions/", lambda: send("POST", "/transactions/", {
+            "payer_id": creditor_id, "total_amount": "1.00", "description": "Benchmark bill"
+        }) == 200),
+        (target, "POST /settle/", lambda: send("POST", "/settle/", {
+            "from_user_id": debtor_id, "to_user_id": creditor_id, "amount": "0.01"
+        }) == 200),
+    ]
+    return reads, writes
+
+
+def startup_cases() -> List[Case]:
+    """Cold start of a server process, and building one more app in-process"""
+    return [
+        ("startup", "uvicorn launch to first response", lambda: cold_start() > 0),
+        ("startup", "create_app()", lambda: create_app(store=SimpleStore()) is not None),
+    ]
+
+
+def percentile(ordered: List[int], p: float) -> float:
+    """Nearest-rank percentile of sorted nanosecond samples, in milliseconds"""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))] / 1e6
+
+
+def measure(call: Callable[[], bool], seconds: float, min_samples: int, max_samples: int) -> Dict[str, float]:
+    samples: List[int] = []
+    errors = 0
+    call()  # warm-up
+    start = time.perf_counter()
+    deadline = start + seconds
+    while len(samples) < max_samples and (len(samples) < min_samples or time.perf_counter() < deadline):
+        began = time.perf_counter_ns()
+        ok = call()
+        samples.append(time.perf_counter_ns() - began)
+        errors += not ok
+    elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        "samples": len(samples),
+        "errors": errors,
+        "ops_per_sec": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+        "max_ms": round(samples[-1] / 1e6, 4)
+    }
+
+
+def run_cases(size: int, cases: List[Case], args, results: List[dict]) -> None:
+    for target, name, call in cases:
+        result = {"size": size, "target": target, "case": name, **measure(call, args.seconds, args.min_samples, args.max_samples)}
+        results.append(result)
+        errors = f" {result['errors']} errors" if result["errors"] else ""
+        print(f"  {target:<8} {name:<48} {result['ops_per_sec']:>10.1f}/s  p50 {result['p50_ms']:>9.3f} ms"
+              f"  p99 {result['p99_ms']:>9.3f} ms{errors}", flush=True)
+
+
+def run_uvicorn(size: int, directory: str, debtor_id: str, creditor_id: str, args, results: List[dict]) -> None:
+    """Serve the snapshot from a journal-engine uvicorn process and run the HTTP cases against it"""
+    path = os.path.join(directory, "server.sock")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--uds", path, "--log-level", "warning"],
+        env=dict(os.environ, LEDGER_STORAGE="journal", LEDGER_DATA_DIR=directory)
+    )
+    try:
+        wait_until_up(path, timeout=args.startup_timeout)
+        connection = UnixConnection(path)
+
+        def send(method: str, route: str, body: Optional[dict]) -> int:
+            return request(connection, method, route, body)[0]
+
+        reads, writes = http_cases("uvicorn", send, debtor_id, creditor_id)
+        run_cases(size, reads + writes, args, results)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> int:
+    """Print p50 changes against a baseline run; returns how many cases regressed"""
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["target"], r["case"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nCompared to {baseline_path} (p50, regression above {threshold:.2f}x)")
+    for result in results:
+        before = baseline.get((result["size"], result["target"], result["case"]))
+        if before is None or max(before["p50_ms"], result["p50_ms"]) < NOISE_FLOOR_MS:
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"]
+        regressed = ratio > threshold
+        regressions += regressed
+        if regressed or ratio < 1 / threshold:
+            label = "REGRESSION" if regressed else "faster"
+            print(f"  {label:<10} {result['size']:>8} {result['target']:<8} {result['case']:<48} {ratio:.2f}x")
+    print(f"  {regressions} regression(s)")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--targets", nargs="+", choices=("startup", "store", "asgi", "uvicorn"),
+                        default=["startup", "store", "asgi", "uvicorn"])
+    parser.add_argument("--seconds", type=float, default=1.0, help="time budget per case")
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--max-samples", type=int, default=10_000)
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p50 ratio counted as a regression")
+    args = parser.parse_args()
+
+    results: List[dict] = []
+    client = TestClient(app)
+
+    def send(method: str, path: str, body: Optional[dict]) -> int:
+        return client.request(method, path, json=body).status_code
+
+    if "startup" in args.targets:
+        print("Startup", flush=True)
+        run_cases(0, startup_cases(), args, results)
+    for size in args.sizes:
+        began = time.perf_counter()
+        build_ledger(size)
+        print(f"{size} expenses ({len(store.get_all_settlements())} settlements, "
+              f"built in {time.perf_counter() - began:.1f}s)", flush=True)
+        debtor_id, creditor_id = largest_debt()
+        directory = tempfile.mkdtemp(prefix="ledger-bench-")
+        try:
+            if "uvicorn" in args.targets:
+                write_snapshot(directory)
+            store_reads, store_writes = store_cases(debtor_id, creditor_id)
+            asgi_reads, asgi_writes = http_cases("asgi", send, debtor_id, creditor_id, uncached=True)
+            reads = (store_reads if "store" in args.targets else []) + (asgi_reads if "asgi" in args.targets else [])
+            writes = (store_writes if "store" in args.targets else []) + (asgi_writes if "asgi" in args.targets else [])
+            run_cases(size, reads + writes, args, results)
+            if "uvicorn" in args.targets:
+                run_uvicorn(size, directory, debtor_id, creditor_id, args, results)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "engine": LEDGER_STORAGE,
+                "seconds_per_case": args.seconds
+            },
+            "results": results
+        }, f, indent=1)
+    print(f"\nWrote {len(results)} results to {args.output}")
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,125 @@
 """
 FastAPI app for Split & Budget Tracker.
-Simple bill splitting for exactly 2 friends.
+Simple bill splitting for groups of friends.
 """
 
-from fastapi import FastAPI
-from routers import users, transactions, settlements, analytics
+import os
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import Optional
+from fastapi import Depends, FastAPI
+from routers import users, transactions, settlements, analytics, export, recurring, groups, metrics
+from routers.dependencies import get_group_id, get_scheduler, get_store, use_group_store
+from routers.idempotency import IdempotencyCache
+from routers.metrics import Metrics, MetricsMiddleware
+from routers.recurring import RecurringScheduler, ledger_opener
 from storage.in_memory_store import SimpleStore
+from storage.recurring import RecurringBook
+from storage.registry import LedgerRegistry
 
-# Global store instance
-store = SimpleStore()
+# Storage engine: "memory", "journal", "sqlite" or "mmap" (one ledger file shared by all workers). Defaults to the journal when a data dir is given.
+LEDGER_DATA_DIR = os.environ.get("LEDGER_DATA_DIR")
+LEDGER_STORAGE = os.environ.get("LEDGER_STORAGE", "journal" if LEDGER_DATA_DIR else "memory")
+# Group ledgers kept in memory at once; idle ones beyond this are snapshotted to disk and closed
+LEDGER_MAX_LOADED = int(os.environ.get("LEDGER_MAX_LOADED", "64"))
+# Every ledger route is also served per group under this prefix
+GROUP_PREFIX = "/groups/{group_id}"
 
-# Create FastAPI application
-app = FastAPI(
-    title="Split & Budget Tracker",
-    description="Simple bill splitting for 2 friends",
-    version="1.0.0"
-)
 
-@app.post("/reset")
-def reset_for_testing(user_a_amount: float = 500.0, user_b_amount: float = 500.0):
+def create_store(engine: str, data_dir: str = None):
+    """Build the configured storage engine"""
+    if engine == "memory":
+        return SimpleStore()
+    if not data_dir:
+        raise ValueError(f"LEDGER_DATA_DIR is required for the {engine} storage engine")
+    if engine == "journal":
+        from storage.journaled_store import JournaledStore
+        return JournaledStore(data_dir)
+    if engine == "sqlite":
+        from storage.sqlite_store import SQLiteStore
+        os.makedirs(data_dir, exist_ok=True)
+        return SQLiteStore(os.path.join(data_dir, "ledger.db"))
+    if engine == "mmap":
+        from storage.mapped_store import MappedStore
+        os.makedirs(data_dir, exist_ok=True)
+        return MappedStore(os.path.join(data_dir, "ledger.map"))
+    raise ValueError(f"Unknown storage engine: {engine}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the recurring expense scheduler while serving; flush and release the app's stores on shutdown"""
+    app.state.scheduler.start()
+    yield
+    await app.state.scheduler.stop()
+    app.state.scheduler.book.close()
+    app.state.registry.close()
+    app.state.store.close()
+
+
+def reset_for_testing(user_a_amount: float = 500.0, user_b_amount: float = 500.0, store=Depends(get_store),
+                      scheduler=Depends(get_scheduler), group_id: Optional[str] = Depends(get_group_id)):
     """Reset users with individual wallet amounts for testing"""
-    from decimal import Decimal
     store.reset_users(Decimal(str(user_a_amount)), Decimal(str(user_b_amount)))
+    # Expense positions restart, so recurring bills are checked against the whole new history
+    scheduler.book.forget_ledger(group_id)
     return {
         "message": f"Users reset: User A=${user_a_amount}, User B=${user_b_amount}",
         "users": len(store.get_all_users())
     }
 
 
-# Include routers
-app.include_router(users.router)
-app.include_router(transactions.router)
-app.include_router(settlements.router)
-app.include_router(analytics.router)
+def create_app(store=None, registry: Optional[LedgerRegistry] = None, engine: str = LEDGER_STORAGE,
+               data_dir: Optional[str] = LEDGER_DATA_DIR, max_loaded: int = LEDGER_MAX_LOADED) -> FastAPI:
+    """Build an app serving `store` at the top-level routes and `registry`'s ledgers under /groups/{group_id}.
+
+    Either defaults to the configured engine. Apps share nothing, so several can
+    run side by side in one process; each closes its stores on shutdown.
+    """
+    app_metrics = Metrics()
+    if store is None:
+        store = create_store(engine, data_dir)
+    if registry is None:
+        # In-memory group ledgers have nothing to reload from, so they get no directory and are never evicted
+        registry = LedgerRegistry(
+            lambda path: app_metrics.instrument_store(create_store(engine, path)),
+            os.path.join(data_dir, "groups") if data_dir and engine != "memory" else None,
+            max_loaded
+        )
+
+    app = FastAPI(
+        title="Split & Budget Tracker",
+        description="Simple bill splitting for groups of friends",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    app.state.store = app_metrics.instrument_store(store)
+    app.state.registry = registry
+    app.state.metrics = app_metrics
+    app.state.idempotency_cache = IdempotencyCache()
+    # Recurring bills for every ledger of the app, kept beside the default ledger when it is on disk
+    book = RecurringBook(os.path.join(data_dir, "recurring.json") if data_dir and engine != "memory" else None)
+    app.state.scheduler = RecurringScheduler(book, ledger_opener(app.state.store, registry))
+
+    app.post("/reset")(reset_for_testing)
+    app.post(f"{GROUP_PREFIX}/reset", dependencies=[Depends(use_group_store)])(reset_for_testing)
+
+    # Latency and status counters for every request, served at /metrics
+    app.add_middleware(MetricsMiddleware, metrics=app_metrics, group_prefix=GROUP_PREFIX)
+
+    # Include routers, once for the default ledger and once scoped to a group
+    app.include_router(groups.router)
+    app.include_router(metrics.router)
+    for router in (users.router, transactions.router, settlements.router, analytics.router, export.router, recurring.router):
+        app.include_router(router)
+        app.include_router(router, prefix=GROUP_PREFIX, dependencies=[Depends(use_group_store)])
+    return app
+
+
+# The app uvicorn serves, with its default ledger and group registry
+app = create_app()
+store = app.state.store
+registry = app.state.registry
 
 
 if __name__ == "__main__":
@@ -2,8 +2,9 @@
 
 from decimal import Decimal
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
+from models.recurring import RecurringExpense
 
 
 class TransactionRequest(BaseModel):
@@ -11,6 +12,28 @@ class TransactionRequest(BaseModel):
     payer_id: str
     total_amount: Decimal
     description: str
+    participant_ids: Optional[List[str]] = None  # Members splitting the bill; defaults to everyone
+
+
+class RecurringExpenseRequest(BaseModel):
+    """Request to record a bill automatically on a schedule"""
+    payer_id: str
+    total_amount: Decimal
+    description: str
+    participant_ids: Optional[List[str]] = None  # Members splitting each bill; defaults to everyone now in the group
+    schedule: str  # Cron expression "minute hour day-of-month month day-of-week" in server local time, or @daily etc.
+    start: Optional[datetime] = None  # Bills start with the first run after this; an earlier time backfills missed runs
+
+
+class UserCreateRequest(BaseModel):
+    """Request to add a group member"""
+    name: str
+    wallet_balance: Decimal = Decimal("500.00")
+
+
+class GroupCreateRequest(BaseModel):
+    """Request to create a group ledger"""
+    group_id: Optional[str] = None  # Letters, digits, '-' and '_'; generated when omitted
 
 
 class SettlementRequest(BaseModel):
@@ -35,6 +58,21 @@ class UsersResponse(BaseModel):
     users: List[UserResponse]
 
 
+class BatchTransactionResponse(BaseModel):
+    """Response for POST /transactions/batch - summary of the recorded bills"""
+    recorded: int
+    total_amount: Decimal
+    payer_totals: Dict[str, Decimal]
+    payer_new_wallet_balances: Dict[str, Decimal]
+    message: str
+
+
+class TransactionsPage(BaseModel):
+    """Response for GET /transactions - one page of group expenses"""
+    transactions: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
 class TransactionResponse(BaseModel):
     """Response for POST /transactions - bill payment recorded"""
     group_expense_id: str
@@ -43,6 +81,7 @@ class TransactionResponse(BaseModel):
     individual_share: Decimal
     description: str
     timestamp: datetime
+    participant_ids: List[str]
     payer_new_wallet_balance: Decimal
     amount_owed_by_other: Decimal
     message: str
@@ -57,4 +96,41 @@ class SettlementResponse(BaseModel):
     timestamp: datetime
     from_user_new_balance: Decimal
     to_user_new_balance: Decimal
-    message: str
\ No newline at end of file
+    message: str
+
+
+class PlannedTransfer(BaseModel):
+    """One transfer in a debt simplification plan"""
+    from_user_id: str
+    from_user: str
+    to_user_id: str
+    to_user: str
+    amount: Decimal
+
+
+class SettlementPlanResponse(BaseModel):
+    """Response for GET and POST /settle/plan - minimal transfers that clear all debts"""
+    transfers: List[PlannedTransfer]
+    transfer_count: int
+    total_amount: Decimal
+
+
+class GroupResponse(BaseModel):
+    """Response for POST /groups"""
+    group_id: str
+    message: str
+
+
+class LedgerRegistryStats(BaseModel):
+    """Response for GET /groups/stats - loaded ledgers and cache counters"""
+    loaded: int
+    in_use: int
+    max_loaded: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class RecurringExpensesResponse(BaseModel):
+    """Response for GET /recurring - the ledger's recurring bills, soonest first"""
+    recurring: List[RecurringExpense]
@@ -0,0 +1,46 @@
+"""Money helpers for Split & Budget Tracker - amounts are held as integer cents internally"""
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Tuple
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount: Decimal) -> int:
+    """Convert a currency amount to integer cents"""
+    return int(amount.scaleb(2).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def exact_cents(amount: Decimal) -> Optional[int]:
+    """Integer cents of an amount, or None when it has a fraction of a cent (or is not finite)"""
+    if not amount.is_finite():
+        return None
+    cents = amount.scaleb(2)
+    if cents != cents.to_integral_value():
+        return None
+    return int(cents)
+
+
+def from_cents(cents: int) -> Decimal:
+    """Convert integer cents back to a two-place Decimal"""
+    return Decimal(cents).scaleb(-2)
+
+
+def split_cents(total_cents: int, parts: int) -> Tuple[int, int]:
+    """Split cents into equal shares, returning (share, remainder).
+    
+    The remainder (always less than `parts`) is absorbed by the payer, so the
+    shares plus the payer's part add back up to the exact total.
+    """
+    return divmod(total_cents, parts)
+
+
+def format_cents(cents: int) -> str:
+    """Two-place amount string for integer cents, without going through float"""
+    whole, part = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{whole}.{part:02d}"
+
+
+def format_amount(amount: Decimal) -> str:
+    """Two-place amount string for a Decimal"""
+    return format_cents(to_cents(amount))
@@ -0,0 +1,160 @@
+"""Recurring expense definitions and their cron-style schedules"""
+
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, Optional
+from uuid import UUID, uuid4, uuid5
+from pydantic import BaseModel
+
+# Name, lowest and highest value of the five fields (day of week 0 and 7 are both Sunday)
+CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day of month", 1, 31), ("month", 1, 12), ("day of week", 0, 7))
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *"
+}
+# How far ahead the next run is looked for; a date like 29 February on a Monday recurs well within it
+SEARCH_YEARS = 50
+# Oldest run still recorded: a backfill can start at most this far back, and runs missed
+# for longer than this while the server was down are skipped
+MAX_CATCH_UP = timedelta(days=366)
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> List[int]:
+    """Sorted values of one field: '*', 'a', 'a-b', any of them with '/step', joined by commas"""
+    values = set()
+    try:
+        for part in text.split(","):
+            term, _, step_text = part.partition("/")
+            step = int(step_text) if step_text else 1
+            if term == "*":
+                first, last = low, high
+            elif "-" in term:
+                first_text, last_text = term.split("-", 1)
+                first, last = int(first_text), int(last_text)
+            else:
+                first = int(term)
+                last = high if step_text else first
+            if step < 1 or not low <= first <= last <= high:
+                raise ValueError
+            values.update(range(first, last + 1, step))
+    except ValueError:
+        raise ValueError(f"Invalid {name} field '{text}': use *, numbers from {low} to {high}, ranges, lists or steps")
+    return sorted(values)
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week) in local time.
+
+    As in cron, when both day fields are restricted a day matching either one fires.
+    The next run is found by jumping field by field (month, day, hour, minute), so
+    it costs a few steps per skipped day rather than one per skipped minute.
+    """
+    __slots__ = ("expression", "minutes", "hours", "days", "months", "weekdays", "any_day", "any_weekday")
+
+    def __init__(self, expression: str):
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError("Schedule must be five fields (minute hour day-of-month month day-of-week) or an alias like @monthly")
+        self.expression = expression
+        minutes, hours, days, months, weekdays = (
+            _parse_field(text, name, low, high) for text, (name, low, high) in zip(fields, CRON_FIELDS)
+        )
+        self.minutes = minutes
+        self.hours = hours
+        self.days = frozenset(days)
+        self.months = months
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+
+    def _day_matches(self, day: date) -> bool:
+        in_month = day.day in self.days
+        in_week = (day.weekday() + 1) % 7 in self.weekdays  # cron counts from Sunday
+        if self.any_day:
+            return in_week
+        if self.any_weekday:
+            return in_month
+        return in_month or in_week
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        """The first run strictly after `moment`, or None if it never runs again"""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day, hour, minute = start.date(), start.hour, start.minute
+        last_year = day.year + SEARCH_YEARS
+        while day.year <= last_year:
+            if day.month not in self.months:
+                index = bisect_left(self.months, day.month)
+                day = date(day.year, self.months[index], 1) if index < len(self.months) else date(day.year + 1, self.months[0], 1)
+                hour = minute = 0
+                continue
+            if not self._day_matches(day):
+                day += timedelta(days=1)
+                hour = minute = 0
+                continue
+            index = bisect_left(self.hours, hour)
+            if index == len(self.hours):
+                day += timedelta(days=1)
+                hour = minute = 0
+                continue
+            if self.hours[index] != hour:
+                hour, minute = self.hours[index], 0
+            index = bisect_left(self.minutes, minute)
+            if index == len(self.minutes):
+                hour, minute = hour + 1, 0
+                continue
+            return datetime.combine(day, time(hour, self.minutes[index]))
+        return None
+
+
+@lru_cache(maxsize=1024)
+def parse_schedule(expression: str) -> CronSchedule:
+    return CronSchedule(expression)
+
+
+class RecurringExpense(BaseModel):
+    """A bill recorded automatically, split like POST /transactions, every time its schedule runs"""
+    id: str
+    group_id: Optional[str] = None  # None for the default ledger
+    payer_id: str
+    total_amount: Decimal
+    description: str
+    participant_ids: List[str]
+    schedule: str
+    next_run: Optional[datetime]  # None once the schedule has no further runs
+    occurrences: int = 0  # Bills recorded so far
+    skipped: int = 0  # Runs that could not be recorded, e.g. for insufficient funds (runs too old to catch up count once)
+    last_error: Optional[str] = None
+
+    @classmethod
+    def create(cls, group_id: Optional[str], payer_id: str, total_amount: Decimal, description: str,
+               participant_ids: List[str], schedule: str, start: datetime):
+        """Create a definition whose first bill is the schedule's first run after `start`.
+
+        Raises ValueError for an invalid schedule, one that never runs or a start
+        further back than MAX_CATCH_UP.
+        """
+        if start < datetime.now() - MAX_CATCH_UP:
+            raise ValueError(f"Start can be at most {MAX_CATCH_UP.days} days in the past")
+        next_run = parse_schedule(schedule).next_after(start)
+        if next_run is None:
+            raise ValueError(f"Schedule '{schedule}' never runs")
+        return cls(
+            id=str(uuid4()),
+            group_id=group_id,
+            payer_id=payer_id,
+            total_amount=total_amount,
+            description=description,
+            participant_ids=list(participant_ids),
+            schedule=schedule,
+            next_run=next_run
+        )
+
+    def expense_id(self, run: datetime) -> str:
+        """ID of the bill for one run, the same every time it is derived"""
+        return str(uuid5(UUID(self.id), run.isoformat()))
@@ -1,7 +1,9 @@
 """Settlement data model for Split & Budget Tracker"""
 
+import heapq
 from datetime import datetime
 from decimal import Decimal
+from typing import Dict, List, Tuple
 from uuid import uuid4
 from pydantic import BaseModel
 
@@ -23,4 +25,30 @@ class Settlement(BaseModel):
             to_user_id=to_user_id,
             amount=amount,
             timestamp=datetime.now()
-        )
\ No newline at end of file
+        )
+
+
+def simplify_debts(net_balances: Dict[str, Decimal]) -> List[Tuple[str, str, Decimal]]:
+    """Plan a minimal set of (from_user_id, to_user_id, amount) transfers that clears all debts.
+    
+    Greedy on net balances: repeatedly match the largest creditor with the largest debtor.
+    Every transfer clears at least one member, so there are at most n - 1 transfers and
+    the heap operations keep the whole plan O(n log n).
+    """
+    creditors = [(-amount, user_id) for user_id, amount in net_balances.items() if amount > 0]
+    debtors = [(amount, user_id) for user_id, amount in net_balances.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    
+    transfers = []
+    while creditors and debtors:
+        credit, creditor_id = heapq.heappop(creditors)
+        debt, debtor_id = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor_id, creditor_id, amount))
+        
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor_id))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor_id))
+    return transfers
@@ -0,0 +1,98 @@
+"""Vectorized spending time series over the stores' columnar history"""
+
+from datetime import date, timedelta
+from typing import Dict, NamedTuple, Optional, Sequence
+import numpy as np
+from storage.columns import Columns
+
+INTERVALS = ("day", "week", "month")
+PERCENTILES = (50, 90, 99)
+MICROS_PER_DAY = 86_400_000_000
+
+
+class BucketedSpending(NamedTuple):
+    """Per-bucket sums in cents: `totals` has one row per group of the input"""
+    totals: np.ndarray  # int64, shape (groups, buckets)
+    counts: np.ndarray  # int64, shape (groups, buckets)
+
+
+def bucket_floor(days: np.ndarray, interval: str) -> np.ndarray:
+    """Start day of the bucket holding each day (weeks start on Monday)"""
+    if interval == "day":
+        return days
+    if interval == "week":
+        # numpy counts days from Thursday 1970-01-01; shift so weeks start on Monday
+        day_numbers = days.astype(np.int64)
+        return ((day_numbers + 3) // 7 * 7 - 3).astype("datetime64[D]")
+    return days.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def bucket_range(start: date, end: date, interval: str) -> np.ndarray:
+    """Start days of every bucket from the one holding `start` to the one holding `end`"""
+    first, last = bucket_floor(np.array([start, end], dtype="datetime64[D]"), interval)
+    if interval == "month":
+        return np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    step = 7 if interval == "week" else 1
+    return np.arange(first, last + 1, step)
+
+
+def max_bucket_count(start: date, end: date, interval: str) -> int:
+    """Upper bound on the buckets bucket_range would return, without building it"""
+    days = (end - start).days + 1
+    if interval == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return days if interval == "day" else days // 7 + 2
+
+
+def data_range(*columns: Columns) -> Optional[Sequence[date]]:
+    """First and last day with any record, or None when there are no records"""
+    stamps = [np.frombuffer(column.timestamps, dtype=np.int64) for column in columns if len(column.timestamps)]
+    if not stamps:
+        return None
+    first = min(int(stamp.min()) for stamp in stamps)
+    last = max(int(stamp.max()) for stamp in stamps)
+    epoch = date(1970, 1, 1)
+    return epoch + timedelta(days=first // MICROS_PER_DAY), epoch + timedelta(days=last // MICROS_PER_DAY)
+
+
+def select(columns: Columns, start: date, end: date):
+    """(timestamps, cents, users) arrays restricted to start..end inclusive"""
+    timestamps = np.frombuffer(columns.timestamps, dtype=np.int64)
+    cents = np.frombuffer(columns.cents, dtype=np.int64)
+    users = np.frombuffer(columns.users, dtype=np.int64)
+    low = (start - date(1970, 1, 1)).days * MICROS_PER_DAY
+    high = ((end - date(1970, 1, 1)).days + 1) * MICROS_PER_DAY
+    in_range = (timestamps >= low) & (timestamps < high)
+    return timestamps[in_range], cents[in_range], users[in_range]
+
+
+def bucket_sums(timestamps: np.ndarray, cents: np.ndarray, groups: np.ndarray, group_count: int,
+                buckets: np.ndarray, interval: str) -> BucketedSpending:
+    """Sum and count amounts per (group, bucket) with a single bincount each"""
+    days = timestamps.astype("datetime64[us]").astype("datetime64[D]")
+    index = np.searchsorted(buckets, bucket_floor(days, interval))
+    flat = groups * len(buckets) + index
+    size = group_count * len(buckets)
+    # float64 sums are exact for totals below 2**53 cents
+    totals = np.rint(np.bincount(flat, weights=cents, minlength=size)).astype(np.int64)
+    counts = np.bincount(flat, minlength=size)
+    shape = (group_count, len(buckets))
+    return BucketedSpending(totals.reshape(shape), counts.reshape(shape))
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` buckets along the last axis (shorter windows at the start)"""
+    sums = np.cumsum(values, axis=-1, dtype=np.float64)
+    shifted = np.zeros_like(sums)
+    if window < values.shape[-1]:
+        shifted[..., window:] = sums[..., :-window]
+    sizes = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    return (sums - shifted) / sizes
+
+
+def percentiles(cents: np.ndarray) -> Dict[str, int]:
+    """p50/p90/p99 of amounts in cents (zeros when there are none)"""
+    if not len(cents):
+        return {f"p{p}": 0 for p in PERCENTILES}
+    values = np.rint(np.percentile(cents, PERCENTILES)).astype(np.int64)
+    return {f"p{p}": int(value) for p, value in zip(PERCENTILES, values)}
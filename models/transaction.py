@@ -2,8 +2,10 @@
 
 from datetime import datetime
 from decimal import Decimal
+from typing import List, Optional
 from uuid import uuid4
 from pydantic import BaseModel
+from models.money import to_cents, from_cents, split_cents
 
 
 class Transaction(BaseModel):
@@ -15,19 +17,20 @@ class Transaction(BaseModel):
     timestamp: datetime
 
     @classmethod
-    def create_spending_record(cls, user_id: str, amount: Decimal, description: str):
-        """Create individual spending record for budgeting"""
+    def create_spending_record(cls, user_id: str, amount: Decimal, description: str,
+                               timestamp: Optional[datetime] = None):
+        """Create individual spending record for budgeting, stamped now unless a time is given"""
         return cls(
             id=str(uuid4()),
             user_id=user_id,
             amount=amount,
             description=description,
-            timestamp=datetime.now()
+            timestamp=timestamp or datetime.now()
         )
 
 
 class GroupExpense(BaseModel):
-    """Group expense that creates debt between users"""
+    """Group expense that creates debt between the payer and the other participants"""
     id: str
     payer_id: str
     total_amount: Decimal
@@ -35,11 +38,19 @@ class GroupExpense(BaseModel):
     description: str
     timestamp: datetime
     is_settled: bool = False
+    participant_ids: List[str] = []  # Members splitting the bill (may include the payer)
+    settled_participant_ids: List[str] = []  # Participants whose share has been settled
 
     @classmethod
-    def create(cls, payer_id: str, total_amount: Decimal, description: str):
-        """Create a group expense split equally between two users with proper currency rounding"""
-        individual_share = Decimal(str(round(float(total_amount / 2), 2)))
+    def create(cls, payer_id: str, total_amount: Decimal, description: str, participant_ids: List[str]):
+        """Create a group expense split equally between participants in whole cents.
+        
+        Each share is rounded down to the cent and the payer absorbs the leftover cents.
+        """
+        if not participant_ids:
+            raise ValueError("An expense needs at least one participant")
+        share_cents, _ = split_cents(to_cents(total_amount), len(participant_ids))
+        individual_share = from_cents(share_cents)
         
         return cls(
             id=str(uuid4()),
@@ -47,5 +58,14 @@ class GroupExpense(BaseModel):
             total_amount=total_amount,
             individual_share=individual_share,
             description=description,
-            timestamp=datetime.now()
-        )
\ No newline at end of file
+            timestamp=datetime.now(),
+            participant_ids=list(participant_ids)
+        )
+
+    def debtor_ids(self) -> List[str]:
+        """Participants who owe the payer their share"""
+        return [user_id for user_id in self.participant_ids if user_id != self.payer_id]
+
+    def payer_share(self) -> Decimal:
+        """What the debtors' shares leave of the total, including any odd cents"""
+        return self.total_amount - self.individual_share * len(self.debtor_ids())
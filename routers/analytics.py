@@ -1,9 +1,14 @@
 """Simple analytics endpoint for spending insights"""
 
-from typing import Dict
+from datetime import date
+from typing import Dict, List, Literal, Optional
 from decimal import Decimal
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
+from models.money import from_cents
+from routers.dependencies import get_store
+
+MAX_BUCKETS = 10_000
 
 
 class Analytics(BaseModel):
@@ -11,35 +16,67 @@ class Analytics(BaseModel):
     total_transactions: int
     total_amount_spent: Decimal
     average_transaction: Decimal
+    smallest_transaction: Decimal = Decimal("0.00")
+    largest_transaction: Decimal = Decimal("0.00")
+    transaction_std_dev: Decimal = Decimal("0.00")
+    total_settlements: int = 0
+    total_amount_settled: Decimal = Decimal("0.00")
     user_balances: Dict[str, Decimal]
     debt_status: str
 
 
+class SpendingSeries(BaseModel):
+    """Spending per bucket with a trailing rolling average"""
+    totals: List[Decimal]
+    rolling_average: List[Decimal]
+
+
+class GroupSpendingSeries(SpendingSeries):
+    """Bills paid by the whole group per bucket"""
+    bill_counts: List[int]
+
+
+class UserSpendingSeries(SpendingSeries):
+    """A member's own spending (their shares) per bucket"""
+    user_id: str
+    name: str
+
+
+class TimeSeries(BaseModel):
+    """Bucketed spending over a date range"""
+    interval: str
+    start: date
+    end: date
+    buckets: List[date]
+    group: GroupSpendingSeries
+    users: List[UserSpendingSeries]
+    bill_size_percentiles: Dict[str, Decimal]
+
+
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/spending-insights", response_model=Analytics)
-def get_spending_insights():
-    """Get simple spending analytics"""
-    from main import store
-    
-    group_expenses = store.get_all_group_expenses()
+def get_spending_insights(store=Depends(get_store)):
+    """Get simple spending analytics from the store's running aggregates (constant time)"""
+    expense_stats = store.get_expense_stats()
+    settlement_stats = store.get_settlement_stats()
     users = store.get_all_users()
     
-    total_transactions = len(group_expenses)
-    total_amount = sum(expense.total_amount for expense in group_expenses)
+    total_transactions = expense_stats.count
+    total_amount = from_cents(expense_stats.total_cents)
     avg_amount = round(total_amount / total_transactions, 2) if total_transactions > 0 else Decimal("0.00")
     
     user_balances = {user.name: user.wallet_balance for user in users}
+    user_names = {user.id: user.name for user in users}
     
-    user_a, user_b = users[0], users[1]
-    a_owes_b = store.get_amount_owed(user_a.id, user_b.id)
-    b_owes_a = store.get_amount_owed(user_b.id, user_a.id)
-    
-    if a_owes_b > 0:
-        debt_status = f"{user_a.name} owes {user_b.name}: ${a_owes_b}"
-    elif b_owes_a > 0:
-        debt_status = f"{user_b.name} owes {user_a.name}: ${b_owes_a}"
+    outstanding_debts = store.get_outstanding_debts()
+    if len(outstanding_debts) == 1:
+        debtor_id, creditor_id, amount = outstanding_debts[0]
+        debt_status = f"{user_names.get(debtor_id, 'Unknown')} owes {user_names.get(creditor_id, 'Unknown')}: ${amount}"
+    elif outstanding_debts:
+        total_debt = sum(amount for _, _, amount in outstanding_debts)
+        debt_status = f"{len(outstanding_debts)} outstanding debts totalling ${total_debt}"
     else:
         debt_status = "No outstanding debts - all settled"
     
@@ -47,6 +84,82 @@ def get_spending_insights():
         total_transactions=total_transactions,
         total_amount_spent=total_amount,
         average_transaction=avg_amount,
+        smallest_transaction=from_cents(expense_stats.min_cents or 0),
+        largest_transaction=from_cents(expense_stats.max_cents or 0),
+        transaction_std_dev=from_cents(round(expense_stats.stddev)),
+        total_settlements=settlement_stats.count,
+        total_amount_settled=from_cents(settlement_stats.total_cents),
         user_balances=user_balances,
         debt_status=debt_status
-    )
\ No newline at end of file
+    )
+
+
+def _amounts(cents) -> List[Decimal]:
+    return [from_cents(value) for value in cents.tolist()]
+
+
+@router.get("/timeseries", response_model=TimeSeries)
+def get_spending_timeseries(
+    interval: Literal["day", "week", "month"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    window: int = Query(7, ge=1, le=366),
+    store=Depends(get_store)
+):
+    """Get group and per-user spending bucketed by day, week or month.
+    
+    Totals are computed with NumPy over the store's columnar history. The range
+    defaults to the first and last day with records; rolling averages cover the
+    trailing `window` buckets.
+    """
+    # NumPy is imported on first use so it stays out of the app's startup time
+    import numpy as np
+    from models import timeseries
+    
+    expense_columns = store.get_expense_columns()
+    spending_columns = store.get_spending_columns()
+    
+    if start is None or end is None:
+        first_day, last_day = timeseries.data_range(expense_columns, spending_columns) or (date.today(), date.today())
+        start = start or first_day
+        end = end or last_day
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date must not be after end date")
+    if timeseries.max_bucket_count(start, end, interval) > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Too many buckets. Maximum: {MAX_BUCKETS}")
+    
+    buckets = timeseries.bucket_range(start, end, interval)
+    
+    timestamps, bill_cents, _ = timeseries.select(expense_columns, start, end)
+    group = timeseries.bucket_sums(timestamps, bill_cents, np.zeros(len(timestamps), dtype=np.int64), 1, buckets, interval)
+    group_rolling = np.rint(timeseries.rolling_mean(group.totals, window)).astype(np.int64)
+    
+    timestamps, spent_cents, user_slots = timeseries.select(spending_columns, start, end)
+    spending = timeseries.bucket_sums(timestamps, spent_cents, user_slots, len(spending_columns.user_ids), buckets, interval)
+    spending_rolling = np.rint(timeseries.rolling_mean(spending.totals, window)).astype(np.int64)
+    slots = {user_id: slot for slot, user_id in enumerate(spending_columns.user_ids)}
+    
+    users = []
+    no_spending = np.zeros(len(buckets), dtype=np.int64)
+    for user in store.get_all_users():
+        slot = slots.get(user.id)
+        users.append(UserSpendingSeries(
+            user_id=user.id,
+            name=user.name,
+            totals=_amounts(no_spending if slot is None else spending.totals[slot]),
+            rolling_average=_amounts(no_spending if slot is None else spending_rolling[slot])
+        ))
+    
+    return TimeSeries(
+        interval=interval,
+        start=start,
+        end=end,
+        buckets=buckets.tolist(),
+        group=GroupSpendingSeries(
+            totals=_amounts(group.totals[0]),
+            rolling_average=_amounts(group_rolling[0]),
+            bill_counts=group.counts[0].tolist()
+        ),
+        users=users,
+        bill_size_percentiles={name: from_cents(cents) for name, cents in timeseries.percentiles(bill_cents).items()}
+    )
@@ -0,0 +1,80 @@
+"""Conditional GET support: ETags from the store version and cached response bodies"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from routers.serialization import TrustedJSONResponse
+
+MAX_CACHED_RESPONSES = 256
+
+
+class ResponseCache:
+    """Bounded LRU of serialized bodies, each tagged with the store version it was built at"""
+
+    def __init__(self, max_entries: int = MAX_CACHED_RESPONSES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str], version: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Tuple[str, str], version: int, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists the ETag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _serialize(payload: Any) -> bytes:
+    if isinstance(payload, bytes):
+        return payload
+    if isinstance(payload, BaseModel):
+        return payload.model_dump_json().encode()
+    return TrustedJSONResponse(jsonable_encoder(payload)).body
+
+
+def conditional_response(request: Request, store, build: Callable[[], Any]) -> Response:
+    """Serve a GET from the store version: 304 when the client is current, else a cached or fresh body.
+    
+    `build` returns the response model, a dict or pre-encoded JSON bytes, and is
+    only called when no body is cached for this URL at the current version.
+    """
+    version = store.version
+    etag = f'"{store.instance_id}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    key = (store.instance_id, f"{request.url.path}?{request.url.query}")
+    body = response_cache.get(key, version)
+    if body is None:
+        body = _serialize(build())
+        # A write that landed while building may be half in the body: tag it, but don't keep it
+        if store.version == version:
+            response_cache.put(key, version, body)
+    return TrustedJSONResponse(content=body, headers=headers)
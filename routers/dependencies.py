@@ -0,0 +1,44 @@
+"""Request dependencies - The ledger store and group registry of the app serving a request"""
+
+from typing import Optional
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+
+async def get_registry(request: Request):
+    """The app's registry of group ledgers"""
+    return request.app.state.registry
+
+
+async def get_group_id(request: Request) -> Optional[str]:
+    """The group whose ledger the request works on, None for the default ledger"""
+    return request.path_params.get("group_id")
+
+
+async def get_scheduler(request: Request):
+    """The app's recurring expense scheduler"""
+    return request.app.state.scheduler
+
+
+async def use_group_store(request: Request, group_id: str):
+    """Load the group's ledger for the request and keep it from being evicted until it finishes"""
+    registry = request.app.state.registry
+    try:
+        group_store = await run_in_threadpool(registry.acquire, group_id)
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=404, detail="Group not found")
+    request.state.group_store = group_store
+    try:
+        yield group_store
+    finally:
+        # Releasing may evict idle ledgers, which snapshots and closes them: keep that disk I/O off the loop
+        await run_in_threadpool(registry.release, group_id)
+
+
+async def get_store(request: Request):
+    """The ledger a request works on: its group's under /groups/{group_id}, else the app's default one.
+
+    Async so it resolves on the event loop instead of taking a threadpool hop.
+    Group routes list use_group_store as a router dependency, which runs first.
+    """
+    return getattr(request.state, "group_store", None) or request.app.state.store
@@ -0,0 +1,34 @@
+"""Group endpoints - Create independent ledgers served under /groups/{group_id}"""
+
+from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException
+from models.api_models import GroupCreateRequest, GroupResponse, LedgerRegistryStats
+from routers.dependencies import get_registry
+
+router = APIRouter(prefix="/groups", tags=["groups"])
+
+
+@router.post("/", response_model=GroupResponse)
+def create_group(request: GroupCreateRequest, registry=Depends(get_registry)):
+    """Creates a group with its own users, bills and settlements"""
+    group_id = request.group_id or uuid4().hex
+    try:
+        registry.create(group_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="Group ID must be 1-64 letters, digits, '-' or '_'"
+        )
+    except FileExistsError:
+        raise HTTPException(status_code=400, detail="Group already exists")
+    
+    return GroupResponse(
+        group_id=group_id,
+        message=f"Group created. Use /groups/{group_id}/... to work with its ledger"
+    )
+
+
+@router.get("/stats", response_model=LedgerRegistryStats)
+def get_registry_stats(registry=Depends(get_registry)):
+    """Shows how many group ledgers are loaded and the registry's hit/miss/eviction counters"""
+    return LedgerRegistryStats(**registry.stats())
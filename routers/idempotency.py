@@ -0,0 +1,167 @@
+"""Idempotency-Key support: replay the stored response of a repeated mutation instead of running it again"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# Keys are remembered for a day, and at most this many at once (oldest dropped first)
+TTL_SECONDS = 24 * 60 * 60
+MAX_KEYS = 10_000
+
+
+def fingerprint(body: bytes) -> bytes:
+    """Hash of a request body, taken over canonical JSON so key order and spacing do not matter"""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        # Not JSON: the handler will reject it, so any stable hash will do
+        canonical = body
+    return hashlib.sha256(canonical).digest()
+
+
+class _Entry:
+    """One key: in flight until `finished` is set, then holding the response to replay"""
+    __slots__ = ("fingerprint", "finished", "expires", "status_code", "headers", "body")
+
+    def __init__(self, fingerprint: bytes):
+        self.fingerprint = fingerprint
+        self.finished = asyncio.Event()
+        self.expires: Optional[float] = None
+        self.status_code = 0
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.body = b""
+
+    def replay(self) -> Response:
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = self.headers + [(b"idempotent-replayed", b"true")]
+        return response
+
+
+class IdempotencyCache:
+    """Responses of successful mutations by (path, key), expiring after `ttl` seconds.
+
+    Only touched from the event loop, so it needs no lock. A failed attempt recorded
+    nothing, so it is forgotten and the next request with its key runs again.
+    """
+
+    def __init__(self, ttl: float = TTL_SECONDS, max_keys: int = MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+
+    async def run(self, path: str, key: str, body: bytes, call: Callable[[], Awaitable[Response]]) -> Response:
+        """Replay the response stored for the key, wait for it while in flight, or run `call` once"""
+        body_fingerprint = fingerprint(body)
+        cache_key = (path, key)
+        while True:
+            self._expire()
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                break
+            if entry.fingerprint != body_fingerprint:
+                raise HTTPException(status_code=400, detail=f"{HEADER} was already used with a different request")
+            if entry.expires is not None:
+                return entry.replay()
+            await entry.finished.wait()
+
+        entry = self._entries[cache_key] = _Entry(body_fingerprint)
+        # The handler runs as its own task: a client that disconnects mid-request must not
+        # cancel it, or a write it completes would be forgotten and its retry applied twice
+        try:
+            task = asyncio.ensure_future(call())
+        except BaseException:
+            self._drop(cache_key, entry)
+            raise
+        task.add_done_callback(lambda done: self._finish(cache_key, entry, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, cache_key: Tuple[str, str], entry: _Entry, task: "asyncio.Future[Response]") -> None:
+        """Store a successful response for replay; anything else drops the key so a retry runs again"""
+        try:
+            response = None if task.cancelled() or task.exception() is not None else task.result()
+            if response is None or not 200 <= response.status_code < 300 or not hasattr(response, "body"):
+                self._drop(cache_key, entry)
+                return
+            entry.status_code = response.status_code
+            entry.headers = list(response.raw_headers)
+            entry.body = response.body
+            entry.expires = time.monotonic() + self.ttl
+            self._entries.move_to_end(cache_key)
+            entry.finished.set()
+        except BaseException:
+            self._drop(cache_key, entry)
+            raise
+        self._evict()
+
+    def _drop(self, cache_key: Tuple[str, str], entry: _Entry) -> None:
+        """Forget an in-flight key whose attempt failed and wake the duplicates waiting on it"""
+        if self._entries.get(cache_key) is entry:
+            del self._entries[cache_key]
+        entry.finished.set()
+
+    def _evict(self) -> None:
+        """Drop the oldest completed keys beyond `max_keys`.
+
+        Keys in flight are kept (a duplicate waiting on one would otherwise run the
+        mutation again), so the cache can exceed the cap by the requests in flight.
+        """
+        excess = len(self._entries) - self.max_keys
+        if excess <= 0:
+            return
+        evicted = []
+        for cache_key, entry in self._entries.items():
+            if entry.expires is not None:
+                evicted.append(cache_key)
+                if len(evicted) == excess:
+                    break
+        for cache_key in evicted:
+            del self._entries[cache_key]
+
+    def _expire(self) -> None:
+        """Drop expired keys; completed ones are in expiry order, behind any still in flight"""
+        now = time.monotonic()
+        expired = []
+        for cache_key, entry in self._entries.items():
+            if entry.expires is None:
+                continue
+            if entry.expires > now:
+                break
+            expired.append(cache_key)
+        for cache_key in expired:
+            del self._entries[cache_key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class IdempotentRoute(APIRoute):
+    """POST routes honouring an Idempotency-Key header, scoped to the request path (and so to the ledger).
+
+    Keys live in the serving app's `state.idempotency_cache`.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+        if "POST" not in self.methods:
+            return handler
+
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(HEADER)
+            if key is None:
+                return await handler(request)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters long"
+                )
+            cache = request.app.state.idempotency_cache
+            return await cache.run(request.url.path, key, await request.body(), lambda: handler(request))
+
+        return idempotent_handler
@@ -0,0 +1,168 @@
+"""Metrics endpoint - Request and store latency histograms in Prometheus text format"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+from fastapi import APIRouter, Request, Response
+
+router = APIRouter(tags=["metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds; each histogram allocates its bucket counters once
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STORE_BUCKETS = (0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+TIMED_STORE_METHODS = ("get_amount_owed", "add_settlement", "get_user_transactions")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observing costs a bisect and three increments"""
+    __slots__ = ("bounds", "counts", "total", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+
+    def render(self, name: str, labels: str, lines: List[str]) -> None:
+        """Append cumulative bucket, sum and count samples"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.total
+        prefix = f"{labels}," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.bounds, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+        braces = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{braces} {total:.9g}")
+        lines.append(f"{name}_count{braces} {cumulative}")
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """One app's request and store operation metrics"""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.store_operations = {name: Histogram(STORE_BUCKETS) for name in TIMED_STORE_METHODS}
+        self._lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route)
+        histogram = self.requests.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.requests.setdefault(key, Histogram(REQUEST_BUCKETS))
+        histogram.observe(seconds)
+        response_key = (method, route, status)
+        with self._lock:
+            self.responses[response_key] = self.responses.get(response_key, 0) + 1
+
+    def instrument_store(self, store):
+        """Time the hot store methods of one store instance; returns the store"""
+        for name, histogram in self.store_operations.items():
+            setattr(store, name, _timed(getattr(store, name), histogram))
+        return store
+
+    def render(self, store, registry) -> str:
+        lines: List[str] = []
+        lines.append("# HELP http_requests_total Responses by route template and status code.")
+        lines.append("# TYPE http_requests_total counter")
+        with self._lock:
+            responses = sorted(self.responses.items())
+            requests = sorted(self.requests.items())
+        for (method, route, status), count in responses:
+            lines.append(f'http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}')
+
+        lines.append("# HELP http_request_duration_seconds Request latency by route template.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route), histogram in requests:
+            histogram.render("http_request_duration_seconds", f'method="{method}",route="{_label(route)}"', lines)
+
+        lines.append("# HELP ledger_store_operation_duration_seconds Latency of hot store methods, across all ledgers.")
+        lines.append("# TYPE ledger_store_operation_duration_seconds histogram")
+        for name, histogram in self.store_operations.items():
+            histogram.render("ledger_store_operation_duration_seconds", f'operation="{name}"', lines)
+
+        lines.append("# HELP ledger_records Records held by the default ledger.")
+        lines.append("# TYPE ledger_records gauge")
+        for collection, count in store.get_sizes().items():
+            lines.append(f'ledger_records{{collection="{collection}"}} {count}')
+
+        stats = registry.stats()
+        lines.append("# HELP ledger_groups_loaded Group ledgers currently loaded in memory.")
+        lines.append("# TYPE ledger_groups_loaded gauge")
+        lines.append(f"ledger_groups_loaded {stats['loaded']}")
+        for counter in ("hits", "misses", "evictions"):
+            lines.append(f"# TYPE ledger_group_{counter}_total counter")
+            lines.append(f"ledger_group_{counter}_total {stats[counter]}")
+        return "\n".join(lines) + "\n"
+
+
+def _timed(method, histogram: Histogram):
+    @wraps(method)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return timed
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request, labelled by its route template (not the raw path)"""
+
+    def __init__(self, app, metrics: Metrics, group_prefix: str = ""):
+        self.app = app
+        self.metrics = metrics
+        # Routers included under a group prefix may report their unprefixed route
+        self.group_prefix = group_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.observe_request(scope["method"], self._route(scope), status, time.perf_counter() - start)
+
+    def _route(self, scope) -> str:
+        route = scope.get("route")
+        if route is None:
+            return "unmatched"
+        if self.group_prefix and "group_id" in scope.get("path_params", ()) and not route.path.startswith(self.group_prefix):
+            return self.group_prefix + route.path
+        return route.path
+
+
+@router.get("/metrics", response_class=Response)
+def get_metrics(request: Request):
+    """Exposes request, store and ledger size metrics for Prometheus"""
+    state = request.app.state
+    return Response(state.metrics.render(state.store, state.registry), media_type=CONTENT_TYPE)
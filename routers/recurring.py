@@ -0,0 +1,161 @@
+"""Recurring expense endpoints - Bills recorded automatically on a cron-style schedule"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from models.api_models import RecurringExpenseRequest, RecurringExpensesResponse
+from models.money import exact_cents, from_cents
+from models.recurring import RecurringExpense
+from routers.dependencies import get_group_id, get_scheduler, get_store
+from routers.idempotency import IdempotentRoute
+from storage.recurring import LedgerOpener, RecurringBook
+from storage.records import local_time
+
+router = APIRouter(prefix="/recurring", tags=["recurring"], route_class=IdempotentRoute)
+
+# Longest sleep between looks at the next run, so a changed wall clock or a book changed by another worker is noticed
+MAX_SLEEP_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+def ledger_opener(store, registry) -> LedgerOpener:
+    """Open the default ledger or, pinned against eviction, a group's (None when the group is unknown)"""
+    @contextmanager
+    def open_ledger(group_id: Optional[str]):
+        if group_id is None:
+            yield store
+            return
+        try:
+            group_store = registry.acquire(group_id)
+        except (KeyError, ValueError):
+            yield None
+            return
+        try:
+            yield group_store
+        finally:
+            registry.release(group_id)
+    return open_ledger
+
+
+class RecurringScheduler:
+    """Background task that records recurring bills as they fall due.
+
+    It sleeps until the earliest next run (the top of the book's heap) or until a
+    definition changes, then records every due run on the threadpool in batches,
+    so after downtime the missed runs are caught up oldest first without a pass
+    over the definitions that are not due.
+    """
+
+    def __init__(self, book: RecurringBook, open_ledger: LedgerOpener):
+        self.book = book
+        self.open_ledger = open_ledger
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Finish the batch being recorded, then stop"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    def wake(self) -> None:
+        """Look at the next run again; callable from any thread"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await run_in_threadpool(self.book.materialize, self.open_ledger)
+                next_run = await run_in_threadpool(self.book.next_due)
+            except Exception:
+                logger.exception("Recording recurring expenses failed; retrying in %.0fs", MAX_SLEEP_SECONDS)
+                next_run = None
+            delay = MAX_SLEEP_SECONDS
+            if next_run is not None:
+                delay = min(delay, (next_run - datetime.now()).total_seconds())
+            if delay > 0 and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+
+@router.post("/", response_model=RecurringExpense)
+def create_recurring_expense(request: RecurringExpenseRequest, store=Depends(get_store),
+                             group_id: Optional[str] = Depends(get_group_id), scheduler=Depends(get_scheduler)):
+    """Records a bill on every run of a cron schedule, e.g. rent at "0 9 1 * *" (09:00 on the 1st)"""
+    if request.total_amount <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Transaction amount must be positive. Received: ${request.total_amount}"
+        )
+    cents = exact_cents(request.total_amount)
+    if cents is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Transaction amount must be in whole cents. Received: ${request.total_amount}"
+        )
+    
+    try:
+        store.get_user(request.payer_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Payer not found")
+    
+    # Split between the requested participants, or everyone in the group now
+    participant_ids = request.participant_ids or [user.id for user in store.get_all_users()]
+    if len(set(participant_ids)) != len(participant_ids):
+        raise HTTPException(status_code=400, detail="Participants must be unique")
+    try:
+        for participant_id in participant_ids:
+            store.get_user(participant_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Participant not found")
+    
+    start = local_time(request.start) if request.start is not None else datetime.now()
+    try:
+        definition = RecurringExpense.create(group_id, request.payer_id, from_cents(cents), request.description,
+                                             participant_ids, request.schedule, start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # The scheduler updates the stored definition from now on, so respond with it as created
+    response = definition.model_copy()
+    scheduler.book.add(definition, store)
+    scheduler.wake()
+    return response
+
+
+@router.get("/", response_model=RecurringExpensesResponse)
+def get_recurring_expenses(group_id: Optional[str] = Depends(get_group_id), scheduler=Depends(get_scheduler)):
+    """Lists the ledger's recurring bills with their next run and how many were recorded or skipped"""
+    return RecurringExpensesResponse(recurring=scheduler.book.list(group_id))
+
+
+@router.delete("/{recurring_id}", response_model=RecurringExpense)
+def delete_recurring_expense(recurring_id: str, group_id: Optional[str] = Depends(get_group_id),
+                             scheduler=Depends(get_scheduler)):
+    """Stops a recurring bill; bills already recorded stay in the ledger"""
+    definition = scheduler.book.remove(recurring_id, group_id)
+    if definition is None:
+        raise HTTPException(status_code=404, detail="Recurring expense not found")
+    
+    scheduler.wake()
+    return definition
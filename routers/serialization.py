@@ -0,0 +1,65 @@
+"""Fast JSON encoding for large list responses.
+
+Rows are encoded once per record and reused: spending records never change,
+and an expense only changes its trailing is_settled flag. Responses are
+assembled from those byte fragments and sent as trusted output, skipping
+response_model validation.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+from fastapi import Response
+from models.money import format_amount
+
+
+class TrustedJSONResponse(Response):
+    """JSON response for bodies the server assembled itself (bytes are sent as-is)"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode(value: Any) -> bytes:
+    """Compact JSON for a plain value"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def array(fragments: Iterable[bytes]) -> bytes:
+    """JSON array from already-encoded elements"""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def spending_row(transaction) -> bytes:
+    """Encoded spending record for a user's transaction list"""
+    fragment = getattr(transaction, "json_fragment", None)
+    if fragment is None:
+        fragment = encode({
+            "id": transaction.id,
+            "amount": format_amount(transaction.amount),
+            "description": transaction.description,
+            "timestamp": transaction.timestamp.isoformat()
+        })
+        if hasattr(transaction, "json_fragment"):
+            transaction.json_fragment = fragment
+    return fragment
+
+
+def expense_row(expense, user_names: Dict[str, str]) -> bytes:
+    """Encoded group expense for the transaction history"""
+    prefix: Optional[bytes] = getattr(expense, "json_prefix", None)
+    if prefix is None:
+        row = encode({
+            "id": expense.id,
+            "payer": user_names.get(expense.payer_id, "Unknown"),
+            "total_amount": format_amount(expense.total_amount),
+            "individual_share": format_amount(expense.individual_share),
+            "description": expense.description,
+            "timestamp": expense.timestamp.isoformat()
+        })
+        prefix = row[:-1] + b',"is_settled":'
+        if hasattr(expense, "json_prefix"):
+            expense.json_prefix = prefix
+    return prefix + (b"true}" if expense.is_settled else b"false}")
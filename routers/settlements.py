@@ -1,59 +1,76 @@
 """Settlement endpoints - Allows users to settle outstanding balances"""
 
-from fastapi import APIRouter, HTTPException
-from models.api_models import SettlementRequest, SettlementResponse
-from models.settlement import Settlement
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from models.api_models import SettlementRequest, SettlementResponse, SettlementPlanResponse, PlannedTransfer
+from models.money import exact_cents, format_amount, from_cents
+from models.settlement import Settlement, simplify_debts
+from routers.conditional import conditional_response
+from routers.dependencies import get_store
+from routers.idempotency import IdempotentRoute
 
-router = APIRouter(prefix="/settle", tags=["settlements"])
+router = APIRouter(prefix="/settle", tags=["settlements"], route_class=IdempotentRoute)
 
 
 @router.post("/", response_model=SettlementResponse)
-def settle_debt(request: SettlementRequest):
+def settle_debt(request: SettlementRequest, store=Depends(get_store)):
     """Allows a user to settle their outstanding balance"""
-    from main import store
-    
     # Edge Case 7: Negative Settlement Amount - Prevent negative or zero settlement amounts
     if request.amount <= 0:
         raise HTTPException(
             status_code=400,
             detail=f"Settlement amount must be positive. Received: ${request.amount}"
         )
+    cents = exact_cents(request.amount)
+    if cents is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Settlement amount must be in whole cents. Received: ${request.amount}"
+        )
+    amount = from_cents(cents)
     
     # Edge Case 2: Invalid User ID - Ensure both users exist in the system  
     try:
-        from_user = store.get_user(request.from_user_id)
+        store.get_user(request.from_user_id)
         store.get_user(request.to_user_id)  # Validate user exists
     except KeyError:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Edge Case 1: Insufficient Settlement Funds - Ensure settling user has enough money in wallet
-    if from_user.wallet_balance < request.amount:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient funds. Available: ${from_user.wallet_balance}, Required: ${request.amount}"
-        )
-    
-    amount_owed = store.get_amount_owed(request.from_user_id, request.to_user_id)
-    # Edge Case 3: No Debt Settlement - Prevent settling when no money is actually owed
-    if amount_owed == 0:
-        raise HTTPException(status_code=400, detail="No outstanding debt to settle")
-    
-    # Edge Case 4: Excessive Settlement - Prevent settling more than what is actually owed  
-    if request.amount > amount_owed:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Settlement amount ${request.amount} exceeds debt of ${amount_owed}"
+    # Check and apply under the group's write lock so concurrent settlements cannot
+    # overdraw the wallet or settle the same debt twice
+    with store.write_lock:
+        from_user = store.get_user(request.from_user_id)
+        
+        # Edge Case 1: Insufficient Settlement Funds - Ensure settling user has enough money in wallet
+        if from_user.wallet_balance < amount:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient funds. Available: ${from_user.wallet_balance}, Required: ${amount}"
+            )
+        
+        amount_owed = store.get_amount_owed(request.from_user_id, request.to_user_id)
+        # Edge Case 3: No Debt Settlement - Prevent settling when no money is actually owed
+        if amount_owed == 0:
+            raise HTTPException(status_code=400, detail="No outstanding debt to settle")
+        
+        # Edge Case 4: Excessive Settlement - Prevent settling more than what is actually owed  
+        if amount > amount_owed:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Settlement amount ${amount} exceeds debt of ${amount_owed}"
+            )
+        
+        settlement = Settlement.create(
+            from_user_id=request.from_user_id,
+            to_user_id=request.to_user_id,
+            amount=amount
         )
-    
-    settlement = Settlement.create(
-        from_user_id=request.from_user_id,
-        to_user_id=request.to_user_id,
-        amount=request.amount
-    )
-    
-    store.add_settlement(settlement)
-    updated_from_user = store.get_user(request.from_user_id)
-    updated_to_user = store.get_user(request.to_user_id)
+        
+        store.add_settlement(settlement)
+        updated_from_user = store.get_user(request.from_user_id)
+        updated_to_user = store.get_user(request.to_user_id)
     
     return SettlementResponse(
         settlement_id=settlement.id,
@@ -63,36 +80,91 @@ def settle_debt(request: SettlementRequest):
         timestamp=settlement.timestamp,
         from_user_new_balance=updated_from_user.wallet_balance,
         to_user_new_balance=updated_to_user.wallet_balance,
-        message=f"Settlement of ${float(settlement.amount):.2f} processed successfully"
+        message=f"Settlement of ${format_amount(settlement.amount)} processed successfully"
     )
 
 
 @router.get("/status", response_model=dict)
-def get_settlement_status():
-    """View current debt positions between users"""
-    from main import store
-    
-    users = store.get_all_users()
-    user_a, user_b = users[0], users[1]
-    
-    # Calculate debt between users
-    a_owes_b = store.get_amount_owed(user_a.id, user_b.id)
-    b_owes_a = store.get_amount_owed(user_b.id, user_a.id)
+def get_settlement_status(request: Request, as_of: Optional[datetime] = None, store=Depends(get_store)):
+    """View debt positions between users, now or as of a past moment (conditional on If-None-Match)"""
+    if as_of is not None:
+        return conditional_response(request, store, lambda: _settlement_status(store.get_ledger_at(as_of)))
+    return conditional_response(request, store, lambda: _settlement_status(store))
+
+
+def _settlement_status(store) -> dict:
+    """Build the debt summary and settlement history payload"""
+    user_names = {user.id: user.name for user in store.get_all_users()}
+    outstanding_debts = store.get_outstanding_debts()
     
     return {
         "debt_summary": {
-            f"{user_a.name} owes {user_b.name}": f"{float(a_owes_b):.2f}",
-            f"{user_b.name} owes {user_a.name}": f"{float(b_owes_a):.2f}"
+            f"{user_names.get(debtor_id, 'Unknown')} owes {user_names.get(creditor_id, 'Unknown')}": format_amount(amount)
+            for debtor_id, creditor_id, amount in outstanding_debts
         },
-        "total_outstanding_debt": f"{float(a_owes_b + b_owes_a):.2f}",
+        "total_outstanding_debt": format_amount(sum((amount for _, _, amount in outstanding_debts), Decimal("0.00"))),
         "settlements": [
             {
                 "id": settlement.id,
                 "from_user": settlement.from_user_id,
                 "to_user": settlement.to_user_id,
-                "amount": f"{float(settlement.amount):.2f}",
+                "amount": format_amount(settlement.amount),
                 "timestamp": settlement.timestamp.isoformat()
             }
             for settlement in store.get_all_settlements()
         ]
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/plan", response_model=SettlementPlanResponse)
+def get_settlement_plan(store=Depends(get_store)):
+    """Suggest the fewest transfers that clear every outstanding debt in the group"""
+    return _plan_response(store, simplify_debts(store.get_net_balances()))
+
+
+@router.post("/plan", response_model=SettlementPlanResponse)
+def apply_settlement_plan(store=Depends(get_store)):
+    """Carry out the settlement plan, clearing every outstanding debt in the group.
+    
+    Members pay what GET /settle/plan suggests. A planned transfer can skip members
+    whose debts and credits cancel out, so the ledger records a settlement for every
+    pairwise debt instead; each wallet moves by the same amount either way.
+    """
+    with store.write_lock:
+        net_balances = store.get_net_balances()
+        for user in store.get_all_users():
+            required = -net_balances.get(user.id, Decimal("0.00"))
+            if user.wallet_balance < required:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Insufficient funds for {user.name}. Available: ${user.wallet_balance}, Required: ${required}"
+                )
+        
+        transfers = simplify_debts(net_balances)
+        # Net debtors pay first, so members in the middle of a chain are paid before they pay on
+        debts = sorted(store.get_outstanding_debts(), key=lambda debt: net_balances.get(debt[0], Decimal("0.00")))
+        for debtor_id, creditor_id, amount in debts:
+            store.add_settlement(Settlement.create(debtor_id, creditor_id, amount))
+    
+    return _plan_response(store, transfers)
+
+
+def _plan_response(store, transfers) -> SettlementPlanResponse:
+    """Describe planned (from_user_id, to_user_id, amount) transfers with member names"""
+    user_names = {user.id: user.name for user in store.get_all_users()}
+    planned = [
+        PlannedTransfer(
+            from_user_id=from_user_id,
+            from_user=user_names.get(from_user_id, "Unknown"),
+            to_user_id=to_user_id,
+            to_user=user_names.get(to_user_id, "Unknown"),
+            amount=amount
+        )
+        for from_user_id, to_user_id, amount in transfers
+    ]
+    
+    return SettlementPlanResponse(
+        transfers=planned,
+        transfer_count=len(planned),
+        total_amount=sum((transfer.amount for transfer in planned), Decimal("0.00"))
+    )
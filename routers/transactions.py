@@ -1,48 +1,94 @@
 """Transactions endpoints matching exact requirements"""
 
-from typing import List
-from fastapi import APIRouter, HTTPException
-from models.api_models import TransactionRequest, TransactionResponse
+import base64
+from decimal import Decimal
+from typing import Dict, Iterator, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from models.api_models import TransactionRequest, TransactionResponse, TransactionsPage, BatchTransactionResponse
+from models.money import exact_cents, format_amount, from_cents
 from models.transaction import GroupExpense
+from routers.conditional import conditional_response
+from routers.dependencies import get_store
+from routers.idempotency import IdempotentRoute
+from routers.serialization import array, encode, expense_row
+from storage.search import MAX_TERMS, SearchPosition, query_terms
 
-router = APIRouter(prefix="/transactions", tags=["transactions"])
+router = APIRouter(prefix="/transactions", tags=["transactions"], route_class=IdempotentRoute)
+
+MAX_BATCH_SIZE = 10_000
 
 
 @router.post("/", response_model=TransactionResponse)
-def create_transaction(request: TransactionRequest):
+def create_transaction(request: TransactionRequest, store=Depends(get_store)):
     """Records a bill payment: who paid, total amount"""
-    from main import store
-    
     # Edge Case 5: Negative Transaction Amount - Prevent negative or zero transaction amounts
     if request.total_amount <= 0:
         raise HTTPException(
             status_code=400,
             detail=f"Transaction amount must be positive. Received: ${request.total_amount}"
         )
+    # Amounts are booked in whole cents, so a fraction of a cent is rejected rather than rounded away
+    cents = exact_cents(request.total_amount)
+    if cents is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Transaction amount must be in whole cents. Received: ${request.total_amount}"
+        )
+    total_amount = from_cents(cents)
     
     # Edge Case 2: Invalid User ID - Ensure payer exists in the system
     try:
-        payer = store.get_user(request.payer_id)
+        store.get_user(request.payer_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="Payer not found")
     
-    # Edge Case 1: Insufficient Transaction Funds - Ensure payer has enough money in wallet
-    if payer.wallet_balance < request.total_amount:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Insufficient funds. Available: ${payer.wallet_balance}, Required: ${request.total_amount}"
-        )
+    # Split between the requested participants, or the whole group by default
+    participant_ids = request.participant_ids or [user.id for user in store.get_all_users()]
+    if len(set(participant_ids)) != len(participant_ids):
+        raise HTTPException(status_code=400, detail="Participants must be unique")
+    try:
+        for participant_id in participant_ids:
+            store.get_user(participant_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Participant not found")
     
     group_expense = GroupExpense.create(
         payer_id=request.payer_id,
-        total_amount=request.total_amount,
-        description=request.description
+        total_amount=total_amount,
+        description=request.description,
+        participant_ids=participant_ids
     )
     
-    store.add_group_expense(group_expense)
-    updated_payer = store.get_user(request.payer_id)
-    other_user = store.get_other_user(request.payer_id)
-    amount_owed = store.get_amount_owed(other_user.id, request.payer_id)
+    # Check and apply under the group's write lock so concurrent bills cannot overdraw a wallet
+    with store.write_lock:
+        payer = store.get_user(request.payer_id)
+        
+        # Edge Case 1: Insufficient Transaction Funds - Ensure payer has enough money in wallet
+        if payer.wallet_balance < total_amount:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Insufficient funds. Available: ${payer.wallet_balance}, Required: ${total_amount}"
+            )
+        
+        try:
+            store.add_group_expense(group_expense)
+        except ValueError as e:
+            # Storage limits, e.g. the participant cap of fixed-size mapped ledger records
+            raise HTTPException(status_code=400, detail=str(e))
+        updated_payer = store.get_user(request.payer_id)
+        debtor_ids = group_expense.debtor_ids()
+        amount_owed = sum(
+            (store.get_amount_owed(debtor_id, request.payer_id) for debtor_id in debtor_ids),
+            Decimal("0.00")
+        )
+    
+    if not debtor_ids:
+        owed_message = "Nothing is owed to the payer"
+    elif len(debtor_ids) == 1:
+        owed_message = f"Other user owes ${format_amount(group_expense.individual_share)}"
+    else:
+        owed_message = f"{len(debtor_ids)} participants each owe ${format_amount(group_expense.individual_share)}"
     
     return TransactionResponse(
         group_expense_id=group_expense.id,
@@ -51,31 +97,202 @@ def create_transaction(request: TransactionRequest):
         individual_share=group_expense.individual_share,
         description=group_expense.description,
         timestamp=group_expense.timestamp,
+        participant_ids=group_expense.participant_ids,
         payer_new_wallet_balance=updated_payer.wallet_balance,
         amount_owed_by_other=amount_owed,
-        message=f"Bill payment recorded. Other user owes ${float(group_expense.individual_share):.2f}"
+        message=f"Bill payment recorded. {owed_message}"
+    )
+
+
+@router.post("/batch", response_model=BatchTransactionResponse)
+def create_transactions_batch(requests: List[TransactionRequest], store=Depends(get_store)):
+    """Records many bill payments at once - either all are recorded or none are"""
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one transaction")
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large. Maximum: {MAX_BATCH_SIZE}, Received: {len(requests)}"
+        )
+    
+    # Validation reads the wallets, so the whole batch is checked and applied under the write lock
+    with store.write_lock:
+        users = {user.id: user for user in store.get_all_users()}
+        all_user_ids = list(users)
+        payer_totals: Dict[str, Decimal] = {}
+        amounts = [exact_cents(request.total_amount) for request in requests]
+        errors = []
+        
+        # Validate everything in one pass; wallet checks are cumulative across the batch
+        for index, request in enumerate(requests):
+            participant_ids = request.participant_ids or all_user_ids
+            if request.total_amount <= 0:
+                errors.append({"index": index, "error": f"Transaction amount must be positive. Received: ${request.total_amount}"})
+            elif amounts[index] is None:
+                errors.append({"index": index, "error": f"Transaction amount must be in whole cents. Received: ${request.total_amount}"})
+            elif request.payer_id not in users:
+                errors.append({"index": index, "error": "Payer not found"})
+            elif len(set(participant_ids)) != len(participant_ids):
+                errors.append({"index": index, "error": "Participants must be unique"})
+            elif any(participant_id not in users for participant_id in participant_ids):
+                errors.append({"index": index, "error": "Participant not found"})
+            else:
+                spent = payer_totals.get(request.payer_id, Decimal("0.00")) + from_cents(amounts[index])
+                available = users[request.payer_id].wallet_balance
+                if available < spent:
+                    errors.append({"index": index, "error": f"Insufficient funds. Available: ${available}, Required: ${spent}"})
+                payer_totals[request.payer_id] = spent
+        
+        if errors:
+            raise HTTPException(status_code=400, detail={"message": "Batch rejected, nothing was recorded", "errors": errors})
+        
+        group_expenses = [
+            GroupExpense.create(
+                payer_id=request.payer_id,
+                total_amount=from_cents(cents),
+                description=request.description,
+                participant_ids=request.participant_ids or all_user_ids
+            )
+            for request, cents in zip(requests, amounts)
+        ]
+        try:
+            store.add_group_expenses(group_expenses)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        payer_new_wallet_balances = {payer_id: store.get_user(payer_id).wallet_balance for payer_id in payer_totals}
+    
+    total_amount = sum(payer_totals.values(), Decimal("0.00"))
+    return BatchTransactionResponse(
+        recorded=len(group_expenses),
+        total_amount=total_amount,
+        payer_totals=payer_totals,
+        payer_new_wallet_balances=payer_new_wallet_balances,
+        message=f"Recorded {len(group_expenses)} bill payments totalling ${format_amount(total_amount)}"
     )
 
 
-@router.get("/", response_model=List[dict])
-def get_transactions():
-    """Lists all past transactions with who paid and splits"""
-    from main import store
-    
-    group_expenses = store.get_all_group_expenses()
-    users = store.get_all_users()
-    user_names = {user.id: user.name for user in users}
-    
-    result = []
-    for expense in group_expenses:
-        result.append({
-            "id": expense.id,
-            "payer": user_names.get(expense.payer_id, "Unknown"),
-            "total_amount": f"{float(expense.total_amount):.2f}",
-            "individual_share": f"{float(expense.individual_share):.2f}",
-            "description": expense.description,
-            "timestamp": expense.timestamp.isoformat(),
-            "is_settled": expense.is_settled
-        })
-    
-    return result
\ No newline at end of file
+def _encode_cursor(position: int, expense: GroupExpense) -> str:
+    """Opaque cursor pointing at the next expense to return"""
+    return base64.urlsafe_b64encode(f"{position}:{expense.id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str, store) -> int:
+    """Resolve a cursor to a position, rejecting cursors from a previous ledger"""
+    try:
+        position_text, expense_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+        position = int(position_text)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    expense = store.get_group_expense_at(position)
+    if expense is None or expense.id != expense_id:
+        raise HTTPException(status_code=400, detail="Cursor is no longer valid")
+    return position
+
+
+@router.get("/", response_model=TransactionsPage)
+def get_transactions(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    order: Literal["newest", "oldest"] = "newest",
+    format: Literal["json", "ndjson"] = "json",
+    store=Depends(get_store)
+):
+    """Lists past transactions with who paid and splits, one page at a time.
+    
+    Pass the returned next_cursor to fetch the following page. With format=ndjson
+    every row from the cursor onwards is streamed, one JSON object per line. JSON
+    pages honour If-None-Match and are cached until the ledger changes.
+    """
+    start = _decode_cursor(cursor, store) if cursor else None
+    newest_first = order == "newest"
+    
+    if format == "ndjson":
+        user_names = {user.id: user.name for user in store.get_all_users()}
+        
+        def stream_rows() -> Iterator[bytes]:
+            for _, expense in store.iter_group_expenses(start, newest_first):
+                yield expense_row(expense, user_names) + b"\n"
+        
+        return StreamingResponse(stream_rows(), media_type="application/x-ndjson")
+    
+    return conditional_response(request, store, lambda: _transactions_page(store, start, newest_first, limit))
+
+
+def _transactions_page(store, start: Optional[int], newest_first: bool, limit: int) -> bytes:
+    """Encode one page of the transaction history from cached expense rows"""
+    user_names = {user.id: user.name for user in store.get_all_users()}
+    
+    # Read one row past the page so we know where the next page starts
+    rows = []
+    next_cursor = None
+    for position, expense in store.iter_group_expenses(start, newest_first):
+        if len(rows) == limit:
+            next_cursor = _encode_cursor(position, expense)
+            break
+        rows.append(expense_row(expense, user_names))
+    
+    return b'{"transactions":' + array(rows) + b',"next_cursor":' + encode(next_cursor) + b"}"
+
+
+@router.get("/search", response_model=TransactionsPage)
+def search_transactions(
+    request: Request,
+    q: str = Query(..., max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    store=Depends(get_store)
+):
+    """Finds past transactions by the words of their description, best matches first.
+    
+    Every word of q must start a word of the description ("ub rid" finds "Uber ride").
+    Whole-word matches rank above prefix matches, newer transactions above older
+    ones. Pass the returned next_cursor to fetch the following page.
+    """
+    terms = query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain at least one word")
+    if len(terms) > MAX_TERMS:
+        raise HTTPException(status_code=400, detail=f"Search query too long. Maximum: {MAX_TERMS} words")
+    
+    after = _decode_search_cursor(cursor, store) if cursor else None
+    return conditional_response(request, store, lambda: _search_page(store, q, after, limit))
+
+
+def _encode_search_cursor(result: SearchPosition, expense: GroupExpense) -> str:
+    """Opaque cursor pointing just behind the last search result returned"""
+    return base64.urlsafe_b64encode(f"{result[0]}:{result[1]}:{expense.id}".encode()).decode()
+
+
+def _decode_search_cursor(cursor: str, store) -> SearchPosition:
+    """Resolve a search cursor, rejecting cursors from a previous ledger"""
+    try:
+        tier_text, position_text, expense_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 2)
+        result = (int(tier_text), int(position_text))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    expense = store.get_group_expense_at(result[1])
+    if expense is None or expense.id != expense_id:
+        raise HTTPException(status_code=400, detail="Cursor is no longer valid")
+    return result
+
+
+def _search_page(store, query: str, after: Optional[SearchPosition], limit: int) -> bytes:
+    """Encode one page of search results from cached expense rows"""
+    user_names = {user.id: user.name for user in store.get_all_users()}
+    
+    # Fetch one result past the page so we know whether another page follows
+    rows = []
+    last = None
+    next_cursor = None
+    for result, expense in store.search_group_expenses(query, after):
+        if len(rows) == limit:
+            next_cursor = _encode_search_cursor(*last)
+            break
+        rows.append(expense_row(expense, user_names))
+        last = (result, expense)
+    
+    return b'{"transactions":' + array(rows) + b',"next_cursor":' + encode(next_cursor) + b"}"
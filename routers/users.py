@@ -1,44 +1,67 @@
-"""Users endpoint - Returns both users' transactions and balances"""
+"""Users endpoint - Returns every member's transactions and balances"""
 
-from fastapi import APIRouter
-from models.api_models import UsersResponse, UserResponse
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from models.api_models import UsersResponse, UserResponse, UserCreateRequest
+from models.money import exact_cents, format_amount, from_cents
+from routers.conditional import conditional_response
+from routers.dependencies import get_store
+from routers.serialization import array, encode, spending_row
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/", response_model=UsersResponse)
-def get_users():
-    """Returns both users' transactions and balances"""
-    from main import store
+def get_users(request: Request, as_of: Optional[datetime] = None, store=Depends(get_store)):
+    """Returns every member's transactions and balances (conditional on If-None-Match).
     
-    users = store.get_all_users()
-    user_responses = []
-    
-    for user in users:
-        user_transactions = []
-        for transaction in store.get_user_transactions(user.id):
-            user_transactions.append({
-                "id": transaction.id,
-                "amount": f"{float(transaction.amount):.2f}",
-                "description": transaction.description,
-                "timestamp": transaction.timestamp.isoformat()
-            })
-        
-        other_user = store.get_other_user(user.id)
-        amount_owed_to_me = store.get_amount_owed(other_user.id, user.id)
-        amount_i_owe = store.get_amount_owed(user.id, other_user.id)
-        net_balance = amount_owed_to_me - amount_i_owe
-        
-        total_spent = store.get_user_spending_total(user.id)
-        
-        user_response = UserResponse(
-            id=user.id,
-            name=user.name,
-            wallet_balance=user.wallet_balance,
-            total_spent=total_spent,
-            transactions=user_transactions,
-            net_balance=net_balance
+    With as_of, wallets, spending and net balances are those at that moment.
+    """
+    if as_of is not None:
+        return conditional_response(request, store, lambda: _users_response(store.get_ledger_at(as_of)))
+    return conditional_response(request, store, lambda: _users_response(store))
+
+
+def _users_response(store) -> bytes:
+    """Encode the full users payload, reusing each spending record's cached row"""
+    users = []
+    for user in store.get_all_users():
+        users.append(b"".join((
+            b'{"id":', encode(user.id),
+            b',"name":', encode(user.name),
+            b',"wallet_balance":', encode(format_amount(user.wallet_balance)),
+            b',"total_spent":', encode(format_amount(store.get_user_spending_total(user.id))),
+            b',"transactions":', array(map(spending_row, store.get_user_transactions(user.id))),
+            b',"net_balance":', encode(format_amount(store.get_net_balance(user.id))),
+            b"}"
+        )))
+    return b'{"users":' + array(users) + b"}"
+
+
+@router.post("/", response_model=UserResponse)
+def create_user(request: UserCreateRequest, store=Depends(get_store)):
+    """Adds a member to the group"""
+    if not request.name.strip():
+        raise HTTPException(status_code=400, detail="User name must not be empty")
+    if request.wallet_balance < 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Wallet balance cannot be negative. Received: ${request.wallet_balance}"
+        )
+    cents = exact_cents(request.wallet_balance)
+    if cents is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Wallet balance must be in whole cents. Received: ${request.wallet_balance}"
         )
-        user_responses.append(user_response)
     
-    return UsersResponse(users=user_responses)
\ No newline at end of file
+    user = store.add_user(request.name.strip(), from_cents(cents))
+    return UserResponse(
+        id=user.id,
+        name=user.name,
+        wallet_balance=user.wallet_balance,
+        total_spent=store.get_user_spending_total(user.id),
+        transactions=[],
+        net_balance=store.get_net_balance(user.id)
+    )
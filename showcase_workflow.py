@@ -158,6 +158,21 @@ def handle_reset():
     except ValueError:
         print("Invalid amount entered")
 
+def show_transaction_history():
+    """Page through the transaction history, newest first, following next_cursor"""
+    params = {"limit": 10}
+    while True:
+        response = requests.get(f"{BASE_URL}/transactions", params=params)
+        print_response(response)
+        if response.status_code != 200:
+            return
+        next_cursor = response.json()["next_cursor"]
+        if next_cursor is None:
+            return
+        if input("\nShow the next page? (y/n): ").strip().lower() not in ["y", "yes"]:
+            return
+        params["cursor"] = next_cursor
+
 def test_edge_cases():
     """Test various edge cases"""
     print_header("EDGE CASE TESTING")
@@ -316,8 +331,7 @@ def main():
                 
             elif command == "3":
                 print_header("TRANSACTION HISTORY")
-                response = requests.get(f"{BASE_URL}/transactions")
-                print_response(response)
+                show_transaction_history()
                 
             elif command == "4":
                 print_header("SETTLE DEBT")
@@ -0,0 +1,63 @@
+"""Running aggregates kept by the stores so analytics never rescan the history"""
+
+import math
+from typing import Optional
+
+
+class RunningStats:
+    """Count, sum, min, max, mean and variance of integer-cent amounts, updated in O(1).
+    
+    Mean and variance use Welford's online algorithm, which stays numerically
+    stable however many amounts are added.
+    """
+    __slots__ = ("count", "total_cents", "min_cents", "max_cents", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total_cents = 0
+        self.min_cents: Optional[int] = None
+        self.max_cents: Optional[int] = None
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @classmethod
+    def from_values(cls, count: int, total_cents: int, min_cents: Optional[int], max_cents: Optional[int],
+                    sum_squares: int) -> "RunningStats":
+        """Build from SQL-style aggregates (the sum of squared amounts gives the variance)"""
+        stats = cls()
+        stats.count = count
+        stats.total_cents = total_cents
+        stats.min_cents = min_cents
+        stats.max_cents = max_cents
+        if count:
+            stats.mean = total_cents / count
+            stats.m2 = max(sum_squares - total_cents * total_cents / count, 0.0)
+        return stats
+
+    def add(self, cents: int) -> None:
+        """Fold one amount into the aggregates"""
+        self.count += 1
+        self.total_cents += cents
+        if self.min_cents is None or cents < self.min_cents:
+            self.min_cents = cents
+        if self.max_cents is None or cents > self.max_cents:
+            self.max_cents = cents
+        delta = cents - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (cents - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Population variance in cents squared"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Population standard deviation in cents"""
+        return math.sqrt(self.variance)
+
+    def copy(self) -> "RunningStats":
+        stats = RunningStats()
+        for name in self.__slots__:
+            setattr(stats, name, getattr(self, name))
+        return stats
@@ -0,0 +1,43 @@
+"""Append-only typed columns mirroring a record list, for vectorized analytics"""
+
+from array import array
+from typing import Dict, List, NamedTuple
+
+
+class Columns(NamedTuple):
+    """Point-in-time copy of a ColumnLog: parallel arrays plus the user slot table"""
+    timestamps: array  # epoch microseconds ('q')
+    cents: array  # amounts in cents ('q')
+    users: array  # slot into user_ids ('q')
+    user_ids: List[str]
+
+
+class ColumnLog:
+    """Timestamp, amount and user columns kept alongside a record list.
+
+    Columns are stdlib arrays, so appends are cheap and a reader's copy is a
+    single memcpy per column that NumPy can wrap without converting rows.
+    """
+    __slots__ = ("timestamps", "cents", "users", "user_ids", "_user_slots")
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.cents = array("q")
+        self.users = array("q")
+        self.user_ids: List[str] = []
+        self._user_slots: Dict[str, int] = {}
+
+    def append(self, timestamp_us: int, cents: int, user_id: str) -> None:
+        slot = self._user_slots.get(user_id)
+        if slot is None:
+            slot = self._user_slots[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        self.timestamps.append(timestamp_us)
+        self.cents.append(cents)
+        # Written last: its length is how many complete rows a reader may take
+        self.users.append(slot)
+
+    def copy(self) -> Columns:
+        """Consistent copy that is safe to take while a writer is appending"""
+        count = len(self.users)
+        return Columns(self.timestamps[:count], self.cents[:count], self.users[:count], list(self.user_ids))
@@ -0,0 +1,185 @@
+"""Ordered balance history with periodic checkpoints, for point-in-time queries"""
+
+import heapq
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+from operator import itemgetter
+from typing import Dict, List, Sequence, Tuple, Union
+from models.money import from_cents
+from storage.records import UserRecord, ExpenseRecord, SettlementRecord
+
+# Events between checkpoints: a point-in-time query replays at most this many
+CHECKPOINT_EVERY = 256
+
+Event = Union[UserRecord, ExpenseRecord, SettlementRecord]
+
+
+class BalanceState:
+    """Members, wallets and pair debts (kept antisymmetric like SimpleStore.balances) at one point"""
+    __slots__ = ("members", "wallets", "debts")
+
+    def __init__(self):
+        self.members: Dict[str, str] = {}
+        self.wallets: Dict[str, int] = defaultdict(int)
+        self.debts: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def apply(self, event: Event) -> None:
+        """Fold one joined member, expense or settlement into the state"""
+        wallets = self.wallets
+        debts = self.debts
+        kind = type(event)
+        if kind is ExpenseRecord:
+            payer_id = event.payer_id
+            share_cents = event.share_cents
+            wallets[payer_id] -= event.total_cents
+            for debtor_id in event.participant_ids:
+                if debtor_id != payer_id:
+                    debts[(debtor_id, payer_id)] += share_cents
+                    debts[(payer_id, debtor_id)] -= share_cents
+        elif kind is SettlementRecord:
+            wallets[event.from_user_id] -= event.amount_cents
+            wallets[event.to_user_id] += event.amount_cents
+            debts[(event.from_user_id, event.to_user_id)] -= event.amount_cents
+            debts[(event.to_user_id, event.from_user_id)] += event.amount_cents
+        else:
+            self.members[event.id] = event.name
+            wallets[event.id] += event.wallet_cents
+
+    def copy(self) -> "BalanceState":
+        state = BalanceState()
+        state.members = dict(self.members)
+        state.wallets = defaultdict(int, self.wallets)
+        state.debts = defaultdict(int, self.debts)
+        return state
+
+
+class BalanceHistory:
+    """Members joining, expenses and settlements in time order, ties in the order they were applied.
+
+    Every `checkpoint_every` events the running state is copied, so the state
+    at any moment is a binary search over event times to the nearest earlier
+    checkpoint plus a replay of fewer than `checkpoint_every` events. Events
+    reference the store's own records (which keep their amounts), so the log
+    costs two machine words per event.
+
+    Events stamped before the latest one (e.g. backfilled recurring bills) are
+    merged in at their time, a batch at once: the log is copied with them in
+    place, checkpoints from the first one on are replayed, and the new log is
+    published in one assignment, so readers see either the old log or the new.
+    """
+
+    def __init__(self, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.checkpoint_every = checkpoint_every
+        # Event times, events and checkpoints, replaced together when events are merged in
+        self._log: Tuple[array, List[Event], List[BalanceState]] = (array("q"), [], [BalanceState()])
+        self._state = BalanceState()
+
+    @property
+    def last_time(self) -> int:
+        times = self._log[0]
+        return times[-1] if times else 0
+
+    def append(self, timestamp_us: int, event: Event) -> None:
+        """Record an event; writers hold the store's write lock"""
+        times, events, checkpoints = self._log
+        if times and timestamp_us < times[-1]:
+            self.extend([(timestamp_us, event)])
+            return
+        self._state.apply(event)
+        # Readers bisect `times`, so each event and any checkpoint it completes are published first
+        events.append(event)
+        if not len(events) % self.checkpoint_every:
+            checkpoints.append(self._state.copy())
+        times.append(timestamp_us)
+
+    def extend(self, entries: List[Tuple[int, Event]]) -> None:
+        """Record a batch of (time, event), merging back-dated ones in with a single rebuild"""
+        latest = self.last_time
+        for timestamp_us, _ in entries:
+            if timestamp_us < latest:
+                break
+            latest = timestamp_us
+        else:
+            for timestamp_us, event in entries:
+                self.append(timestamp_us, event)
+            return
+
+        times, events, checkpoints = self._log
+        every = self.checkpoint_every
+        entries = sorted(entries, key=itemgetter(0))
+        first = bisect_right(times, entries[0][0])
+        merged = list(heapq.merge(zip(times[first:], events[first:]), entries, key=itemgetter(0)))
+        new_times = times[:first] + array("q", [timestamp_us for timestamp_us, _ in merged])
+        new_events = events[:first] + [event for _, event in merged]
+
+        # Checkpoints up to the first merged event still hold; replay the rest
+        kept = first // every
+        new_checkpoints = checkpoints[:kept + 1]
+        state = new_checkpoints[-1].copy()
+        for index in range(kept * every, len(new_events)):
+            state.apply(new_events[index])
+            if not (index + 1) % every:
+                new_checkpoints.append(state.copy())
+        self._state = state
+        self._log = (new_times, new_events, new_checkpoints)
+
+    def join_times(self) -> Dict[str, int]:
+        """Time each member in the history joined"""
+        times, events, _ = self._log
+        return {event.id: times[index] for index, event in enumerate(events) if type(event) is UserRecord}
+
+    def state_at(self, timestamp_us: int) -> BalanceState:
+        """State after every event at or before the given time"""
+        times, events, checkpoints = self._log
+        count = bisect_right(times, timestamp_us)
+        checkpoint = min(count // self.checkpoint_every, len(checkpoints) - 1)
+        state = checkpoints[checkpoint].copy()
+        for event in events[checkpoint * self.checkpoint_every:count]:
+            state.apply(event)
+        return state
+
+
+def _timestamp_us(record) -> int:
+    return record.timestamp_us
+
+
+class LedgerView:
+    """Read-only slice of the store interface over the ledger as it stood at `as_of_us`.
+
+    Spending records and settlements are the store's own time-ordered lists,
+    cut at the requested time with a binary search.
+    """
+
+    def __init__(self, as_of_us: int, users: List[UserRecord], debts: Dict[Tuple[str, str], int],
+                 user_transactions: Dict[str, Sequence], settlements: Sequence):
+        self.as_of_us = as_of_us
+        self.users = users
+        self.debts = debts
+        self.user_transactions = user_transactions
+        self.settlements = settlements
+        self.net_balances: Dict[str, int] = defaultdict(int)
+        for (debtor_id, creditor_id), cents in debts.items():
+            self.net_balances[creditor_id] += cents
+
+    def _until(self, records: Sequence) -> Sequence:
+        return records[:bisect_right(records, self.as_of_us, key=_timestamp_us)]
+
+    def get_all_users(self) -> List[UserRecord]:
+        return self.users
+
+    def get_user_transactions(self, user_id: str) -> Sequence:
+        return self._until(self.user_transactions.get(user_id, []))
+
+    def get_user_spending_total(self, user_id: str) -> Decimal:
+        return from_cents(sum(record.amount_cents for record in self.get_user_transactions(user_id)))
+
+    def get_net_balance(self, user_id: str) -> Decimal:
+        return from_cents(self.net_balances.get(user_id, 0))
+
+    def get_outstanding_debts(self) -> List[Tuple[str, str, Decimal]]:
+        return [(debtor_id, creditor_id, from_cents(cents)) for (debtor_id, creditor_id), cents in self.debts.items() if cents > 0]
+
+    def get_all_settlements(self) -> Sequence:
+        return self._until(self.settlements)
@@ -1,148 +1,523 @@
 """Storage for Split & Budget Tracker matching exact requirements"""
 
+import heapq
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List
-from uuid import uuid4
+from functools import wraps
+from itertools import islice
+from operator import attrgetter
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+from uuid import UUID, uuid4, uuid5
 from models.user import User
+from models.money import to_cents, from_cents
 from models.transaction import Transaction, GroupExpense
 from models.settlement import Settlement
+from storage.aggregates import RunningStats
+from storage.columns import ColumnLog, Columns
+from storage.history import BalanceHistory, Event, LedgerView
+from storage.search import DescriptionIndex, SearchPosition, index_descriptions, query_terms
+from storage.records import UserRecord, ExpenseRecord, SpendingRecord, SettlementRecord, local_time, to_micros
+
+DEFAULT_WALLET_CENTS = 50_000
+
+F = TypeVar("F", bound=Callable)
+
+
+def locked(method: F) -> F:
+    """Run a store method while holding the store's write lock"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ShareQueue:
+    """One debtor's unsettled shares owed to one creditor, oldest first, with the smallest size tracked.
+    
+    Sizes are counted in a dict and kept in a heap of the distinct sizes, so a
+    settlement can stop as soon as what it has left is below every share.
+    """
+    __slots__ = ("shares", "_sizes", "_heap")
+    
+    def __init__(self):
+        self.shares: Deque[ExpenseRecord] = deque()
+        self._sizes: Dict[int, int] = {}
+        self._heap: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self.shares)
+    
+    def append(self, expense: ExpenseRecord) -> None:
+        self.shares.append(expense)
+        if expense.share_cents not in self._sizes:
+            self._sizes[expense.share_cents] = 0
+            heapq.heappush(self._heap, expense.share_cents)
+        self._sizes[expense.share_cents] += 1
+    
+    def smallest(self) -> Optional[int]:
+        """Smallest unsettled share in cents, or None when none are left"""
+        # Sizes whose last share was taken stay in the heap until they reach the top
+        while self._heap and self._sizes[self._heap[0]] == 0:
+            del self._sizes[heapq.heappop(self._heap)]
+        return self._heap[0] if self._heap else None
+    
+    def take(self, cents: int) -> List[ExpenseRecord]:
+        """Remove the oldest shares that fit in `cents` one after another, skipping larger ones"""
+        taken: List[ExpenseRecord] = []
+        skipped: List[ExpenseRecord] = []
+        while self.shares and cents > 0 and cents >= self.smallest():
+            expense = self.shares.popleft()
+            if cents < expense.share_cents:
+                skipped.append(expense)
+                continue
+            taken.append(expense)
+            self._sizes[expense.share_cents] -= 1
+            cents -= expense.share_cents
+        self.shares.extendleft(reversed(skipped))
+        return taken
 
 
 class SimpleStore:
     """Storage that exactly matches the requirements example"""
     
     def __init__(self):
-        self.users: Dict[str, User] = {}
-        self.group_expenses: List[GroupExpense] = []  # Track group payments for debt
-        self.transactions: List[Transaction] = []  # Individual spending records for budgeting
-        self.settlements: List[Settlement] = []
+        # Single writer per group: mutations, and the API's check-then-apply sequences, hold
+        # this re-entrant lock. Readers never take it.
+        self.write_lock = threading.RLock()
+        # Bumped after every mutation; with the instance ID it identifies a state of this ledger
+        self.instance_id = uuid4().hex
+        self.version = 0
+        # Users and history are kept as compact slotted records (see storage.records), not pydantic
+        # models, and every amount is held in integer cents; Decimals only appear in getters
+        self.users: Dict[str, UserRecord] = {}
+        self.group_expenses: List[ExpenseRecord] = []  # Track group payments for debt
+        # Unsettled shares keyed by (debtor, creditor), oldest expense first, consumed by settlements
+        self.unsettled_shares: Dict[Tuple[str, str], ShareQueue] = defaultdict(ShareQueue)
+        self.transactions: List[SpendingRecord] = []  # Individual spending records for budgeting
+        # Per-user spending index: append-only record lists and running totals
+        self.user_transactions: Dict[str, List[SpendingRecord]] = defaultdict(list)
+        self.spending_totals: Dict[str, int] = defaultdict(int)
+        self.settlements: List[SettlementRecord] = []
+        # Net debt keyed by (debtor, creditor), kept antisymmetric so lookups are O(1)
+        self.balances: Dict[Tuple[str, str], int] = defaultdict(int)
+        # Net position per user: positive when others owe them
+        self.net_balances: Dict[str, int] = defaultdict(int)
+        # Running aggregates for analytics; writers publish a fresh object so readers never see a torn update
+        self.expense_stats = RunningStats()
+        self.settlement_stats = RunningStats()
+        # Columnar copies of expense totals (by payer) and spending records (by user) for NumPy analytics
+        self.expense_columns = ColumnLog()
+        self.spending_columns = ColumnLog()
+        # Members joining, expenses and settlements in order, checkpointed for point-in-time queries
+        self.history = BalanceHistory()
+        # Words of expense descriptions to expense positions, for search
+        self.description_index = DescriptionIndex()
         
-        user_a = User.create("User A")
-        user_b = User.create("User B") 
-        self.users[user_a.id] = user_a
-        self.users[user_b.id] = user_b
+        created_us = to_micros(datetime.now())
+        self._add_member(UserRecord.create("User A", DEFAULT_WALLET_CENTS), created_us)
+        self._add_member(UserRecord.create("User B", DEFAULT_WALLET_CENTS), created_us)
     
-    def get_all_users(self) -> List[User]:
-        """Get both users"""
+    def get_all_users(self) -> List[UserRecord]:
+        """Get all users"""
         return list(self.users.values())
     
-    def get_user(self, user_id: str) -> User:
+    @locked
+    def add_user(self, name: str, wallet_balance: Decimal = Decimal("500.00")) -> UserRecord:
+        """Add a new group member"""
+        user = UserRecord.create(name, to_cents(wallet_balance))
+        self._add_member(user, to_micros(datetime.now()))
+        self.version += 1
+        return user
+    
+    def _add_member(self, user: UserRecord, joined_us: Optional[int] = None) -> None:
+        """Add a user and record their opening wallet; without a join time they join after the latest event"""
+        self.users[user.id] = user
+        self.history.append(self.history.last_time if joined_us is None else joined_us,
+                            UserRecord(user.id, user.name, user.wallet_cents))
+    
+    def get_user(self, user_id: str) -> UserRecord:
         """Get user by ID"""
         if user_id not in self.users:
             raise KeyError(f"User not found: {user_id}")
         return self.users[user_id]
     
-    def get_other_user(self, user_id: str) -> User:
-        """Get the other user (since there are only 2)"""
-        for uid, user in self.users.items():
-            if uid != user_id:
-                return user
-        raise KeyError(f"Other user not found for: {user_id}")
+    def _adjust_balance(self, debtor_id: str, creditor_id: str, cents: int) -> None:
+        """Record that debtor owes creditor extra cents (negative to reduce)"""
+        self.balances[(debtor_id, creditor_id)] += cents
+        self.balances[(creditor_id, debtor_id)] -= cents
+        self.net_balances[creditor_id] += cents
+        self.net_balances[debtor_id] -= cents
+    
+    def _record_spending(self, record: SpendingRecord) -> None:
+        """Append a spending record and update the per-user index"""
+        self._record_spendings([record])
+    
+    def _record_spendings(self, records: List[SpendingRecord]) -> None:
+        """Append spending records and update the per-user index, which stays in time order"""
+        by_user: Dict[str, List[SpendingRecord]] = defaultdict(list)
+        for record in records:
+            self.transactions.append(record)
+            by_user[record.user_id].append(record)
+            self.spending_totals[record.user_id] += record.amount_cents
+            self.spending_columns.append(record.timestamp_us, record.amount_cents, record.user_id)
+        for user_id, added in by_user.items():
+            indexed = self.user_transactions[user_id]
+            latest = indexed[-1].timestamp_us if indexed else 0
+            for record in added:
+                if record.timestamp_us < latest:
+                    break
+                latest = record.timestamp_us
+            else:
+                indexed.extend(added)
+                continue
+            # Back-dated (e.g. backfilled recurring bills): readers hold the list, so publish a sorted copy
+            self.user_transactions[user_id] = sorted(indexed + added, key=attrgetter("timestamp_us"))
+    
+    @staticmethod
+    def _check_participants(group_expense: GroupExpense) -> None:
+        """Expenses must name who splits them; the API defaults to every member"""
+        if not group_expense.participant_ids:
+            raise ValueError("An expense needs at least one participant")
     
     def add_group_expense(self, group_expense: GroupExpense) -> None:
-        """Add group expense"""
-        self.group_expenses.append(group_expense)
-        
-        payer = self.get_user(group_expense.payer_id)
-        payer.wallet_balance -= group_expense.total_amount
+        """Add group expense - every other participant owes the payer their share"""
+        self.add_group_expenses([group_expense])
+    
+    @locked
+    def add_group_expenses(self, group_expenses: List[GroupExpense]) -> None:
+        """Add a batch of group expenses - all are validated before any is applied"""
+        self._apply_expenses(self._expense_records(group_expenses))
+    
+    def _expense_records(self, group_expenses: List[GroupExpense]) -> List[ExpenseRecord]:
+        """Validate a batch of group expenses and convert it to records"""
+        for group_expense in group_expenses:
+            self._check_participants(group_expense)
+            self.get_user(group_expense.payer_id)
+            for participant_id in group_expense.participant_ids:
+                self.get_user(participant_id)
+        return [ExpenseRecord.from_model(group_expense) for group_expense in group_expenses]
+    
+    def _apply_expenses(self, records: List[ExpenseRecord]) -> None:
+        """Store validated expense records and update wallets, debts and spending"""
+        wallet_deltas: Dict[str, int] = defaultdict(int)
+        balance_deltas: Dict[Tuple[str, str], int] = defaultdict(int)
+        expense_stats = self.expense_stats.copy()
+        spending: List[SpendingRecord] = []
+        for record in records:
+            self.group_expenses.append(record)
+            self.description_index.add(len(self.group_expenses) - 1, record.description)
+            expense_stats.add(record.total_cents)
+            self.expense_columns.append(record.timestamp_us, record.total_cents, record.payer_id)
+            wallet_deltas[record.payer_id] += record.total_cents
+            
+            debtor_ids = record.debtor_ids()
+            for debtor_id in debtor_ids:
+                balance_deltas[(debtor_id, record.payer_id)] += record.share_cents
+                self.unsettled_shares[(debtor_id, record.payer_id)].append(record)
+            if not debtor_ids:
+                record.is_settled = True
+            
+            #Track the payer's share of spending (not the full amount)
+            if record.payer_id in record.participant_ids:
+                spending.append(SpendingRecord.create(record.payer_id, record.payer_share_cents, record.description,
+                                                      record.timestamp_us))
+        # A batch of back-dated bills is merged into the history and spending index at once
+        self.history.extend([(record.timestamp_us, record) for record in records])
+        self._record_spendings(spending)
         
-        #Track the payer's share of spending (not the full amount)
-        payer_spending = Transaction.create_spending_record(
-            user_id=group_expense.payer_id,
-            amount=group_expense.individual_share,
-            description=group_expense.description
-        )
-        self.transactions.append(payer_spending)
+        # Wallets and debts change once per payer and pair, however large the batch
+        for payer_id, cents in wallet_deltas.items():
+            self.users[payer_id].wallet_cents -= cents
+        for (debtor_id, creditor_id), cents in balance_deltas.items():
+            self._adjust_balance(debtor_id, creditor_id, cents)
+        self.expense_stats = expense_stats
+        self.version += 1
     
+    @locked
     def add_settlement(self, settlement: Settlement) -> None:
         """Add settlement - transfer money and create spending records for settled expenses"""
-        self.settlements.append(settlement)
-        
+        self._apply_settlement(SettlementRecord.from_model(settlement))
+    
+    def _apply_settlement(self, settlement: SettlementRecord) -> None:
+        """Store a settlement record, move the money and settle the oldest shares it covers"""
+        # Both users are looked up first, so an unknown ID raises before anything is stored
         from_user = self.get_user(settlement.from_user_id)
         to_user = self.get_user(settlement.to_user_id)
         
+        self.settlements.append(settlement)
+        self.history.append(settlement.timestamp_us, settlement)
+        settlement_stats = self.settlement_stats.copy()
+        settlement_stats.add(settlement.amount_cents)
+        self.settlement_stats = settlement_stats
+        
         # Transfer money between wallets
-        from_user.wallet_balance -= settlement.amount
-        to_user.wallet_balance += settlement.amount
+        from_user.wallet_cents -= settlement.amount_cents
+        to_user.wallet_cents += settlement.amount_cents
+        self._adjust_balance(settlement.from_user_id, settlement.to_user_id, -settlement.amount_cents)
         
-        # Create spending record for settling user (their share of the expenses being settled)
-        remaining_settlement = settlement.amount
-        for expense in self.group_expenses:
-            if (expense.payer_id == settlement.to_user_id and 
-                not expense.is_settled and 
-                remaining_settlement >= expense.individual_share):
-                
-                # Record the settling user's spending for their share of the original expense
-                settler_spending = Transaction.create_spending_record(
-                    user_id=settlement.from_user_id,
-                    amount=expense.individual_share,
-                    description=expense.description
-                )
-                self.transactions.append(settler_spending)
-                
-                # Mark expense as settled to prevent duplicate settlements
+        # Create spending record for settling user (their share of the expenses being settled).
+        # Only the settling user's unsettled shares owed to to_user are visited, and only until
+        # what is left is smaller than every one of them.
+        unsettled = self.unsettled_shares[(settlement.from_user_id, settlement.to_user_id)]
+        for expense in unsettled.take(settlement.amount_cents):
+            # Record the settling user's spending for their share of the original expense
+            self._record_spending(SpendingRecord.create(settlement.from_user_id, expense.share_cents, expense.description,
+                                                        settlement.timestamp_us))
+            
+            # Mark the share (and the expense once every share is in) as settled
+            expense.settled_participant_ids.append(settlement.from_user_id)
+            if len(expense.settled_participant_ids) == len(expense.debtor_ids()):
                 expense.is_settled = True
-                remaining_settlement -= expense.individual_share
-                if remaining_settlement == 0:
-                    break
+        self.version += 1
+    
+    def _replay_expenses(self, expenses: List[ExpenseRecord]) -> None:
+        """Apply recorded expenses, deriving the spending records they create from them.
+        
+        Engines that record an event before applying it apply it through here and
+        through _replay_settlement, so replaying it later recreates the same records.
+        """
+        first_record = len(self.transactions)
+        self._apply_expenses(expenses)
+        index = first_record
+        for expense in expenses:
+            if expense.payer_id in expense.participant_ids:
+                self._stamp(index, expense.id, 0, expense.timestamp_us)
+                index += 1
+    
+    def _replay_settlement(self, settlement: SettlementRecord) -> None:
+        """Apply a recorded settlement, deriving the spending records it creates from it"""
+        first_record = len(self.transactions)
+        self._apply_settlement(settlement)
+        for number, index in enumerate(range(first_record, len(self.transactions))):
+            self._stamp(index, settlement.id, number, settlement.timestamp_us)
+    
+    def _stamp(self, index: int, event_id: str, number: int, timestamp_us: int) -> None:
+        """Give a spending record the ID and timestamp every replay derives for it"""
+        tx = self.transactions[index]
+        tx.id = str(uuid5(UUID(event_id), str(number)))
+        tx.timestamp_us = timestamp_us
+        self.spending_columns.timestamps[index] = timestamp_us
     
     def get_amount_owed(self, from_user_id: str, to_user_id: str) -> Decimal:
-        """Calculate net debt between users"""
-        from_owes_to = Decimal("0.00")
-        to_owes_from = Decimal("0.00")
+        """Get net debt between users from the balance table"""
+        return from_cents(max(self.balances.get((from_user_id, to_user_id), 0), 0))
+    
+    def scan_amount_owed(self, from_user_id: str, to_user_id: str) -> Decimal:
+        """Calculate net debt between users by scanning the full history"""
+        from_owes_to = 0
+        to_owes_from = 0
         
         for expense in self.group_expenses:
-            if expense.payer_id == to_user_id and not expense.is_settled:
-                from_owes_to += expense.individual_share
-            elif expense.payer_id == from_user_id and not expense.is_settled:
-                to_owes_from += expense.individual_share
+            if expense.payer_id == to_user_id and from_user_id in expense.participant_ids:
+                from_owes_to += expense.share_cents
+            elif expense.payer_id == from_user_id and to_user_id in expense.participant_ids:
+                to_owes_from += expense.share_cents
         
         net_debt = from_owes_to - to_owes_from
         
-        settled_amount = Decimal("0.00")
+        settled_cents = 0
         for settlement in self.settlements:
             if settlement.from_user_id == from_user_id and settlement.to_user_id == to_user_id:
-                settled_amount += settlement.amount
+                settled_cents += settlement.amount_cents
             elif settlement.from_user_id == to_user_id and settlement.to_user_id == from_user_id:
-                settled_amount -= settlement.amount
+                settled_cents -= settlement.amount_cents
         
-        return max(net_debt - settled_amount, Decimal("0.00"))
+        return from_cents(max(net_debt - settled_cents, 0))
+    
+    @locked
+    def rebuild_balances(self) -> None:
+        """Rebuild the balance table from expense and settlement history"""
+        self.balances.clear()
+        self.net_balances.clear()
+        for expense in self.group_expenses:
+            for debtor_id in expense.debtor_ids():
+                self._adjust_balance(debtor_id, expense.payer_id, expense.share_cents)
+        for settlement in self.settlements:
+            self._adjust_balance(settlement.from_user_id, settlement.to_user_id, -settlement.amount_cents)
+    
+    def get_net_balance(self, user_id: str) -> Decimal:
+        """Get what others owe a user minus what the user owes others"""
+        return from_cents(self.net_balances.get(user_id, 0))
+    
+    def get_net_balances(self) -> Dict[str, Decimal]:
+        """Get the net position of every user with a non-zero balance"""
+        return {user_id: from_cents(cents) for user_id, cents in list(self.net_balances.items()) if cents != 0}
     
-    def get_user_transactions(self, user_id: str) -> List[Transaction]:
-        """Get individual spending records for a user"""
-        return [tx for tx in self.transactions if tx.user_id == user_id]
+    def get_outstanding_debts(self) -> List[Tuple[str, str, Decimal]]:
+        """Get (debtor_id, creditor_id, amount) for every pair with a positive debt"""
+        return [(debtor_id, creditor_id, from_cents(cents)) for (debtor_id, creditor_id), cents in list(self.balances.items()) if cents > 0]
+    
+    def get_user_transactions(self, user_id: str) -> List[SpendingRecord]:
+        """Get individual spending records for a user (read-only view of the index)"""
+        return self.user_transactions.get(user_id, [])
+    
+    def get_ledger_at(self, as_of: datetime) -> LedgerView:
+        """Get members, wallets, debts, spending and settlements as they stood at a past moment"""
+        as_of_us = to_micros(local_time(as_of))
+        state = self.history.state_at(as_of_us)
+        users = [UserRecord(user_id, name, state.wallets[user_id]) for user_id, name in state.members.items()]
+        return LedgerView(as_of_us, users, state.debts, self.user_transactions, self.settlements)
     
     def get_user_spending_total(self, user_id: str) -> Decimal:
         """Get total spending for budgeting purposes"""
-        return sum(tx.amount for tx in self.get_user_transactions(user_id))
+        return from_cents(self.spending_totals.get(user_id, 0))
+    
+    def get_expense_stats(self) -> RunningStats:
+        """Get running aggregates over group expense totals"""
+        return self.expense_stats
+    
+    def get_settlement_stats(self) -> RunningStats:
+        """Get running aggregates over settlement amounts"""
+        return self.settlement_stats
     
-    def get_all_group_expenses(self) -> List[GroupExpense]:
+    def get_expense_columns(self) -> Columns:
+        """Get timestamp, total and payer columns of all group expenses"""
+        return self.expense_columns.copy()
+    
+    def get_spending_columns(self) -> Columns:
+        """Get timestamp, amount and user columns of all spending records"""
+        return self.spending_columns.copy()
+    
+    def get_sizes(self) -> Dict[str, int]:
+        """Get record counts of the ledger's collections"""
+        return {
+            "users": len(self.users),
+            "expenses": len(self.group_expenses),
+            "spending_records": len(self.transactions),
+            "settlements": len(self.settlements),
+            "unsettled_shares": sum(len(shares) for shares in list(self.unsettled_shares.values()))
+        }
+    
+    def get_all_group_expenses(self) -> List[ExpenseRecord]:
         """Get all group expenses"""
         return self.group_expenses
     
-    def get_all_transactions(self) -> List[Transaction]:
+    def get_group_expense_at(self, position: int) -> Optional[ExpenseRecord]:
+        """Get the group expense at a position yielded by iter_group_expenses"""
+        if 0 <= position < len(self.group_expenses):
+            return self.group_expenses[position]
+        return None
+    
+    def iter_group_expenses(self, start: Optional[int] = None, newest_first: bool = False) -> Iterator[Tuple[int, ExpenseRecord]]:
+        """Yield (position, expense) pairs from a start position without copying the list"""
+        if newest_first:
+            first = len(self.group_expenses) - 1 if start is None else start
+            positions = range(first, -1, -1)
+        else:
+            positions = range(0 if start is None else start, len(self.group_expenses))
+        for position in positions:
+            yield position, self.group_expenses[position]
+    
+    def search_group_expenses(self, query: str, after: Optional[SearchPosition] = None) -> Iterator[Tuple[SearchPosition, ExpenseRecord]]:
+        """Yield group expenses whose description has every query word (or a word starting with it), best first"""
+        group_expenses = self.group_expenses
+        for result in self.description_index.search(query_terms(query), lambda position: group_expenses[position].description, after):
+            yield result, group_expenses[result[1]]
+    
+    def get_all_transactions(self) -> List[SpendingRecord]:
         """Get all individual spending records"""
         return self.transactions
     
-    def get_all_settlements(self) -> List[Settlement]:
+    def get_all_settlements(self) -> List[SettlementRecord]:
         """Get all settlements"""
         return self.settlements
     
-    def reset_users(self, user_a_amount: Decimal = Decimal("500.00"), user_b_amount: Decimal = Decimal("500.00")) -> None:
-        """Reset users with individual wallet amounts (for testing purposes)"""
+    def iter_transactions(self) -> Iterator[SpendingRecord]:
+        """Yield the spending records present when called, oldest first, without copying the list"""
+        return islice(self.transactions, len(self.transactions))
+    
+    def iter_settlements(self) -> Iterator[SettlementRecord]:
+        """Yield the settlements present when called, oldest first, without copying the list"""
+        return islice(self.settlements, len(self.settlements))
+    
+    def _clear_history(self) -> None:
+        """Drop all expenses, spending records and settlements along with their indexes"""
         self.group_expenses.clear()
+        self.unsettled_shares.clear()
         self.transactions.clear() 
+        self.user_transactions.clear()
+        self.spending_totals.clear()
         self.settlements.clear()
+        self.balances.clear()
+        self.net_balances.clear()
+        self.expense_stats = RunningStats()
+        self.settlement_stats = RunningStats()
+        self.expense_columns = ColumnLog()
+        self.spending_columns = ColumnLog()
+        self.history = BalanceHistory()
+        self.description_index = DescriptionIndex()
+    
+    @locked
+    def _restore(self, users: List[Union[UserRecord, User]], group_expenses: List[Union[ExpenseRecord, GroupExpense]],
+                 transactions: List[Union[SpendingRecord, Transaction]],
+                 settlements: List[Union[SettlementRecord, Settlement]], joined: Optional[Dict[str, int]] = None) -> None:
+        """Replace all state with previously saved records (or models) and rebuild the indexes.
+        
+        `joined` maps members to the time they joined; members without one join at the start.
+        """
+        self._clear_history()
+        self.users = {
+            user.id: user if isinstance(user, UserRecord) else UserRecord.from_model(user) for user in users
+        }
         
-        user_a = User(
-            id=str(uuid4()),
-            name="User A",
-            wallet_balance=user_a_amount
-        )
-        user_b = User(
-            id=str(uuid4()),
-            name="User B", 
-            wallet_balance=user_b_amount
-        )
+        for expense in group_expenses:
+            if not isinstance(expense, ExpenseRecord):
+                self._check_participants(expense)
+                expense = ExpenseRecord.from_model(expense)
+            self.group_expenses.append(expense)
+            self.expense_stats.add(expense.total_cents)
+            self.expense_columns.append(expense.timestamp_us, expense.total_cents, expense.payer_id)
+            settled_ids = set(expense.debtor_ids() if expense.is_settled else expense.settled_participant_ids)
+            for debtor_id in expense.debtor_ids():
+                if debtor_id not in settled_ids:
+                    self.unsettled_shares[(debtor_id, expense.payer_id)].append(expense)
+        self._record_spendings([
+            transaction if isinstance(transaction, SpendingRecord) else SpendingRecord.from_model(transaction)
+            for transaction in transactions
+        ])
+        for settlement in settlements:
+            if not isinstance(settlement, SettlementRecord):
+                settlement = SettlementRecord.from_model(settlement)
+            self.settlements.append(settlement)
+            self.settlement_stats.add(settlement.amount_cents)
+        self.rebuild_balances()
+        self._rebuild_history(joined or {})
+        self.description_index = index_descriptions(expense.description for expense in self.group_expenses)
+        self.version += 1
+    
+    def _rebuild_history(self, joined: Dict[str, int]) -> None:
+        """Fill the history from restored records, each member, expense and settlement at its own time"""
+        opening_wallets = defaultdict(int, {user_id: user.wallet_cents for user_id, user in self.users.items()})
+        for expense in self.group_expenses:
+            opening_wallets[expense.payer_id] += expense.total_cents
+        for settlement in self.settlements:
+            opening_wallets[settlement.from_user_id] += settlement.amount_cents
+            opening_wallets[settlement.to_user_id] -= settlement.amount_cents
+        # Records are in journal order; one extend files back-dated ones in at their time, as they were live
+        entries: List[Tuple[int, Event]] = [
+            (joined.get(user.id, 0), UserRecord(user.id, user.name, opening_wallets[user.id])) for user in self.users.values()
+        ]
+        entries.extend((expense.timestamp_us, expense) for expense in self.group_expenses)
+        entries.extend((settlement.timestamp_us, settlement) for settlement in self.settlements)
+        self.history.extend(entries)
+    
+    def close(self) -> None:
+        """Release storage resources (nothing to release for the in-memory store)"""
+    
+    @locked
+    def reset_users(self, user_a_amount: Decimal = Decimal("500.00"), user_b_amount: Decimal = Decimal("500.00")) -> None:
+        """Reset users with individual wallet amounts (for testing purposes)"""
+        users = [UserRecord.create("User A", to_cents(user_a_amount)), UserRecord.create("User B", to_cents(user_b_amount))]
+        self._reset(users, to_micros(datetime.now()))
+    
+    def _reset(self, users: List[UserRecord], reset_us: int) -> None:
+        """Clear the history and start over with `users`"""
+        self._clear_history()
         
-        self.users = {user_a.id: user_a, user_b.id: user_b}
\ No newline at end of file
+        self.users = {}
+        for user in users:
+            self._add_member(user, reset_us)
+        self.version += 1
@@ -0,0 +1,157 @@
+"""Append-only event journal with group commit and compact snapshots"""
+
+import errno
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class LedgerJournal:
+    """JSON-lines journal of store events plus a single latest snapshot.
+
+    Every event is written to the OS straight away, so a process crash loses
+    nothing. fsync is batched (group commit): it runs once `sync_every` events
+    are pending, and otherwise a timer runs it `sync_interval` seconds after the
+    first unsynced event, so the tail of a burst followed by idle time is synced
+    too. That bounds what a power loss can take. Writing a snapshot truncates the
+    journal, so recovery only replays events recorded after the latest snapshot.
+    """
+
+    def __init__(self, directory: str, sync_every: int = 64, sync_interval: float = 0.05):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.directory / "journal.log"
+        self.snapshot_path = self.directory / "snapshot.json"
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+
+        self.seq = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._length = 0  # Bytes of whole events in the journal file
+        self._file = None
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Read the latest snapshot and the events recorded after it, then open for appending"""
+        snapshot = None
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "rb") as f:
+                snapshot = json.load(f)
+            self.seq = snapshot["seq"]
+
+        events = []
+        valid_length = 0
+        if self.journal_path.exists():
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    # A torn final line from a crash mid-write is dropped
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_length += len(line)
+                    # Events already folded into the snapshot are skipped
+                    if event["seq"] > self.seq:
+                        events.append(event)
+                        self.seq = event["seq"]
+
+        self._file = open(self.journal_path, "ab", buffering=0)
+        self._file.truncate(valid_length)
+        self._length = valid_length
+        return snapshot, events
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """Append an event and return its sequence number.
+
+        If the write fails the journal is cut back to before the event, so a
+        failed append records nothing and later events are not written after
+        a torn line.
+        """
+        with self._lock:
+            event["seq"] = self.seq + 1
+            line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+            try:
+                if self._file.write(line) != len(line):
+                    raise OSError(errno.EIO, f"Short write to {self.journal_path}")
+            except BaseException:
+                self._file.truncate(self._length)
+                raise
+            self._length += len(line)
+            self.seq += 1
+            self._pending += 1
+            if self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.sync_interval, self._sync_due)
+                self._timer.daemon = True
+                self._timer.start()
+            return self.seq
+
+    def sync(self) -> None:
+        """Force pending events to stable storage"""
+        with self._lock:
+            if self._pending:
+                self._sync_locked()
+
+    def _sync_due(self) -> None:
+        """Timer callback: sync events still pending `sync_interval` after the first of them"""
+        with self._lock:
+            self._timer = None
+            if self._pending and self._file is not None:
+                self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def write_snapshot(self, state: Dict[str, Any]) -> None:
+        """Atomically replace the snapshot with `state` and truncate the journal"""
+        with self._lock:
+            state["seq"] = self.seq
+            temp_path = self.snapshot_path.with_suffix(".tmp")
+            with open(temp_path, "wb") as f:
+                f.write(json.dumps(state, separators=(",", ":")).encode())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            self._sync_directory()
+
+            # A crash before this point leaves stale events that load() skips by seq
+            self._file.truncate(0)
+            self._length = 0
+            os.fsync(self._file.fileno())
+            self._pending = 0
+            self._last_sync = time.monotonic()
+
+    def _sync_directory(self) -> None:
+        """Make the snapshot rename durable (not supported on every platform)"""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        """Sync and close the journal file"""
+        if self._file is None:
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.sync()
+        self._file.close()
+        self._file = None
@@ -0,0 +1,128 @@
+"""SimpleStore that persists every mutation to an on-disk journal"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List
+from models.transaction import GroupExpense
+from models.settlement import Settlement
+from models.money import to_cents
+from storage.in_memory_store import SimpleStore, locked
+from storage.journal import LedgerJournal
+from storage.records import UserRecord, ExpenseRecord, SpendingRecord, SettlementRecord, to_micros
+
+# Snapshot layout: positional record rows (see storage.records)
+ROW_FORMAT = 2
+
+
+def snapshot_state(store: SimpleStore) -> Dict[str, Any]:
+    """Snapshot contents for any in-memory store's full state"""
+    return {
+        "format": ROW_FORMAT,
+        "users": [user.to_row() for user in store.users.values()],
+        "group_expenses": [expense.to_row() for expense in store.group_expenses],
+        "transactions": [tx.to_row() for tx in store.transactions],
+        "settlements": [settlement.to_row() for settlement in store.settlements],
+        "joined": store.history.join_times()
+    }
+
+
+class JournaledStore(SimpleStore):
+    """In-memory store backed by an append-only journal and periodic snapshots.
+
+    Every change is journaled first and then applied by the same code that
+    replays it on startup, so a change whose journal write fails is never
+    applied. Startup loads the latest snapshot and replays only the events
+    journaled after it, so recovery time is bounded by `snapshot_every` rather
+    than by the length of the history.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 10_000,
+                 sync_every: int = 64, sync_interval: float = 0.05):
+        super().__init__()
+        self.journal = LedgerJournal(directory, sync_every=sync_every, sync_interval=sync_interval)
+        self.snapshot_every = snapshot_every
+        self._events_since_snapshot = 0
+
+        snapshot, events = self.journal.load()
+        if snapshot is None and not events:
+            # Fresh directory: persist the generated users straight away
+            self.snapshot()
+        else:
+            if snapshot is not None:
+                self._restore_snapshot(snapshot)
+            for event in events:
+                self._replay(event)
+            self._events_since_snapshot = len(events)
+
+    @locked
+    def add_group_expenses(self, group_expenses: List[GroupExpense]) -> None:
+        """Validate a batch of group expenses, journal it as a single event and apply it"""
+        records = self._expense_records(group_expenses)
+        self._log({"type": "expenses", "expenses": [record.to_row() for record in records]})
+
+    @locked
+    def add_user(self, name: str, wallet_balance: Decimal = Decimal("500.00")) -> UserRecord:
+        """Journal a new group member and add them"""
+        user = UserRecord.create(name, to_cents(wallet_balance))
+        self._log({"type": "user", "user": user.to_row(), "joined": to_micros(datetime.now())})
+        return self.users[user.id]
+
+    @locked
+    def add_settlement(self, settlement: Settlement) -> None:
+        """Validate a settlement, journal it and apply it"""
+        record = SettlementRecord.from_model(settlement)
+        self.get_user(record.from_user_id)
+        self.get_user(record.to_user_id)
+        self._log({"type": "settlement", "settlement": record.to_row()})
+
+    @locked
+    def reset_users(self, user_a_amount: Decimal = Decimal("500.00"), user_b_amount: Decimal = Decimal("500.00")) -> None:
+        """Journal the new user set and reset to it"""
+        users = [UserRecord.create("User A", to_cents(user_a_amount)), UserRecord.create("User B", to_cents(user_b_amount))]
+        self._log({
+            "type": "reset",
+            "users": [user.to_row() for user in users],
+            "at": to_micros(datetime.now())
+        })
+
+    @locked
+    def snapshot(self) -> None:
+        """Write a compact snapshot of the full state and truncate the journal"""
+        self.journal.write_snapshot(snapshot_state(self))
+        self._events_since_snapshot = 0
+
+    def close(self) -> None:
+        """Flush pending journal writes and close the journal"""
+        self.journal.close()
+
+    def _log(self, event: Dict[str, Any]) -> None:
+        """Journal an event, then apply it; a failed journal write raises before anything changes"""
+        self.journal.append(event)
+        self._replay(event)
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def _restore_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        if snapshot.get("format") != ROW_FORMAT:
+            raise ValueError(f"Unsupported snapshot format: {snapshot.get('format')}")
+        self._restore(
+            users=[UserRecord.from_row(row) for row in snapshot["users"]],
+            group_expenses=[ExpenseRecord.from_row(row) for row in snapshot["group_expenses"]],
+            transactions=[SpendingRecord.from_row(row) for row in snapshot["transactions"]],
+            settlements=[SettlementRecord.from_row(row) for row in snapshot["settlements"]],
+            # Snapshots written before join times were kept have members join at the start
+            joined=snapshot.get("joined")
+        )
+
+    def _replay(self, event: Dict[str, Any]) -> None:
+        """Apply a journaled event without journaling it again"""
+        if event["type"] == "expenses":
+            self._replay_expenses([ExpenseRecord.from_row(row) for row in event["expenses"]])
+        elif event["type"] == "settlement":
+            self._replay_settlement(SettlementRecord.from_row(event["settlement"]))
+        elif event["type"] == "user":
+            self._add_member(UserRecord.from_row(event["user"]), event["joined"])
+            self.version += 1
+        elif event["type"] == "reset":
+            self._reset([UserRecord.from_row(row) for row in event["users"]], event["at"])
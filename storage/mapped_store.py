@@ -0,0 +1,380 @@
+"""SimpleStore replicated from a memory-mapped ledger file shared by every worker on a host"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+from decimal import Decimal
+from functools import wraps
+from typing import Callable, Dict, List, TypeVar
+from uuid import UUID, uuid4
+from models.money import to_cents
+from models.settlement import Settlement
+from models.transaction import GroupExpense
+from storage.in_memory_store import SimpleStore, DEFAULT_WALLET_CENTS, locked
+from storage.records import UserRecord, ExpenseRecord, SettlementRecord
+
+MAGIC = b"LEDGMAP1"
+FORMAT_VERSION = 1
+RECORD_SIZE = 256
+INITIAL_RECORDS = 4096
+
+# Header: magic, format, record size, ledger ID, then the seqlock counter and the published record count
+HEADER = struct.Struct("<8sII16s")
+SEQ_OFFSET = 32
+COUNT_OFFSET = 40
+HEADER_SIZE = 64
+U64 = struct.Struct("<Q")
+
+# Event records; users are referred to by their slot (order of creation since the last reset)
+USER, EXPENSE, SETTLEMENT, RESET = 1, 2, 3, 4
+NAME_BYTES = 48
+DESCRIPTION_BYTES = 96
+MAX_PARTICIPANTS = 48
+USER_FIELDS = f"16sq{NAME_BYTES}s"
+USER_RECORD = struct.Struct("<B" + USER_FIELDS)
+RESET_RECORD = struct.Struct("<B" + USER_FIELDS * 2)
+EXPENSE_RECORD = struct.Struct(f"<B16sHqqqB{MAX_PARTICIPANTS}H{DESCRIPTION_BYTES}s")
+SETTLEMENT_RECORD = struct.Struct("<B16sHHqq")
+
+# Reader spins on an odd seqlock counter before falling back to the write lock to repair it
+MAX_SPINS = 10_000
+
+F = TypeVar("F", bound=Callable)
+
+
+def fit(text: str, size: int) -> bytes:
+    """UTF-8 text cut to at most `size` bytes on a character boundary"""
+    data = text.encode()
+    if len(data) <= size:
+        return data
+    return data[:size].decode(errors="ignore").encode()
+
+
+def unfit(data: bytes) -> str:
+    return data.rstrip(b"\0").decode()
+
+
+def refreshed(method: F) -> F:
+    """Replay other workers' writes before running a read"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._refresh()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class LedgerLock:
+    """Re-entrant write lock held across this process's threads and, through flock, across processes.
+
+    `on_acquire` runs each time the lock is newly taken, so a writer always
+    starts from the latest published state.
+    """
+
+    def __init__(self, fd: int, on_acquire: Callable[[], None]):
+        self.local = threading.RLock()
+        self._fd = fd
+        self._on_acquire = on_acquire
+        self._depth = 0
+
+    def acquire(self) -> None:
+        self.local.acquire()
+        if self._depth == 0:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    self._on_acquire()
+                except BaseException:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    raise
+            except BaseException:
+                self.local.release()
+                raise
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.local.release()
+
+    def __enter__(self) -> "LedgerLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class MappedStore(SimpleStore):
+    """In-memory store kept in step with a shared, memory-mapped ledger file.
+
+    The file is a header followed by an append-only array of fixed-size event
+    records. Writers take the cross-process LedgerLock, append their records
+    and publish the new record count through a seqlock in the header, so a
+    batch becomes visible to every worker at once. Readers never lock: each
+    read checks the published count and first replays any records other
+    workers appended into this worker's indexes. Spending records take IDs and
+    timestamps derived from the event that created them, so every worker holds
+    the same ledger and serves the same ETags.
+
+    Names and descriptions are cut to their fixed field sizes. Mapped pages
+    survive a worker crash; they are flushed to disk on close. The ledger only
+    changes through published events, so it cannot be restored from saved
+    records: copy or replace the ledger file instead.
+    """
+
+    def __init__(self, path: str, initial_records: int = INITIAL_RECORDS):
+        super().__init__()
+        self.path = path
+        # Members and history come from the ledger file, not the defaults SimpleStore created
+        self._clear_history()
+        self.users = {}
+        self._slot_ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._applied = 0
+        self._replaying = False
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, HEADER_SIZE + initial_records * RECORD_SIZE)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, FORMAT_VERSION, RECORD_SIZE, uuid4().bytes), 0)
+            self._map = mmap.mmap(self._fd, 0)
+            # Lock-free readers only touch the header, through a mapping that is never replaced, so
+            # the whole-file mapping is only used under the local lock and can be unmapped as it grows
+            self._header = mmap.mmap(self._fd, HEADER_SIZE)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        magic, format_version, record_size, ledger_id = HEADER.unpack_from(self._header, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f"Not a mapped ledger file: {path}")
+        # Shared by every worker, so ETags agree whichever worker answers
+        self.instance_id = UUID(bytes=ledger_id).hex
+
+        self.write_lock = LedgerLock(self._fd, self._on_lock)
+        with self.write_lock:
+            if not self._applied:
+                # Fresh file: publish the default users for every worker
+                self._publish([self._encode_reset(DEFAULT_WALLET_CENTS, DEFAULT_WALLET_CENTS)])
+
+    @property
+    def version(self) -> int:
+        self._refresh()
+        return self._version
+
+    @version.setter
+    def version(self, value: int) -> None:
+        self._version = value
+
+    get_all_users = refreshed(SimpleStore.get_all_users)
+    get_user = refreshed(SimpleStore.get_user)
+    get_amount_owed = refreshed(SimpleStore.get_amount_owed)
+    scan_amount_owed = refreshed(SimpleStore.scan_amount_owed)
+    get_net_balance = refreshed(SimpleStore.get_net_balance)
+    get_net_balances = refreshed(SimpleStore.get_net_balances)
+    get_outstanding_debts = refreshed(SimpleStore.get_outstanding_debts)
+    get_user_transactions = refreshed(SimpleStore.get_user_transactions)
+    get_user_spending_total = refreshed(SimpleStore.get_user_spending_total)
+    get_expense_stats = refreshed(SimpleStore.get_expense_stats)
+    get_settlement_stats = refreshed(SimpleStore.get_settlement_stats)
+    get_expense_columns = refreshed(SimpleStore.get_expense_columns)
+    get_spending_columns = refreshed(SimpleStore.get_spending_columns)
+    get_sizes = refreshed(SimpleStore.get_sizes)
+    get_all_group_expenses = refreshed(SimpleStore.get_all_group_expenses)
+    get_group_expense_at = refreshed(SimpleStore.get_group_expense_at)
+    iter_group_expenses = refreshed(SimpleStore.iter_group_expenses)
+    get_all_transactions = refreshed(SimpleStore.get_all_transactions)
+    get_all_settlements = refreshed(SimpleStore.get_all_settlements)
+    iter_transactions = refreshed(SimpleStore.iter_transactions)
+    iter_settlements = refreshed(SimpleStore.iter_settlements)
+    get_ledger_at = refreshed(SimpleStore.get_ledger_at)
+    search_group_expenses = refreshed(SimpleStore.search_group_expenses)
+
+    @locked
+    def add_user(self, name: str, wallet_balance: Decimal = Decimal("500.00")) -> UserRecord:
+        """Add a group member through the shared ledger"""
+        user = UserRecord.create(name, to_cents(wallet_balance))
+        self._publish([USER_RECORD.pack(USER, *self._user_fields(user))])
+        return self.users[user.id]
+
+    @locked
+    def add_group_expenses(self, group_expenses: List[GroupExpense]) -> None:
+        """Validate a batch of group expenses and publish it as consecutive records"""
+        for group_expense in group_expenses:
+            self._check_participants(group_expense)
+            self.get_user(group_expense.payer_id)
+            for participant_id in group_expense.participant_ids:
+                self.get_user(participant_id)
+            if len(group_expense.participant_ids) > MAX_PARTICIPANTS:
+                raise ValueError(f"An expense can have at most {MAX_PARTICIPANTS} participants")
+        self._publish([self._encode_expense(ExpenseRecord.from_model(expense)) for expense in group_expenses])
+
+    @locked
+    def add_settlement(self, settlement: Settlement) -> None:
+        """Publish a settlement to the shared ledger"""
+        record = SettlementRecord.from_model(settlement)
+        self.get_user(record.from_user_id)
+        self.get_user(record.to_user_id)
+        self._publish([SETTLEMENT_RECORD.pack(
+            SETTLEMENT, UUID(record.id).bytes, self._slot(record.from_user_id), self._slot(record.to_user_id),
+            record.amount_cents, record.timestamp_us
+        )])
+
+    @locked
+    def reset_users(self, user_a_amount: Decimal = Decimal("500.00"), user_b_amount: Decimal = Decimal("500.00")) -> None:
+        """Reset users for every worker sharing the ledger"""
+        self._publish([self._encode_reset(to_cents(user_a_amount), to_cents(user_b_amount))])
+
+    def close(self) -> None:
+        """Flush the mapped pages to disk and unmap the ledger"""
+        self._map.flush()
+        self._map.close()
+        self._header.close()
+        os.close(self._fd)
+
+    # Encoding
+
+    def _slot(self, user_id: str) -> int:
+        return self._slots[user_id]
+
+    @staticmethod
+    def _user_fields(user: UserRecord):
+        return UUID(user.id).bytes, user.wallet_cents, fit(user.name, NAME_BYTES)
+
+    def _encode_reset(self, user_a_cents: int, user_b_cents: int) -> bytes:
+        user_a = UserRecord.create("User A", user_a_cents)
+        user_b = UserRecord.create("User B", user_b_cents)
+        return RESET_RECORD.pack(RESET, *self._user_fields(user_a), *self._user_fields(user_b))
+
+    def _encode_expense(self, expense: ExpenseRecord) -> bytes:
+        slots = [self._slot(user_id) for user_id in expense.participant_ids]
+        slots += [0] * (MAX_PARTICIPANTS - len(slots))
+        return EXPENSE_RECORD.pack(
+            EXPENSE, UUID(expense.id).bytes, self._slot(expense.payer_id), expense.total_cents,
+            expense.share_cents, expense.timestamp_us, len(expense.participant_ids), *slots,
+            fit(expense.description, DESCRIPTION_BYTES)
+        )
+
+    # Publishing and replay
+
+    def _published(self) -> int:
+        """Published record count, read without locking through the header's seqlock"""
+        spins = 0
+        header = self._header
+        while True:
+            seq = U64.unpack_from(header, SEQ_OFFSET)[0]
+            if not seq & 1:
+                count = U64.unpack_from(header, COUNT_OFFSET)[0]
+                if U64.unpack_from(header, SEQ_OFFSET)[0] == seq:
+                    return count
+            spins += 1
+            if spins % 64 == 0:
+                time.sleep(0)
+            if spins == MAX_SPINS:
+                # A writer died mid-publish: taking the lock repairs the counter
+                with self.write_lock:
+                    pass
+
+    def _on_lock(self) -> None:
+        """Start every write from the latest published state"""
+        seq = U64.unpack_from(self._header, SEQ_OFFSET)[0]
+        if seq & 1:
+            U64.pack_into(self._header, SEQ_OFFSET, seq + 1)
+        published = self._published()
+        if published != self._applied:
+            self._replay(published)
+
+    def _refresh(self) -> None:
+        """Replay records other workers published; skipped while a local writer holds the lock"""
+        if self._replaying or self._published() == self._applied:
+            return
+        if not self.write_lock.local.acquire(blocking=False):
+            return
+        try:
+            self._replay(self._published())
+        finally:
+            self.write_lock.local.release()
+
+    def _publish(self, records: List[bytes]) -> None:
+        """Append records after the published ones and make them visible to every worker at once"""
+        count = self._applied
+        offset = HEADER_SIZE + count * RECORD_SIZE
+        end = offset + len(records) * RECORD_SIZE
+        if end > len(self._map):
+            os.ftruncate(self._fd, max(end, 2 * len(self._map)))
+            self._remap()
+        self._map[offset:end] = b"".join(record.ljust(RECORD_SIZE, b"\0") for record in records)
+        header = self._header
+        seq = U64.unpack_from(header, SEQ_OFFSET)[0]
+        U64.pack_into(header, SEQ_OFFSET, seq + 1)
+        U64.pack_into(header, COUNT_OFFSET, count + len(records))
+        U64.pack_into(header, SEQ_OFFSET, seq + 2)
+        self._replay(count + len(records))
+
+    def _replay(self, published: int) -> None:
+        """Apply records from the last applied one up to `published`"""
+        if HEADER_SIZE + published * RECORD_SIZE > len(self._map):
+            # Another worker grew the file
+            self._remap()
+        ledger = self._map
+        self._replaying = True
+        try:
+            expenses: List[ExpenseRecord] = []
+            for index in range(self._applied, published):
+                offset = HEADER_SIZE + index * RECORD_SIZE
+                kind = ledger[offset]
+                if kind == EXPENSE:
+                    expenses.append(self._decode_expense(ledger, offset))
+                    continue
+                if expenses:
+                    self._replay_expenses(expenses)
+                    expenses = []
+                if kind == SETTLEMENT:
+                    self._replay_settlement(self._decode_settlement(ledger, offset))
+                elif kind == USER:
+                    self._add_user(USER_RECORD.unpack_from(ledger, offset)[1:])
+                elif kind == RESET:
+                    fields = RESET_RECORD.unpack_from(ledger, offset)[1:]
+                    self._clear_history()
+                    self.users = {}
+                    self._slot_ids = []
+                    self._slots = {}
+                    self._add_user(fields[:3])
+                    self._add_user(fields[3:])
+            if expenses:
+                self._replay_expenses(expenses)
+            self._applied = published
+            self.version = published
+        finally:
+            self._replaying = False
+
+    def _remap(self) -> None:
+        """Map the whole grown file and unmap the old mapping; callers hold the local lock"""
+        old = self._map
+        self._map = mmap.mmap(self._fd, 0)
+        old.close()
+
+    def _add_user(self, fields) -> None:
+        user_id, wallet_cents, name = fields
+        user = UserRecord(str(UUID(bytes=user_id)), unfit(name), wallet_cents)
+        self._add_member(user)
+        self._slots[user.id] = len(self._slot_ids)
+        self._slot_ids.append(user.id)
+
+    def _decode_expense(self, ledger: mmap.mmap, offset: int) -> ExpenseRecord:
+        fields = EXPENSE_RECORD.unpack_from(ledger, offset)
+        expense_id, payer_slot, total_cents, share_cents, timestamp_us, participant_count = fields[1:7]
+        slots = fields[7:7 + participant_count]
+        return ExpenseRecord(
+            str(UUID(bytes=expense_id)), self._slot_ids[payer_slot], total_cents, share_cents, unfit(fields[-1]),
+            timestamp_us, False, [self._slot_ids[slot] for slot in slots], []
+        )
+
+    def _decode_settlement(self, ledger: mmap.mmap, offset: int) -> SettlementRecord:
+        settlement_id, from_slot, to_slot, amount_cents, timestamp_us = SETTLEMENT_RECORD.unpack_from(ledger, offset)[1:]
+        return SettlementRecord(str(UUID(bytes=settlement_id)), self._slot_ids[from_slot],
+                                self._slot_ids[to_slot], amount_cents, timestamp_us)
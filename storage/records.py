@@ -0,0 +1,220 @@
+"""Compact internal record types used by the in-memory store.
+
+Rows are plain `__slots__` objects holding integer cents, integer epoch
+microseconds and interned descriptions, so storing one costs no pydantic
+validation and a fraction of the memory. They expose the same read attributes
+as the pydantic models (`total_amount`, `timestamp`, ...) and convert to those
+models only when an API response needs one.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Sequence
+from uuid import uuid4
+from models.money import to_cents, from_cents
+from models.user import User
+from models.transaction import Transaction, GroupExpense
+from models.settlement import Settlement
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(timestamp: datetime) -> int:
+    """Naive datetime to integer microseconds since the epoch (exact round trip)"""
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def local_time(timestamp: datetime) -> datetime:
+    """Naive local time, the way records are stamped (aware datetimes are converted)"""
+    return timestamp if timestamp.tzinfo is None else timestamp.astimezone().replace(tzinfo=None)
+
+
+def from_micros(micros: int) -> datetime:
+    """Integer microseconds since the epoch back to a naive datetime"""
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class UserRecord:
+    """Stored group member with their wallet in cents"""
+    __slots__ = ("id", "name", "wallet_cents")
+
+    def __init__(self, id: str, name: str, wallet_cents: int):
+        self.id = id
+        self.name = name
+        self.wallet_cents = wallet_cents
+
+    @classmethod
+    def create(cls, name: str, wallet_cents: int) -> "UserRecord":
+        """Create a member with a fresh ID"""
+        return cls(str(uuid4()), name, wallet_cents)
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserRecord":
+        return cls(user.id, user.name, to_cents(user.wallet_balance))
+
+    @classmethod
+    def from_row(cls, row: list) -> "UserRecord":
+        return cls(*row)
+
+    @property
+    def wallet_balance(self) -> Decimal:
+        return from_cents(self.wallet_cents)
+
+    def to_row(self) -> list:
+        return [self.id, self.name, self.wallet_cents]
+
+    def to_model(self) -> User:
+        return User(id=self.id, name=self.name, wallet_balance=self.wallet_balance)
+
+
+class ExpenseRecord:
+    """Stored group expense"""
+    __slots__ = ("id", "payer_id", "total_cents", "share_cents", "description", "timestamp_us",
+                 "is_settled", "participant_ids", "settled_participant_ids", "json_prefix")
+
+    def __init__(self, id: str, payer_id: str, total_cents: int, share_cents: int, description: str,
+                 timestamp_us: int, is_settled: bool, participant_ids: Sequence[str],
+                 settled_participant_ids: List[str]):
+        self.id = id
+        self.payer_id = payer_id
+        self.total_cents = total_cents
+        self.share_cents = share_cents
+        self.description = sys.intern(description)
+        self.timestamp_us = timestamp_us
+        self.is_settled = is_settled
+        self.participant_ids = tuple(participant_ids)
+        self.settled_participant_ids = settled_participant_ids
+        # Encoded API row up to its only mutable field (is_settled), filled on first serialization
+        self.json_prefix: Optional[bytes] = None
+
+    @classmethod
+    def from_model(cls, expense: GroupExpense) -> "ExpenseRecord":
+        return cls(expense.id, expense.payer_id, to_cents(expense.total_amount), to_cents(expense.individual_share),
+                   expense.description, to_micros(expense.timestamp), expense.is_settled,
+                   expense.participant_ids, list(expense.settled_participant_ids))
+
+    @classmethod
+    def from_row(cls, row: list) -> "ExpenseRecord":
+        return cls(*row)
+
+    @property
+    def total_amount(self) -> Decimal:
+        return from_cents(self.total_cents)
+
+    @property
+    def individual_share(self) -> Decimal:
+        return from_cents(self.share_cents)
+
+    @property
+    def timestamp(self) -> datetime:
+        return from_micros(self.timestamp_us)
+
+    @property
+    def payer_share_cents(self) -> int:
+        """What the debtors' shares leave of the total, including any odd cents"""
+        return self.total_cents - self.share_cents * len(self.debtor_ids())
+
+    def debtor_ids(self) -> List[str]:
+        """Participants who owe the payer their share"""
+        return [user_id for user_id in self.participant_ids if user_id != self.payer_id]
+
+    def to_row(self) -> list:
+        """Positional form for snapshots and the journal"""
+        return [self.id, self.payer_id, self.total_cents, self.share_cents, self.description, self.timestamp_us,
+                self.is_settled, list(self.participant_ids), list(self.settled_participant_ids)]
+
+    def to_model(self) -> GroupExpense:
+        return GroupExpense(
+            id=self.id,
+            payer_id=self.payer_id,
+            total_amount=self.total_amount,
+            individual_share=self.individual_share,
+            description=self.description,
+            timestamp=self.timestamp,
+            is_settled=self.is_settled,
+            participant_ids=list(self.participant_ids),
+            settled_participant_ids=list(self.settled_participant_ids)
+        )
+
+
+class SpendingRecord:
+    """Stored individual spending record"""
+    __slots__ = ("id", "user_id", "amount_cents", "description", "timestamp_us", "json_fragment")
+
+    def __init__(self, id: str, user_id: str, amount_cents: int, description: str, timestamp_us: int):
+        self.id = id
+        self.user_id = user_id
+        self.amount_cents = amount_cents
+        self.description = sys.intern(description)
+        self.timestamp_us = timestamp_us
+        # Encoded API row, filled on first serialization (spending records never change)
+        self.json_fragment: Optional[bytes] = None
+
+    @classmethod
+    def create(cls, user_id: str, amount_cents: int, description: str,
+               timestamp_us: Optional[int] = None) -> "SpendingRecord":
+        """Create a spending record stamped with the given time, or the current time"""
+        return cls(str(uuid4()), user_id, amount_cents, description,
+                   to_micros(datetime.now()) if timestamp_us is None else timestamp_us)
+
+    @classmethod
+    def from_model(cls, transaction: Transaction) -> "SpendingRecord":
+        return cls(transaction.id, transaction.user_id, to_cents(transaction.amount),
+                   transaction.description, to_micros(transaction.timestamp))
+
+    @classmethod
+    def from_row(cls, row: list) -> "SpendingRecord":
+        return cls(*row)
+
+    @property
+    def amount(self) -> Decimal:
+        return from_cents(self.amount_cents)
+
+    @property
+    def timestamp(self) -> datetime:
+        return from_micros(self.timestamp_us)
+
+    def to_row(self) -> list:
+        return [self.id, self.user_id, self.amount_cents, self.description, self.timestamp_us]
+
+    def to_model(self) -> Transaction:
+        return Transaction(id=self.id, user_id=self.user_id, amount=self.amount,
+                           description=self.description, timestamp=self.timestamp)
+
+
+class SettlementRecord:
+    """Stored settlement"""
+    __slots__ = ("id", "from_user_id", "to_user_id", "amount_cents", "timestamp_us")
+
+    def __init__(self, id: str, from_user_id: str, to_user_id: str, amount_cents: int, timestamp_us: int):
+        self.id = id
+        self.from_user_id = from_user_id
+        self.to_user_id = to_user_id
+        self.amount_cents = amount_cents
+        self.timestamp_us = timestamp_us
+
+    @classmethod
+    def from_model(cls, settlement: Settlement) -> "SettlementRecord":
+        return cls(settlement.id, settlement.from_user_id, settlement.to_user_id,
+                   to_cents(settlement.amount), to_micros(settlement.timestamp))
+
+    @classmethod
+    def from_row(cls, row: list) -> "SettlementRecord":
+        return cls(*row)
+
+    @property
+    def amount(self) -> Decimal:
+        return from_cents(self.amount_cents)
+
+    @property
+    def timestamp(self) -> datetime:
+        return from_micros(self.timestamp_us)
+
+    def to_row(self) -> list:
+        return [self.id, self.from_user_id, self.to_user_id, self.amount_cents, self.timestamp_us]
+
+    def to_model(self) -> Settlement:
+        return Settlement(id=self.id, from_user_id=self.from_user_id, to_user_id=self.to_user_id,
+                          amount=self.amount, timestamp=self.timestamp)
@@ -0,0 +1,310 @@
+"""Recurring expense definitions, ordered by their next run in a min-heap and saved as JSON"""
+
+import fcntl
+import heapq
+import json
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+from models.recurring import MAX_CATCH_UP, RecurringExpense, parse_schedule
+from models.transaction import GroupExpense
+
+# Runs recorded per pass; a longer backlog (e.g. after downtime) is worked off over several passes
+BATCH_SIZE = 1000
+
+# Opens the store of a ledger (None for the default one) for a with block; it yields None for an unknown group
+LedgerOpener = Callable[[Optional[str]], ContextManager[Any]]
+Run = Tuple[RecurringExpense, datetime]
+Outcome = Tuple[RecurringExpense, Optional[str]]  # A run's definition and why it was skipped (None if recorded)
+Cursor = Optional[Tuple[int, str]]  # Position and ID of a ledger's newest expense, None for an empty ledger
+
+
+def newest_cursor(store) -> Cursor:
+    """Cursor at the ledger's newest expense"""
+    for position, expense in store.iter_group_expenses(newest_first=True):
+        return position, expense.id
+    return None
+
+
+def scan_start(store, cursor: Cursor) -> int:
+    """First position past the cursor, or 0 when the ledger no longer has its expense (e.g. after a reset)"""
+    if cursor is None:
+        return 0
+    position, expense_id = cursor
+    expense = store.get_group_expense_at(position)
+    return position + 1 if expense is not None and expense.id == expense_id else 0
+
+
+class RecurringBook:
+    """Recurring expenses of an app, with a min-heap of (next_run, id) over all of them.
+
+    The next run due is the top of the heap, so waiting for it and popping due runs
+    cost O(log n) per run whatever the number of definitions. Removed definitions
+    leave stale heap entries that are dropped when they surface.
+
+    With a path the book is saved as JSON after every change, under an flock that
+    workers sharing the data directory also take, and reloaded when another
+    process changed it. Each ledger's newest expense (position and ID) is saved
+    alongside: bills get IDs derived from their definition and run, and the
+    expenses past it are checked for them before recording, so a run that a
+    crashed pass or another worker already recorded is not recorded twice. When
+    the ledger no longer has that expense (it was reset), all of it is checked.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.definitions: Dict[str, RecurringExpense] = {}
+        self.cursors: Dict[str, Cursor] = {}  # Newest expense per ledger ("" is the default one) at the last save
+        self._heap: List[Tuple[datetime, str]] = []
+        self._generation = 0  # Bumped whenever the book is reloaded from its file
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._lock_fd = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the book, across processes when it has a file, reloading it first if the file changed"""
+        with self._lock:
+            if self._lock_fd is None:
+                yield
+                return
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    self._load()
+                    self._stamp = stamp
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        definitions, cursors = [], {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            definitions = [RecurringExpense.model_validate(definition) for definition in saved["definitions"]]
+            cursors = {key: tuple(cursor) if cursor else None for key, cursor in saved["cursors"].items()}
+        self.definitions = {definition.id: definition for definition in definitions}
+        self.cursors = cursors
+        self._generation += 1
+        self._rebuild_heap()
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({
+                "definitions": [definition.model_dump(mode="json") for definition in self.definitions.values()],
+                "cursors": self.cursors
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._stamp = self._file_stamp()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(definition.next_run, definition.id) for definition in self.definitions.values()
+                      if definition.next_run is not None]
+        heapq.heapify(self._heap)
+
+    def add(self, definition: RecurringExpense, store) -> None:
+        """Add a definition for the ledger held by `store`"""
+        with self._transaction():
+            key = definition.group_id or ""
+            if key not in self.cursors:
+                self.cursors[key] = newest_cursor(store)
+            self.definitions[definition.id] = definition
+            if definition.next_run is not None:
+                heapq.heappush(self._heap, (definition.next_run, definition.id))
+            self._save()
+
+    def forget_ledger(self, group_id: Optional[str]) -> None:
+        """Drop a ledger's cursor after its history was reset, so the next pass checks all of it"""
+        with self._transaction():
+            if (group_id or "") in self.cursors:
+                del self.cursors[group_id or ""]
+                self._save()
+
+    def remove(self, definition_id: str, group_id: Optional[str]) -> Optional[RecurringExpense]:
+        """Remove a ledger's definition; None when it has no such definition"""
+        with self._transaction():
+            definition = self.definitions.get(definition_id)
+            if definition is None or definition.group_id != group_id:
+                return None
+            del self.definitions[definition_id]
+            self._save()
+            return definition
+
+    def list(self, group_id: Optional[str]) -> List[RecurringExpense]:
+        """Copies of a ledger's definitions, soonest next run first"""
+        with self._transaction():
+            definitions = [definition.model_copy() for definition in self.definitions.values() if definition.group_id == group_id]
+        return sorted(definitions, key=lambda definition: (definition.next_run is None, definition.next_run or datetime.min))
+
+    def next_due(self) -> Optional[datetime]:
+        """The earliest next run of any definition"""
+        with self._transaction():
+            while self._heap:
+                run, definition_id = self._heap[0]
+                definition = self.definitions.get(definition_id)
+                if definition is not None and definition.next_run == run:
+                    return run
+                heapq.heappop(self._heap)
+            return None
+
+    def materialize(self, open_ledger: LedgerOpener, now: Optional[datetime] = None, limit: int = BATCH_SIZE) -> int:
+        """Record runs due by `now` as bills, oldest first and at most `limit`; returns how many were due.
+
+        The due runs are taken under the book lock, recorded without it, and their
+        outcome saved under it again, so a long catch-up does not hold up the API.
+        Each ledger's runs go in as one add_group_expenses batch, checked like
+        POST /transactions/batch under the ledger's write lock. Runs that fail the
+        checks are skipped (counted, with the reason as last_error), not retried.
+        """
+        now = now or datetime.now()
+        with self._transaction():
+            generation = self._generation
+            due, outcomes, first_runs, next_runs = self._pop_due(now, limit)
+            cursors = {key: self.cursors.get(key) for key in due}
+        newest: Dict[str, Cursor] = {}
+        try:
+            for key, runs in due.items():
+                errors, newest[key] = self._record(open_ledger, runs, key, cursors[key])
+                outcomes.extend(zip((definition for definition, _ in runs), errors))
+        finally:
+            with self._transaction():
+                self._finish(outcomes, first_runs, next_runs, generation)
+                self.cursors.update(newest)
+                self._save()
+        return sum(map(len, due.values()))
+
+    def _pop_due(self, now: datetime, limit: int) -> Tuple[Dict[str, List[Run]], List[Outcome],
+                                                           Dict[str, datetime], Dict[str, Optional[datetime]]]:
+        """Pop runs due by `now`: runs to record by ledger in time order, outcomes of runs too old to
+        record, each popped definition's next run when popped and its run after the last one popped"""
+        due: Dict[str, List[Run]] = defaultdict(list)
+        expired: List[Outcome] = []
+        first_runs: Dict[str, datetime] = {}
+        next_runs: Dict[str, Optional[datetime]] = {}
+        oldest = now - MAX_CATCH_UP
+        count = 0
+        while self._heap and count < limit:
+            run, definition_id = self._heap[0]
+            definition = self.definitions.get(definition_id)
+            if definition is None or run != next_runs.get(definition_id, definition.next_run):
+                heapq.heappop(self._heap)
+                continue
+            if run > now:
+                break
+            heapq.heappop(self._heap)
+            first_runs.setdefault(definition_id, run)
+            schedule = parse_schedule(definition.schedule)
+            if run < oldest:
+                # Down for longer than the catch-up window: resume with its first run inside it
+                expired.append((definition, f"Runs due before {oldest:%Y-%m-%d %H:%M} were too old to record"))
+                following = schedule.next_after(oldest)
+            else:
+                due[definition.group_id or ""].append((definition, run))
+                count += 1
+                following = schedule.next_after(run)
+            next_runs[definition_id] = following
+            if following is not None:
+                heapq.heappush(self._heap, (following, definition_id))
+        return due, expired, first_runs, next_runs
+
+    def _record(self, open_ledger: LedgerOpener, runs: List[Run], key: str,
+                cursor: Cursor) -> Tuple[List[Optional[str]], Cursor]:
+        """Record one ledger's due runs; returns each run's error (None if recorded) and the newest cursor"""
+        with open_ledger(key or None) as store:
+            if store is None:
+                return ["Group not found"] * len(runs), None
+            with store.write_lock:
+                return self._record_runs(store, runs, cursor), newest_cursor(store)
+
+    def _record_runs(self, store, runs: List[Run], cursor: Cursor) -> List[Optional[str]]:
+        """Add the bills of a ledger's runs; returns each run's error (None if recorded)"""
+        recorded = {expense.id for _, expense in store.iter_group_expenses(scan_start(store, cursor))}
+        users = {user.id: user for user in store.get_all_users()}
+        spent: Dict[str, Decimal] = defaultdict(Decimal)
+        errors: List[Optional[str]] = []
+        expenses = []
+        for definition, run in runs:
+            expense_id = definition.expense_id(run)
+            error = None
+            if expense_id in recorded:
+                pass
+            elif definition.payer_id not in users:
+                error = "Payer not found"
+            elif any(participant_id not in users for participant_id in definition.participant_ids):
+                error = "Participant not found"
+            elif users[definition.payer_id].wallet_balance < spent[definition.payer_id] + definition.total_amount:
+                available = users[definition.payer_id].wallet_balance - spent[definition.payer_id]
+                error = f"Insufficient funds. Available: ${available}, Required: ${definition.total_amount}"
+            else:
+                spent[definition.payer_id] += definition.total_amount
+                expense = GroupExpense.create(definition.payer_id, definition.total_amount, definition.description,
+                                              definition.participant_ids)
+                expense.id = expense_id
+                # Dated when it fell due; the history files a back-dated bill at its time
+                expense.timestamp = run
+                expenses.append(expense)
+            errors.append(error)
+        try:
+            store.add_group_expenses(expenses)
+        except ValueError:
+            # A storage limit (e.g. the mapped ledger's participant cap) rejected some bill: add them one by one
+            failures = {}
+            for expense in expenses:
+                try:
+                    store.add_group_expense(expense)
+                except ValueError as e:
+                    failures[expense.id] = str(e)
+            errors = [error or failures.get(definition.expense_id(run)) for error, (definition, run) in zip(errors, runs)]
+        return errors
+
+    def _finish(self, outcomes: List[Outcome], first_runs: Dict[str, datetime],
+                next_runs: Dict[str, Optional[datetime]], generation: int) -> None:
+        """Count the outcomes and advance the definitions that nobody removed or advanced meanwhile"""
+        advanced = set()
+        for definition, error in outcomes:
+            current = self.definitions.get(definition.id)
+            if current is None or current.next_run != first_runs[definition.id]:
+                continue
+            if error is None:
+                current.occurrences += 1
+            else:
+                current.skipped += 1
+                current.last_error = error
+            advanced.add(definition.id)
+        for definition_id in advanced:
+            self.definitions[definition_id].next_run = next_runs[definition_id]
+        if generation != self._generation:
+            # Reloaded since the runs were popped: the heap came from the file
+            self._rebuild_heap()
+            return
+        for definition_id, run in first_runs.items():
+            definition = self.definitions.get(definition_id)
+            if definition_id not in advanced and definition is not None and definition.next_run == run:
+                # Its ledger failed before recording: put its run back
+                heapq.heappush(self._heap, (run, definition_id))
+
+    def close(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
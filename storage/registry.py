@@ -0,0 +1,145 @@
+"""Registry of independent group ledgers with LRU eviction of idle ones"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+GROUP_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class LedgerRegistry:
+    """Maps group IDs to stores opened on first access, keeping at most `max_loaded` in memory.
+
+    With a directory each group lives in its own subdirectory; the least recently
+    used idle ledgers are snapshotted and closed once more than `max_loaded` are
+    open, and reopened from that snapshot on their next request. Without a
+    directory ledgers only exist in memory and are never evicted.
+
+    Loading and evicting a ledger happen outside the registry lock, so a cold load
+    or an eviction snapshot only holds up requests for that one group: while a
+    group is pending they wait for it, and every other group is served meanwhile.
+    """
+
+    def __init__(self, open_store: Callable[[Optional[str]], Any], directory: Optional[str] = None,
+                 max_loaded: int = 64):
+        self.open_store = open_store
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._stores: "OrderedDict[str, Any]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._pending: Dict[str, threading.Event] = {}  # Groups being loaded or evicted, set once done
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, group_id: str) -> Optional[str]:
+        """Directory holding a group's ledger (None for in-memory registries)"""
+        if not GROUP_ID_PATTERN.match(group_id):
+            raise ValueError(f"Invalid group ID: {group_id}")
+        return os.path.join(self.directory, group_id) if self.directory else None
+
+    def exists(self, group_id: str) -> bool:
+        path = self.path(group_id)
+        return (group_id in self._stores or group_id in self._pending
+                or (path is not None and os.path.isdir(path)))
+
+    def create(self, group_id: str) -> None:
+        """Create an empty ledger for a new group"""
+        with self._lock:
+            if self.exists(group_id):
+                raise FileExistsError(f"Group already exists: {group_id}")
+            path = self.path(group_id)
+            if path is not None:
+                os.makedirs(path)
+            self._pending[group_id] = threading.Event()
+        self._load(group_id, path, pin=False)
+
+    def acquire(self, group_id: str) -> Any:
+        """Get a group's store, loading it if needed; it stays loaded until release()"""
+        while True:
+            with self._lock:
+                store = self._stores.get(group_id)
+                pending = self._pending.get(group_id)
+                if store is not None:
+                    self.hits += 1
+                    self._stores.move_to_end(group_id)
+                    self._pins[group_id] = self._pins.get(group_id, 0) + 1
+                    return store
+                if pending is None:
+                    if not self.exists(group_id):
+                        raise KeyError(f"Group not found: {group_id}")
+                    self.misses += 1
+                    self._pending[group_id] = threading.Event()
+                    break
+            # Another request is loading or evicting this group: wait for it, then look again
+            pending.wait()
+        return self._load(group_id, self.path(group_id), pin=True)
+
+    def release(self, group_id: str) -> None:
+        with self._lock:
+            self._pins[group_id] -= 1
+            if not self._pins[group_id]:
+                del self._pins[group_id]
+        self._evict_idle()
+
+    def _load(self, group_id: str, path: Optional[str], pin: bool) -> Any:
+        """Open a pending group's store and make it available"""
+        try:
+            store = self.open_store(path)
+        except BaseException:
+            with self._lock:
+                self._pending.pop(group_id).set()
+            raise
+        with self._lock:
+            self._stores[group_id] = store
+            if pin:
+                self._pins[group_id] = self._pins.get(group_id, 0) + 1
+            self._pending.pop(group_id).set()
+        self._evict_idle()
+        return store
+
+    def _evict_idle(self) -> None:
+        """Snapshot and close least recently used ledgers that no request is using"""
+        if self.directory is None:
+            return
+        evicted = []
+        with self._lock:
+            for group_id in list(self._stores):
+                if len(self._stores) <= self.max_loaded:
+                    break
+                if group_id in self._pins:
+                    continue
+                evicted.append((group_id, self._stores.pop(group_id)))
+                # Pending until written out, so it is not reopened from a half-written snapshot
+                self._pending[group_id] = threading.Event()
+                self.evictions += 1
+        for group_id, store in evicted:
+            try:
+                if hasattr(store, "snapshot"):
+                    store.snapshot()
+                store.close()
+            finally:
+                with self._lock:
+                    self._pending.pop(group_id).set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "loaded": len(self._stores),
+                "in_use": len(self._pins),
+                "max_loaded": self.max_loaded,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def close(self) -> None:
+        """Close every loaded ledger"""
+        with self._lock:
+            stores = list(self._stores.values())
+            self._stores.clear()
+        for store in stores:
+            store.close()
@@ -0,0 +1,122 @@
+"""Inverted index over expense descriptions, with prefix matching"""
+
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from functools import lru_cache
+from heapq import merge
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN = re.compile(r"[^\W_]+")
+MAX_TERMS = 8
+
+# Rank tiers: every term matches a whole word, or only some match as a word prefix
+WORD_MATCH = 0
+PREFIX_MATCH = 1
+
+SearchPosition = Tuple[int, int]  # (tier, position) of a result, also where the next page resumes
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded words without diacritics, split like SQLite FTS5's unicode61 tokenizer"""
+    if text.isascii():
+        return TOKEN.findall(text.lower())
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    return TOKEN.findall("".join(char for char in folded if not unicodedata.combining(char)))
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct words of a search query, in order"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+@lru_cache(maxsize=4096)
+def _word_set(description: str) -> FrozenSet[str]:
+    # Descriptions are interned and repeat a lot, so candidates mostly hit this cache
+    return frozenset(tokenize(description))
+
+
+def _descending(postings: array, before: int) -> Iterator[int]:
+    """Positions below `before`, newest first, read in place while writers append"""
+    for index in range(bisect_left(postings, before) - 1, -1, -1):
+        yield postings[index]
+
+
+class DescriptionIndex:
+    """Postings of expense positions per word, plus the sorted vocabulary for prefix lookups.
+
+    Postings are int64 arrays in ascending position order, so the newest matches
+    are read from the end and a page costs about `limit` postings of the most
+    selective term, whatever the size of the ledger. Writers hold the store's
+    write lock; readers never lock.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, array] = {}
+        self.vocabulary: List[str] = []
+
+    def add(self, position: int, description: str) -> None:
+        for word in _word_set(description):
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = array("q")
+                insort(self.vocabulary, word)
+            postings.append(position)
+
+    def _prefixed(self, term: str) -> List[Tuple[str, array]]:
+        """Every word starting with the term, with its postings"""
+        words = []
+        for index in range(bisect_left(self.vocabulary, term), len(self.vocabulary)):
+            word = self.vocabulary[index]
+            if not word.startswith(term):
+                break
+            words.append((word, self.postings[word]))
+        return words
+
+    def search(self, terms: List[str], description_at: Callable[[int], str],
+               after: Optional[SearchPosition] = None) -> Iterator[SearchPosition]:
+        """Yield (tier, position) of entries matching every term, best first.
+
+        Entries where each term is a whole word come first, then those where
+        some term only starts a word; newest first within a tier. `after`
+        resumes behind a previously yielded result.
+        """
+        tier, before = after if after is not None else (WORD_MATCH, 2 ** 63 - 1)
+        if tier == WORD_MATCH:
+            exact = [self.postings.get(term) for term in terms]
+            if all(postings is not None for postings in exact):
+                # Walk the rarest word; check the others on each candidate
+                for position in _descending(min(exact, key=len), before):
+                    if _word_set(description_at(position)).issuperset(terms):
+                        yield WORD_MATCH, position
+            before = 2 ** 63 - 1
+
+        expansions = [self._prefixed(term) for term in terms]
+        if not all(expansions):
+            return
+        # A prefix match is among the postings of the rarest term's words, and also among
+        # those of the longer words of some term; walk whichever candidate set is smaller
+        rarest = min(expansions, key=lambda words: sum(len(postings) for _, postings in words))
+        longer = [postings for term, words in zip(terms, expansions) for word, postings in words if word != term]
+        candidates = [postings for _, postings in rarest]
+        if sum(map(len, longer)) < sum(map(len, candidates)):
+            candidates = longer
+        previous = None
+        for position in merge(*(_descending(postings, before) for postings in candidates), reverse=True):
+            if position == previous:
+                continue
+            previous = position
+            words = _word_set(description_at(position))
+            if words.issuperset(terms):
+                continue  # already yielded as a whole-word match
+            if all(any(word.startswith(term) for word in words) for term in terms):
+                yield PREFIX_MATCH, position
+
+
+def index_descriptions(descriptions: Iterable[str]) -> DescriptionIndex:
+    """Index descriptions by their position in the iterable"""
+    index = DescriptionIndex()
+    for position, description in enumerate(descriptions):
+        index.add(position, description)
+    return index
@@ -0,0 +1,727 @@
+"""SQLite storage engine with the same interface as SimpleStore"""
+
+import json
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+from models.money import to_cents, from_cents
+from models.transaction import Transaction, GroupExpense
+from models.settlement import Settlement
+from storage.aggregates import RunningStats
+from storage.columns import ColumnLog, Columns
+from storage.history import LedgerView
+from storage.in_memory_store import locked
+from storage.mapped_store import LedgerLock
+from storage.records import UserRecord, SpendingRecord, SettlementRecord, local_time, to_micros
+from storage.search import PREFIX_MATCH, WORD_MATCH, SearchPosition, query_terms
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    wallet_cents INTEGER NOT NULL,
+    spent_cents INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS group_expenses (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    payer_id TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    share_cents INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    is_settled INTEGER NOT NULL DEFAULT 0,
+    participant_ids TEXT NOT NULL,
+    settled_participant_ids TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_payer ON group_expenses (payer_id, seq);
+CREATE INDEX IF NOT EXISTS idx_expenses_timestamp ON group_expenses (timestamp);
+CREATE TABLE IF NOT EXISTS expense_shares (
+    expense_seq INTEGER NOT NULL,
+    debtor_id TEXT NOT NULL,
+    creditor_id TEXT NOT NULL,
+    share_cents INTEGER NOT NULL,
+    is_settled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (expense_seq, debtor_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_shares_unsettled
+    ON expense_shares (debtor_id, creditor_id, expense_seq) WHERE is_settled = 0;
+CREATE INDEX IF NOT EXISTS idx_shares_pair ON expense_shares (creditor_id, debtor_id, share_cents);
+CREATE INDEX IF NOT EXISTS idx_shares_unsettled_size
+    ON expense_shares (debtor_id, creditor_id, share_cents) WHERE is_settled = 0;
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id, seq);
+CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp);
+CREATE TABLE IF NOT EXISTS settlements (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    from_user_id TEXT NOT NULL,
+    to_user_id TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_settlements_pair ON settlements (from_user_id, to_user_id, amount_cents);
+CREATE INDEX IF NOT EXISTS idx_settlements_timestamp ON settlements (timestamp);
+CREATE TABLE IF NOT EXISTS balances (
+    debtor_id TEXT NOT NULL,
+    creditor_id TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    PRIMARY KEY (debtor_id, creditor_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_balances_creditor ON balances (creditor_id, amount_cents);
+CREATE VIRTUAL TABLE IF NOT EXISTS expense_search USING fts5(
+    description, content='group_expenses', content_rowid='seq', prefix='2 3'
+);
+CREATE TABLE IF NOT EXISTS ledger_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    ledger_id TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ledger_stats (
+    kind TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL,
+    min_cents INTEGER,
+    max_cents INTEGER,
+    sum_squares REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Ledger ID and a version bumped by every commit, shared by all processes using the database
+INSERT_META = "INSERT OR IGNORE INTO ledger_meta (id, ledger_id, version) VALUES (0, ?, 0)"
+SELECT_LEDGER_ID = "SELECT ledger_id FROM ledger_meta"
+SELECT_VERSION = "SELECT version FROM ledger_meta"
+BUMP_VERSION = "UPDATE ledger_meta SET version = version + 1"
+
+# Statements are kept as constants so each pooled connection's statement cache reuses them
+SELECT_USERS = "SELECT id, name, wallet_cents FROM users ORDER BY rowid"
+SELECT_USER = "SELECT id, name, wallet_cents FROM users WHERE id = ?"
+INSERT_USER = "INSERT INTO users (id, name, wallet_cents, spent_cents) VALUES (?, ?, ?, ?)"
+UPDATE_WALLET = "UPDATE users SET wallet_cents = wallet_cents + ? WHERE id = ?"
+UPDATE_SPENT = "UPDATE users SET spent_cents = spent_cents + ? WHERE id = ?"
+SELECT_SPENT = "SELECT spent_cents FROM users WHERE id = ?"
+
+EXPENSE_COLUMNS = (
+    "seq, id, payer_id, total_cents, share_cents, description, timestamp, is_settled, "
+    "participant_ids, settled_participant_ids"
+)
+INSERT_EXPENSE = (
+    "INSERT INTO group_expenses (id, payer_id, total_cents, share_cents, description, timestamp, is_settled, "
+    "participant_ids, settled_participant_ids) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_EXPENSES = f"SELECT {EXPENSE_COLUMNS} FROM group_expenses ORDER BY seq"
+SELECT_EXPENSE_AT = f"SELECT {EXPENSE_COLUMNS} FROM group_expenses WHERE seq = ?"
+SELECT_EXPENSES_FROM = f"SELECT {EXPENSE_COLUMNS} FROM group_expenses WHERE seq >= ? ORDER BY seq LIMIT ?"
+SELECT_EXPENSES_BEFORE = f"SELECT {EXPENSE_COLUMNS} FROM group_expenses WHERE seq <= ? ORDER BY seq DESC LIMIT ?"
+SELECT_EXPENSE_SETTLED_IDS = "SELECT participant_ids, settled_participant_ids FROM group_expenses WHERE seq = ?"
+UPDATE_EXPENSE_SETTLED = "UPDATE group_expenses SET settled_participant_ids = ?, is_settled = ? WHERE seq = ?"
+
+INSERT_SHARE = "INSERT INTO expense_shares (expense_seq, debtor_id, creditor_id, share_cents, is_settled) VALUES (?, ?, ?, ?, ?)"
+# Read a page at a time after the last share visited, so a settlement stops reading once nothing fits
+SETTLE_PAGE = 64
+SELECT_UNSETTLED_SHARES = (
+    "SELECT s.expense_seq, s.share_cents, e.payer_id, e.description FROM expense_shares s "
+    "JOIN group_expenses e ON e.seq = s.expense_seq "
+    "WHERE s.debtor_id = ? AND s.creditor_id = ? AND s.is_settled = 0 AND s.expense_seq > ? "
+    f"ORDER BY s.expense_seq LIMIT {SETTLE_PAGE}"
+)
+SELECT_SMALLEST_UNSETTLED_SHARE = (
+    "SELECT MIN(share_cents) FROM expense_shares WHERE debtor_id = ? AND creditor_id = ? AND is_settled = 0"
+)
+MARK_SHARE_SETTLED = "UPDATE expense_shares SET is_settled = 1 WHERE expense_seq = ? AND debtor_id = ?"
+
+TRANSACTION_COLUMNS = "id, user_id, amount_cents, description, timestamp"
+INSERT_TRANSACTION = "INSERT INTO transactions (id, user_id, amount_cents, description, timestamp) VALUES (?, ?, ?, ?, ?)"
+SELECT_TRANSACTIONS = f"SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY seq"
+SELECT_USER_TRANSACTIONS = f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE user_id = ? ORDER BY seq"
+SELECT_TRANSACTIONS_FROM = f"SELECT seq, {TRANSACTION_COLUMNS} FROM transactions WHERE seq > ? ORDER BY seq LIMIT ?"
+
+INSERT_SETTLEMENT = "INSERT INTO settlements (id, from_user_id, to_user_id, amount_cents, timestamp) VALUES (?, ?, ?, ?, ?)"
+SELECT_SETTLEMENTS = "SELECT id, from_user_id, to_user_id, amount_cents, timestamp FROM settlements ORDER BY seq"
+SELECT_SETTLEMENTS_FROM = "SELECT seq, id, from_user_id, to_user_id, amount_cents, timestamp FROM settlements WHERE seq > ? ORDER BY seq LIMIT ?"
+
+# ISO timestamp text to exact epoch microseconds (isoformat drops a zero fraction), for columnar analytics
+EPOCH_MICROS = "(CAST(strftime('%s', {0}) AS INTEGER) * 1000000 + CAST(substr({0}, 21, 6) AS INTEGER))"
+SELECT_EXPENSE_COLUMNS = f"SELECT {EPOCH_MICROS.format('timestamp')}, total_cents, payer_id FROM group_expenses ORDER BY seq"
+SELECT_SPENDING_COLUMNS = f"SELECT {EPOCH_MICROS.format('timestamp')}, amount_cents, user_id FROM transactions ORDER BY seq"
+
+UPSERT_BALANCE = (
+    "INSERT INTO balances (debtor_id, creditor_id, amount_cents) VALUES (?, ?, ?) "
+    "ON CONFLICT (debtor_id, creditor_id) DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents"
+)
+SELECT_BALANCE = "SELECT amount_cents FROM balances WHERE debtor_id = ? AND creditor_id = ?"
+SELECT_NET_BALANCE = "SELECT COALESCE(SUM(amount_cents), 0) FROM balances WHERE creditor_id = ?"
+SELECT_NET_BALANCES = "SELECT creditor_id, SUM(amount_cents) AS net FROM balances GROUP BY creditor_id HAVING net != 0"
+SELECT_OUTSTANDING_DEBTS = "SELECT debtor_id, creditor_id, amount_cents FROM balances WHERE amount_cents > 0"
+SCAN_AMOUNT_OWED = """
+SELECT
+    (SELECT COALESCE(SUM(share_cents), 0) FROM expense_shares
+        WHERE creditor_id = :to_user AND debtor_id = :from_user)
+  - (SELECT COALESCE(SUM(share_cents), 0) FROM expense_shares
+        WHERE creditor_id = :from_user AND debtor_id = :to_user)
+  - (SELECT COALESCE(SUM(amount_cents), 0) FROM settlements
+        WHERE from_user_id = :from_user AND to_user_id = :to_user)
+  + (SELECT COALESCE(SUM(amount_cents), 0) FROM settlements
+        WHERE from_user_id = :to_user AND to_user_id = :from_user)
+"""
+REBUILD_BALANCES = """
+INSERT INTO balances (debtor_id, creditor_id, amount_cents)
+SELECT debtor_id, creditor_id, SUM(amount_cents) FROM (
+    SELECT debtor_id, creditor_id, share_cents AS amount_cents FROM expense_shares
+    UNION ALL
+    SELECT creditor_id, debtor_id, -share_cents FROM expense_shares
+    UNION ALL
+    SELECT from_user_id, to_user_id, -amount_cents FROM settlements
+    UNION ALL
+    SELECT to_user_id, from_user_id, amount_cents FROM settlements
+) GROUP BY debtor_id, creditor_id
+"""
+
+# Running aggregates per kind ("expenses", "settlements"), folded in by every write
+UPSERT_STATS = """
+INSERT INTO ledger_stats (kind, count, total_cents, min_cents, max_cents, sum_squares) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (kind) DO UPDATE SET
+    count = count + excluded.count,
+    total_cents = total_cents + excluded.total_cents,
+    min_cents = MIN(COALESCE(min_cents, excluded.min_cents), excluded.min_cents),
+    max_cents = MAX(COALESCE(max_cents, excluded.max_cents), excluded.max_cents),
+    sum_squares = sum_squares + excluded.sum_squares
+"""
+SELECT_STATS = "SELECT count, total_cents, min_cents, max_cents, sum_squares FROM ledger_stats WHERE kind = ?"
+SELECT_STATS_KINDS = "SELECT COUNT(*) FROM ledger_stats"
+REBUILD_STATS = """
+INSERT INTO ledger_stats (kind, count, total_cents, min_cents, max_cents, sum_squares)
+SELECT 'expenses', COUNT(*), COALESCE(SUM(total_cents), 0), MIN(total_cents), MAX(total_cents),
+       COALESCE(SUM(CAST(total_cents AS REAL) * total_cents), 0) FROM group_expenses
+UNION ALL
+SELECT 'settlements', COUNT(*), COALESCE(SUM(amount_cents), 0), MIN(amount_cents), MAX(amount_cents),
+       COALESCE(SUM(CAST(amount_cents AS REAL) * amount_cents), 0) FROM settlements
+"""
+# Point-in-time reads undo the events after a moment, found through the timestamp indexes
+SELECT_BALANCES = "SELECT debtor_id, creditor_id, amount_cents FROM balances"
+SELECT_PAID_AFTER = "SELECT payer_id, SUM(total_cents) FROM group_expenses WHERE timestamp > ? GROUP BY payer_id"
+SELECT_SHARES_AFTER = (
+    "SELECT s.debtor_id, s.creditor_id, SUM(s.share_cents) FROM group_expenses e "
+    "JOIN expense_shares s ON s.expense_seq = e.seq WHERE e.timestamp > ? GROUP BY s.debtor_id, s.creditor_id"
+)
+SELECT_SETTLED_AFTER = "SELECT from_user_id, to_user_id, amount_cents FROM settlements WHERE timestamp > ?"
+SELECT_TRANSACTIONS_UNTIL = f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE timestamp <= ? ORDER BY seq"
+SELECT_SETTLEMENTS_UNTIL = "SELECT id, from_user_id, to_user_id, amount_cents, timestamp FROM settlements WHERE timestamp <= ? ORDER BY seq"
+
+# Full-text index over expense descriptions (external content: group_expenses holds the text)
+SELECT_HAS_SEARCH = "SELECT 1 FROM sqlite_master WHERE name = 'expense_search'"
+INSERT_SEARCH = "INSERT INTO expense_search (rowid, description) VALUES (?, ?)"
+REBUILD_SEARCH = "INSERT INTO expense_search (expense_search) VALUES ('rebuild')"
+CLEAR_SEARCH = "INSERT INTO expense_search (expense_search) VALUES ('delete-all')"
+SEARCH_EXPENSES = (
+    f"SELECT {EXPENSE_COLUMNS} FROM group_expenses WHERE seq IN ("
+    "SELECT rowid FROM expense_search WHERE expense_search MATCH ? AND rowid < ? ORDER BY rowid DESC LIMIT ?"
+    ") ORDER BY seq DESC"
+)
+
+SIZE_NAMES = ("users", "expenses", "spending_records", "settlements", "unsettled_shares")
+SELECT_SIZES = """
+SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM group_expenses), (SELECT COUNT(*) FROM transactions),
+       (SELECT COUNT(*) FROM settlements), (SELECT COUNT(*) FROM expense_shares WHERE is_settled = 0)
+"""
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across request threads"""
+
+    def __init__(self, path: str, size: int = 4):
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._connections = []
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._connections.append(conn)
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, waiting if all are in use"""
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+
+
+class SQLiteStore:
+    """SQLite-backed storage with the same methods as SimpleStore.
+
+    Runs in WAL mode so readers never block the writer. Amounts are stored as
+    integer cents, and owed balances and spending totals are kept in indexed
+    tables that are updated in the same transaction as each mutation.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4):
+        # Serializes check-then-apply sequences across every worker on the database, not just
+        # its single statements, so two workers cannot both pass a wallet check and overdraw
+        self._lock_fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self.write_lock = LedgerLock(self._lock_fd, lambda: None)
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            has_search = conn.execute(SELECT_HAS_SEARCH).fetchone() is not None
+            conn.executescript(SCHEMA)
+            conn.execute(INSERT_META, (uuid4().hex,))
+            # Stored in the database, so ETags agree whichever worker answers
+            self.instance_id = conn.execute(SELECT_LEDGER_ID).fetchone()[0]
+            if not has_search:
+                # Databases created before the search index get it built from their expenses
+                conn.execute(REBUILD_SEARCH)
+        with self._write() as conn:
+            if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+                for name in ("User A", "User B"):
+                    conn.execute(INSERT_USER, (str(uuid4()), name, to_cents(Decimal("500.00")), 0))
+            if conn.execute(SELECT_STATS_KINDS).fetchone()[0] == 0:
+                # Databases created before the stats table get it filled from their history
+                conn.execute(REBUILD_STATS)
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in one immediate (write-locked) transaction"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute(BUMP_VERSION)
+            conn.execute("COMMIT")
+
+    @property
+    def version(self) -> int:
+        """Commits to the database so far, by this or any other process"""
+        with self.pool.connection() as conn:
+            return conn.execute(SELECT_VERSION).fetchone()[0]
+
+    @staticmethod
+    def _user(row: Tuple) -> UserRecord:
+        return UserRecord(row[0], row[1], row[2])
+
+    @staticmethod
+    def _expense(row: Tuple) -> GroupExpense:
+        return GroupExpense(
+            id=row[1],
+            payer_id=row[2],
+            total_amount=from_cents(row[3]),
+            individual_share=from_cents(row[4]),
+            description=row[5],
+            timestamp=datetime.fromisoformat(row[6]),
+            is_settled=bool(row[7]),
+            participant_ids=json.loads(row[8]),
+            settled_participant_ids=json.loads(row[9])
+        )
+
+    @staticmethod
+    def _transaction(row: Tuple) -> Transaction:
+        return Transaction(
+            id=row[0],
+            user_id=row[1],
+            amount=from_cents(row[2]),
+            description=row[3],
+            timestamp=datetime.fromisoformat(row[4])
+        )
+
+    @staticmethod
+    def _settlement(row: Tuple) -> Settlement:
+        return Settlement(
+            id=row[0],
+            from_user_id=row[1],
+            to_user_id=row[2],
+            amount=from_cents(row[3]),
+            timestamp=datetime.fromisoformat(row[4])
+        )
+
+    @staticmethod
+    def _adjust_balance(conn: sqlite3.Connection, debtor_id: str, creditor_id: str, cents: int) -> None:
+        """Record that debtor owes creditor extra cents (negative to reduce)"""
+        conn.execute(UPSERT_BALANCE, (debtor_id, creditor_id, cents))
+        conn.execute(UPSERT_BALANCE, (creditor_id, debtor_id, -cents))
+
+    @staticmethod
+    def _add_stats(conn: sqlite3.Connection, kind: str, amounts: List[int]) -> None:
+        """Fold a batch of amounts into the running aggregates"""
+        if amounts:
+            conn.execute(UPSERT_STATS, (
+                kind, len(amounts), sum(amounts), min(amounts), max(amounts),
+                float(sum(cents * cents for cents in amounts))
+            ))
+
+    def _stats(self, kind: str) -> RunningStats:
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_STATS, (kind,)).fetchone()
+        return RunningStats.from_values(*row) if row else RunningStats()
+
+    @staticmethod
+    def _record_spending(conn: sqlite3.Connection, transaction: Transaction) -> None:
+        cents = to_cents(transaction.amount)
+        conn.execute(INSERT_TRANSACTION, (
+            transaction.id, transaction.user_id, cents,
+            transaction.description, transaction.timestamp.isoformat()
+        ))
+        conn.execute(UPDATE_SPENT, (cents, transaction.user_id))
+
+    def get_all_users(self) -> List[UserRecord]:
+        """Get all users"""
+        with self.pool.connection() as conn:
+            return [self._user(row) for row in conn.execute(SELECT_USERS)]
+
+    @locked
+    def add_user(self, name: str, wallet_balance: Decimal = Decimal("500.00")) -> UserRecord:
+        """Add a new group member"""
+        user = UserRecord.create(name, to_cents(wallet_balance))
+        with self._write() as conn:
+            conn.execute(INSERT_USER, (user.id, user.name, user.wallet_cents, 0))
+        return user
+
+    def get_user(self, user_id: str) -> UserRecord:
+        """Get user by ID"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_USER, (user_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"User not found: {user_id}")
+        return self._user(row)
+
+    def add_group_expense(self, group_expense: GroupExpense) -> None:
+        """Add group expense - every other participant owes the payer their share"""
+        self.add_group_expenses([group_expense])
+
+    @locked
+    def add_group_expenses(self, group_expenses: List[GroupExpense]) -> None:
+        """Add a batch of group expenses in a single transaction - all or nothing"""
+        for group_expense in group_expenses:
+            # Expenses must name who splits them; the API defaults to every member
+            if not group_expense.participant_ids:
+                raise ValueError("An expense needs at least one participant")
+        
+        wallet_deltas: Dict[str, int] = {}
+        balance_deltas: Dict[Tuple[str, str], int] = {}
+        with self._write() as conn:
+            user_ids = {participant_id for group_expense in group_expenses for participant_id in group_expense.participant_ids}
+            user_ids.update(group_expense.payer_id for group_expense in group_expenses)
+            for user_id in user_ids:
+                if conn.execute(SELECT_USER, (user_id,)).fetchone() is None:
+                    raise KeyError(f"User not found: {user_id}")
+            
+            for group_expense in group_expenses:
+                debtor_ids = group_expense.debtor_ids()
+                if not debtor_ids:
+                    group_expense.is_settled = True
+                total_cents = to_cents(group_expense.total_amount)
+                share_cents = to_cents(group_expense.individual_share)
+                wallet_deltas[group_expense.payer_id] = wallet_deltas.get(group_expense.payer_id, 0) + total_cents
+                
+                expense_seq = conn.execute(INSERT_EXPENSE, (
+                    group_expense.id, group_expense.payer_id, total_cents, share_cents,
+                    group_expense.description, group_expense.timestamp.isoformat(),
+                    int(group_expense.is_settled), json.dumps(group_expense.participant_ids), "[]"
+                )).lastrowid
+                conn.execute(INSERT_SEARCH, (expense_seq, group_expense.description))
+                conn.executemany(INSERT_SHARE, [
+                    (expense_seq, debtor_id, group_expense.payer_id, share_cents, 0) for debtor_id in debtor_ids
+                ])
+                for debtor_id in debtor_ids:
+                    pair = (debtor_id, group_expense.payer_id)
+                    balance_deltas[pair] = balance_deltas.get(pair, 0) + share_cents
+                
+                # Track the payer's share of spending (not the full amount), odd cents included
+                if group_expense.payer_id in group_expense.participant_ids:
+                    self._record_spending(conn, Transaction.create_spending_record(
+                        user_id=group_expense.payer_id,
+                        amount=from_cents(total_cents - share_cents * len(debtor_ids)),
+                        description=group_expense.description,
+                        timestamp=group_expense.timestamp
+                    ))
+            
+            self._add_stats(conn, "expenses", [to_cents(group_expense.total_amount) for group_expense in group_expenses])
+            
+            # Wallets and debts change once per payer and pair, however large the batch
+            conn.executemany(UPDATE_WALLET, [(-cents, payer_id) for payer_id, cents in wallet_deltas.items()])
+            for (debtor_id, creditor_id), cents in balance_deltas.items():
+                self._adjust_balance(conn, debtor_id, creditor_id, cents)
+
+    @locked
+    def add_settlement(self, settlement: Settlement) -> None:
+        """Add settlement - transfer money and create spending records for settled expenses"""
+        amount_cents = to_cents(settlement.amount)
+        with self._write() as conn:
+            for user_id in (settlement.from_user_id, settlement.to_user_id):
+                if conn.execute(SELECT_USER, (user_id,)).fetchone() is None:
+                    raise KeyError(f"User not found: {user_id}")
+            conn.execute(INSERT_SETTLEMENT, (
+                settlement.id, settlement.from_user_id, settlement.to_user_id,
+                amount_cents, settlement.timestamp.isoformat()
+            ))
+            self._add_stats(conn, "settlements", [amount_cents])
+            conn.execute(UPDATE_WALLET, (-amount_cents, settlement.from_user_id))
+            conn.execute(UPDATE_WALLET, (amount_cents, settlement.to_user_id))
+            self._adjust_balance(conn, settlement.from_user_id, settlement.to_user_id, -amount_cents)
+            
+            # Settle the oldest unsettled shares owed to to_user that fit in the remaining amount,
+            # reading them only until the remaining amount is below the smallest one left
+            pair = (settlement.from_user_id, settlement.to_user_id)
+            remaining_cents = amount_cents
+            smallest = conn.execute(SELECT_SMALLEST_UNSETTLED_SHARE, pair).fetchone()[0]
+            last_seq = 0
+            while smallest is not None and 0 < remaining_cents and smallest <= remaining_cents:
+                page = conn.execute(SELECT_UNSETTLED_SHARES, (*pair, last_seq)).fetchall()
+                if not page:
+                    break
+                for expense_seq, share_cents, payer_id, description in page:
+                    last_seq = expense_seq
+                    if remaining_cents < share_cents:
+                        continue
+                    self._record_spending(conn, Transaction.create_spending_record(
+                        user_id=settlement.from_user_id,
+                        amount=from_cents(share_cents),
+                        description=description
+                    ))
+                    conn.execute(MARK_SHARE_SETTLED, (expense_seq, settlement.from_user_id))
+                    
+                    participants_json, settled_json = conn.execute(SELECT_EXPENSE_SETTLED_IDS, (expense_seq,)).fetchone()
+                    settled_ids = json.loads(settled_json) + [settlement.from_user_id]
+                    debtor_count = sum(1 for user_id in json.loads(participants_json) if user_id != payer_id)
+                    conn.execute(UPDATE_EXPENSE_SETTLED, (json.dumps(settled_ids), int(len(settled_ids) == debtor_count), expense_seq))
+                    remaining_cents -= share_cents
+                    if share_cents == smallest:
+                        smallest = conn.execute(SELECT_SMALLEST_UNSETTLED_SHARE, pair).fetchone()[0]
+                    if smallest is None or remaining_cents <= 0 or remaining_cents < smallest:
+                        break
+
+    def get_amount_owed(self, from_user_id: str, to_user_id: str) -> Decimal:
+        """Get net debt between users from the balance table"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_BALANCE, (from_user_id, to_user_id)).fetchone()
+        return from_cents(max(row[0] if row else 0, 0))
+
+    def scan_amount_owed(self, from_user_id: str, to_user_id: str) -> Decimal:
+        """Calculate net debt between users by aggregating the full history"""
+        with self.pool.connection() as conn:
+            cents = conn.execute(SCAN_AMOUNT_OWED, {"from_user": from_user_id, "to_user": to_user_id}).fetchone()[0]
+        return from_cents(max(cents, 0))
+
+    @locked
+    def rebuild_balances(self) -> None:
+        """Rebuild the balance table from expense and settlement history"""
+        with self._write() as conn:
+            conn.execute("DELETE FROM balances")
+            conn.execute(REBUILD_BALANCES)
+
+    def get_net_balance(self, user_id: str) -> Decimal:
+        """Get what others owe a user minus what the user owes others"""
+        with self.pool.connection() as conn:
+            return from_cents(conn.execute(SELECT_NET_BALANCE, (user_id,)).fetchone()[0])
+
+    def get_net_balances(self) -> Dict[str, Decimal]:
+        """Get the net position of every user with a non-zero balance"""
+        with self.pool.connection() as conn:
+            return {user_id: from_cents(cents) for user_id, cents in conn.execute(SELECT_NET_BALANCES)}
+
+    def get_outstanding_debts(self) -> List[Tuple[str, str, Decimal]]:
+        """Get (debtor_id, creditor_id, amount) for every pair with a positive debt"""
+        with self.pool.connection() as conn:
+            return [(debtor_id, creditor_id, from_cents(cents)) for debtor_id, creditor_id, cents in conn.execute(SELECT_OUTSTANDING_DEBTS)]
+
+    def get_user_transactions(self, user_id: str) -> List[Transaction]:
+        """Get individual spending records for a user"""
+        with self.pool.connection() as conn:
+            return [self._transaction(row) for row in conn.execute(SELECT_USER_TRANSACTIONS, (user_id,))]
+
+    def get_user_spending_total(self, user_id: str) -> Decimal:
+        """Get total spending for budgeting purposes"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_SPENT, (user_id,)).fetchone()
+        return from_cents(row[0] if row else 0)
+
+    def get_ledger_at(self, as_of: datetime) -> LedgerView:
+        """Get wallets, debts, spending and settlements as they stood at a past moment.
+
+        Current wallets and balances are rolled back by the expenses and settlements
+        made after it, so the work grows with the events since then. Users carry no
+        join time, so every current member is listed.
+        """
+        as_of = local_time(as_of)
+        moment = as_of.isoformat()
+        user_transactions: Dict[str, List[SpendingRecord]] = {}
+        with self.pool.connection() as conn:
+            # One read transaction, so every statement sees the same commit
+            conn.execute("BEGIN")
+            try:
+                wallets = {user_id: (name, cents) for user_id, name, cents in conn.execute(SELECT_USERS)}
+                debts: Dict[Tuple[str, str], int] = {(debtor_id, creditor_id): cents for debtor_id, creditor_id, cents in conn.execute(SELECT_BALANCES)}
+                paid = conn.execute(SELECT_PAID_AFTER, (moment,)).fetchall()
+                shares = conn.execute(SELECT_SHARES_AFTER, (moment,)).fetchall()
+                settled = conn.execute(SELECT_SETTLED_AFTER, (moment,)).fetchall()
+                for tx_id, user_id, cents, description, timestamp in conn.execute(SELECT_TRANSACTIONS_UNTIL, (moment,)):
+                    user_transactions.setdefault(user_id, []).append(SpendingRecord(
+                        tx_id, user_id, cents, description, to_micros(datetime.fromisoformat(timestamp))
+                    ))
+                settlements = [
+                    SettlementRecord(settlement_id, from_user_id, to_user_id, cents, to_micros(datetime.fromisoformat(timestamp)))
+                    for settlement_id, from_user_id, to_user_id, cents, timestamp in conn.execute(SELECT_SETTLEMENTS_UNTIL, (moment,))
+                ]
+            finally:
+                conn.execute("COMMIT")
+        
+        wallet_cents = {user_id: cents for user_id, (_, cents) in wallets.items()}
+        for payer_id, cents in paid:
+            wallet_cents[payer_id] = wallet_cents.get(payer_id, 0) + cents
+        for debtor_id, creditor_id, cents in shares:
+            debts[(debtor_id, creditor_id)] = debts.get((debtor_id, creditor_id), 0) - cents
+            debts[(creditor_id, debtor_id)] = debts.get((creditor_id, debtor_id), 0) + cents
+        for from_user_id, to_user_id, cents in settled:
+            wallet_cents[from_user_id] = wallet_cents.get(from_user_id, 0) + cents
+            wallet_cents[to_user_id] = wallet_cents.get(to_user_id, 0) - cents
+            debts[(from_user_id, to_user_id)] = debts.get((from_user_id, to_user_id), 0) + cents
+            debts[(to_user_id, from_user_id)] = debts.get((to_user_id, from_user_id), 0) - cents
+        users = [UserRecord(user_id, name, wallet_cents[user_id]) for user_id, (name, _) in wallets.items()]
+        return LedgerView(to_micros(as_of), users, debts, user_transactions, settlements)
+
+    def get_expense_stats(self) -> RunningStats:
+        """Get running aggregates over group expense totals"""
+        return self._stats("expenses")
+
+    def get_settlement_stats(self) -> RunningStats:
+        """Get running aggregates over settlement amounts"""
+        return self._stats("settlements")
+
+    def _columns(self, statement: str) -> Columns:
+        columns = ColumnLog()
+        with self.pool.connection() as conn:
+            for timestamp_us, cents, user_id in conn.execute(statement):
+                columns.append(timestamp_us, cents, user_id)
+        return columns.copy()
+
+    def get_expense_columns(self) -> Columns:
+        """Get timestamp, total and payer columns of all group expenses"""
+        return self._columns(SELECT_EXPENSE_COLUMNS)
+
+    def get_spending_columns(self) -> Columns:
+        """Get timestamp, amount and user columns of all spending records"""
+        return self._columns(SELECT_SPENDING_COLUMNS)
+
+    def get_sizes(self) -> Dict[str, int]:
+        """Get record counts of the ledger's collections"""
+        with self.pool.connection() as conn:
+            return dict(zip(SIZE_NAMES, conn.execute(SELECT_SIZES).fetchone()))
+
+    def get_all_group_expenses(self) -> List[GroupExpense]:
+        """Get all group expenses"""
+        with self.pool.connection() as conn:
+            return [self._expense(row) for row in conn.execute(SELECT_EXPENSES)]
+
+    def get_group_expense_at(self, position: int) -> Optional[GroupExpense]:
+        """Get the group expense at a position yielded by iter_group_expenses"""
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_EXPENSE_AT, (position,)).fetchone()
+        return self._expense(row) if row else None
+
+    def iter_group_expenses(self, start: Optional[int] = None, newest_first: bool = False,
+                            batch_size: int = 500) -> Iterator[Tuple[int, GroupExpense]]:
+        """Yield (position, expense) pairs in keyset-paginated batches"""
+        if newest_first:
+            statement, position, step = SELECT_EXPENSES_BEFORE, (2 ** 63 - 1 if start is None else start), -1
+        else:
+            statement, position, step = SELECT_EXPENSES_FROM, (0 if start is None else start), 1
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(statement, (position, batch_size)).fetchall()
+            for row in rows:
+                yield row[0], self._expense(row)
+            if len(rows) < batch_size:
+                return
+            position = rows[-1][0] + step
+
+    def search_group_expenses(self, query: str, after: Optional[SearchPosition] = None,
+                              batch_size: int = 100) -> Iterator[Tuple[SearchPosition, GroupExpense]]:
+        """Yield group expenses whose description has every query word (or a word starting with it), best first"""
+        terms = query_terms(query)
+        words = " AND ".join(f'"{term}"' for term in terms)
+        prefixes = " AND ".join(f'"{term}"*' for term in terms)
+        # Whole-word matches first, then the remaining prefix matches; newest first within each
+        tiers = ((WORD_MATCH, words), (PREFIX_MATCH, f"({prefixes}) NOT ({words})"))
+        for tier, expression in tiers:
+            if after is not None and tier < after[0]:
+                continue
+            position = after[1] if after is not None and tier == after[0] else 2 ** 63 - 1
+            while True:
+                with self.pool.connection() as conn:
+                    rows = conn.execute(SEARCH_EXPENSES, (expression, position, batch_size)).fetchall()
+                for row in rows:
+                    yield (tier, row[0]), self._expense(row)
+                if len(rows) < batch_size:
+                    break
+                position = rows[-1][0]
+
+    def get_all_transactions(self) -> List[Transaction]:
+        """Get all individual spending records"""
+        with self.pool.connection() as conn:
+            return [self._transaction(row) for row in conn.execute(SELECT_TRANSACTIONS)]
+
+    def _iter_rows(self, statement: str, batch_size: int) -> Iterator[Tuple]:
+        """Yield rows (without their leading seq) in keyset-paginated batches"""
+        seq = 0
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(statement, (seq, batch_size)).fetchall()
+            for row in rows:
+                yield row[1:]
+            if len(rows) < batch_size:
+                return
+            seq = rows[-1][0]
+
+    def iter_transactions(self, batch_size: int = 1000) -> Iterator[Transaction]:
+        """Yield every spending record, oldest first, in keyset-paginated batches"""
+        for row in self._iter_rows(SELECT_TRANSACTIONS_FROM, batch_size):
+            yield self._transaction(row)
+
+    def iter_settlements(self, batch_size: int = 1000) -> Iterator[Settlement]:
+        """Yield every settlement, oldest first, in keyset-paginated batches"""
+        for row in self._iter_rows(SELECT_SETTLEMENTS_FROM, batch_size):
+            yield self._settlement(row)
+
+    def get_all_settlements(self) -> List[Settlement]:
+        """Get all settlements"""
+        with self.pool.connection() as conn:
+            return [self._settlement(row) for row in conn.execute(SELECT_SETTLEMENTS)]
+
+    def _clear(self, conn: sqlite3.Connection) -> None:
+        conn.execute(CLEAR_SEARCH)
+        for table in ("users", "group_expenses", "expense_shares", "transactions", "settlements", "balances", "ledger_stats"):
+            conn.execute(f"DELETE FROM {table}")
+
+    def close(self) -> None:
+        """Close all pooled connections and the lock file"""
+        self.pool.close()
+        os.close(self._lock_fd)
+
+    @locked
+    def reset_users(self, user_a_amount: Decimal = Decimal("500.00"), user_b_amount: Decimal = Decimal("500.00")) -> None:
+        """Reset users with individual wallet amounts (for testing purposes)"""
+        with self._write() as conn:
+            self._clear(conn)
+            conn.execute(INSERT_USER, (str(uuid4()), "User A", to_cents(user_a_amount), 0))
+            conn.execute(INSERT_USER, (str(uuid4()), "User B", to_cents(user_b_amount), 0))
@@ -0,0 +1,66 @@
+"""The balance table agrees with a full scan of the history"""
+
+import random
+from decimal import Decimal
+from itertools import permutations
+
+import pytest
+
+from models.settlement import Settlement
+from models.transaction import GroupExpense
+from storage.in_memory_store import SimpleStore
+from storage.sqlite_store import SQLiteStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = SimpleStore()
+    else:
+        store = SQLiteStore(str(tmp_path / "ledger.db"))
+    yield store
+    store.close()
+
+
+def assert_table_matches_scan(store, user_ids):
+    for from_user_id, to_user_id in permutations(user_ids, 2):
+        assert store.get_amount_owed(from_user_id, to_user_id) == store.scan_amount_owed(from_user_id, to_user_id)
+
+
+def test_balance_table_matches_scan(store):
+    rng = random.Random(7)
+    store.add_user("User C", Decimal("5000.00"))
+    store.add_user("User D", Decimal("5000.00"))
+    user_ids = [user.id for user in store.get_all_users()]
+
+    for step in range(300):
+        if rng.random() < 0.7:
+            participant_ids = rng.sample(user_ids, rng.randint(1, len(user_ids)))
+            amount = Decimal(rng.randint(1, 10_000)) / 100
+            store.add_group_expense(GroupExpense.create(rng.choice(user_ids), amount, f"Bill {step}", participant_ids))
+        else:
+            from_user_id, to_user_id = rng.sample(user_ids, 2)
+            owed = store.get_amount_owed(from_user_id, to_user_id)
+            if owed > 0:
+                amount = Decimal(rng.randint(1, int(owed * 100))) / 100
+                store.add_settlement(Settlement.create(from_user_id, to_user_id, amount))
+        if step % 25 == 0:
+            assert_table_matches_scan(store, user_ids)
+
+    assert_table_matches_scan(store, user_ids)
+    assert sum(store.get_net_balances().values()) == 0
+
+
+def test_rebuild_balances_reproduces_table():
+    store = SimpleStore()
+    user_a, user_b = store.get_all_users()
+    user_c = store.add_user("User C")
+    store.add_group_expense(GroupExpense.create(user_a.id, Decimal("100.00"), "Dinner", [user_a.id, user_b.id, user_c.id]))
+    store.add_group_expense(GroupExpense.create(user_b.id, Decimal("10.01"), "Coffee", [user_a.id, user_b.id]))
+    store.add_settlement(Settlement.create(user_c.id, user_a.id, Decimal("33.33")))
+    debts = sorted(store.get_outstanding_debts())
+
+    store.rebuild_balances()
+
+    assert sorted(store.get_outstanding_debts()) == debts
+    assert_table_matches_scan(store, [user_a.id, user_b.id, user_c.id])
@@ -0,0 +1,123 @@
+"""Ledger invariants hold while several threads write through the API at once"""
+
+import os
+import random
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from itertools import permutations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import create_app, create_store
+from models.transaction import GroupExpense
+from storage.mapped_store import MappedStore
+
+WRITERS = 8
+REQUESTS_PER_WRITER = 40
+
+
+@pytest.fixture(params=["memory", "journal", "sqlite", "mmap"])
+def store(request, tmp_path):
+    store = create_store(request.param, str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_invariants_hold_under_threaded_writers(store):
+    client = TestClient(create_app(store=store))
+    client.post("/users", json={"name": "User C", "wallet_balance": 500.00})
+    users = client.get("/users").json()["users"]
+    user_ids = [user["id"] for user in users]
+    opening = {user["id"]: Decimal(user["wallet_balance"]) for user in users}
+
+    paid = defaultdict(Decimal)
+    transferred = defaultdict(Decimal)
+    expense_count = 0
+    tally_lock = threading.Lock()
+    errors = []
+
+    def write(seed):
+        nonlocal expense_count
+        rng = random.Random(seed)
+        for _ in range(REQUESTS_PER_WRITER):
+            if rng.random() < 0.6:
+                payer_id = rng.choice(user_ids)
+                amount = Decimal(rng.randint(1, 5_000)) / 100
+                response = client.post("/transactions", json={
+                    "payer_id": payer_id, "total_amount": str(amount), "description": "Groceries",
+                    "participant_ids": rng.sample(user_ids, rng.randint(1, len(user_ids)))
+                })
+                if response.status_code == 200:
+                    with tally_lock:
+                        paid[payer_id] += amount
+                        expense_count += 1
+            else:
+                from_user_id, to_user_id = rng.sample(user_ids, 2)
+                amount = Decimal(rng.randint(1, 2_000)) / 100
+                response = client.post("/settle", json={
+                    "from_user_id": from_user_id, "to_user_id": to_user_id, "amount": str(amount)
+                })
+                if response.status_code == 200:
+                    with tally_lock:
+                        transferred[from_user_id] -= amount
+                        transferred[to_user_id] += amount
+            if response.status_code not in (200, 400):
+                errors.append(response.text)
+
+    threads = [threading.Thread(target=write, args=(seed,)) for seed in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert expense_count > 0 and transferred
+    assert len(store.get_all_group_expenses()) == expense_count
+    for user in store.get_all_users():
+        # Every accepted bill and settlement moved money exactly once, and no wallet was overdrawn
+        assert user.wallet_balance == opening[user.id] - paid[user.id] + transferred[user.id]
+        assert user.wallet_balance >= 0
+    assert sum(store.get_net_balances().values()) == 0
+    for from_user_id, to_user_id in permutations(user_ids, 2):
+        owed = store.get_amount_owed(from_user_id, to_user_id)
+        assert owed == store.scan_amount_owed(from_user_id, to_user_id)
+        assert owed == 0 or store.get_amount_owed(to_user_id, from_user_id) == 0
+
+
+def test_sqlite_workers_share_the_write_lock(tmp_path):
+    # Two stores on one database stand in for two workers checking a wallet before writing
+    first, second = (create_store("sqlite", str(tmp_path)) for _ in range(2))
+    taken = threading.Event()
+
+    def write():
+        with second.write_lock:
+            taken.set()
+
+    with first.write_lock:
+        thread = threading.Thread(target=write)
+        thread.start()
+        assert not taken.wait(0.2)
+    assert taken.wait(5)
+    thread.join()
+    first.close()
+    second.close()
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc to count mappings")
+def test_mapped_workers_unmap_the_ledger_as_it_grows(tmp_path):
+    path = str(tmp_path / "ledger.map")
+    # Room for a few records, so the file grows (and is remapped by both workers) many times
+    writer, reader = MappedStore(path, initial_records=2), MappedStore(path, initial_records=2)
+    user_ids = [user.id for user in writer.get_all_users()]
+    for _ in range(12):
+        writer.add_group_expenses([GroupExpense.create(user_ids[0], Decimal("1.00"), "Coffee", user_ids)] * 50)
+        assert len(reader.get_all_group_expenses()) == len(writer.get_all_group_expenses())
+
+    with open("/proc/self/maps") as maps:
+        mappings = sum(line.rstrip().endswith(path) for line in maps)
+    # A header and a whole-file mapping per worker
+    assert mappings == 4
+    writer.close()
+    reader.close()
@@ -0,0 +1,178 @@
+"""Every storage engine ends in the same state after the same operations"""
+
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import permutations
+
+from main import create_store
+from models.settlement import Settlement
+from models.transaction import GroupExpense
+from storage.journaled_store import JournaledStore
+
+ENGINES = ["memory", "journal", "sqlite", "mmap"]
+
+
+def apply_operations(store):
+    rng = random.Random(11)
+    store.add_user("User C", Decimal("800.00"))
+    ids = {user.name: user.id for user in store.get_all_users()}
+    names = sorted(ids)
+    for step in range(120):
+        payer = rng.choice(names)
+        participants = rng.sample(names, rng.randint(1, len(names)))
+        amount = Decimal(rng.randint(1, 3_000)) / 100
+        store.add_group_expense(GroupExpense.create(ids[payer], amount, f"Bill {step}", [ids[name] for name in participants]))
+        if step % 10 == 9:
+            store.add_group_expenses([
+                GroupExpense.create(ids[name], Decimal("10.01"), "Round", [ids[other] for other in names])
+                for name in names
+            ])
+        from_name, to_name = rng.sample(names, 2)
+        owed = store.get_amount_owed(ids[from_name], ids[to_name])
+        if owed > 0 and rng.random() < 0.3:
+            store.add_settlement(Settlement.create(ids[from_name], ids[to_name], min(owed, Decimal("5.00"))))
+
+
+def ledger_state(store):
+    """The ledger by member name, since every engine generates its own user IDs"""
+    users = {user.id: user for user in store.get_all_users()}
+    names = {user_id: user.name for user_id, user in users.items()}
+    expenses = store.get_all_group_expenses()
+    return {
+        "wallets": {user.name: user.wallet_balance for user in users.values()},
+        "owed": {(names[a], names[b]): store.get_amount_owed(a, b) for a, b in permutations(users, 2)},
+        "net": {user.name: store.get_net_balance(user.id) for user in users.values()},
+        "spent": {user.name: store.get_user_spending_total(user.id) for user in users.values()},
+        "expenses": [(names[e.payer_id], e.total_amount, e.description, e.is_settled) for e in expenses],
+        "settlements": [(names[s.from_user_id], names[s.to_user_id], s.amount) for s in store.get_all_settlements()],
+    }
+
+
+def test_engines_produce_equal_state(tmp_path):
+    states = {}
+    for engine in ENGINES:
+        store = create_store(engine, str(tmp_path / engine))
+        try:
+            apply_operations(store)
+            states[engine] = ledger_state(store)
+        finally:
+            store.close()
+
+    assert states["memory"]["settlements"]
+    for engine in ENGINES[1:]:
+        assert states[engine] == states["memory"], engine
+
+
+def test_engines_agree_on_back_dated_bills(tmp_path):
+    views = {}
+    for engine in ENGINES:
+        store = create_store(engine, str(tmp_path / engine))
+        try:
+            ids = {user.name: user.id for user in store.get_all_users()}
+            now = datetime.now()
+            store.add_group_expense(GroupExpense.create(ids["User A"], Decimal("30.00"), "Dinner",
+                                                        [ids["User A"], ids["User B"]]))
+            # Recorded after the dinner but dated days before it, like a backfilled recurring bill
+            for days in (3, 2, 1):
+                rent = GroupExpense.create(ids["User A"], Decimal("100.00"), "Rent", [ids["User A"], ids["User B"]])
+                rent.timestamp = now - timedelta(days=days)
+                store.add_group_expense(rent)
+            view = store.get_ledger_at(now - timedelta(days=1, hours=12))
+            names = {user_id: name for name, user_id in ids.items()}
+            # Members joined when the store was created, so only debts and spending are compared
+            views[engine] = (
+                sorted((names[a], names[b], amount) for a, b, amount in view.get_outstanding_debts()),
+                {name: view.get_user_spending_total(user_id) for name, user_id in ids.items()},
+            )
+        finally:
+            store.close()
+
+    debts, spent = views["memory"]
+    assert debts == [("User B", "User A", Decimal("100.00"))]
+    assert spent == {"User A": Decimal("100.00"), "User B": Decimal("0.00")}
+    for engine in ENGINES[1:]:
+        assert views[engine] == views["memory"], engine
+
+
+
+def test_settlements_take_the_oldest_shares_that_fit(tmp_path):
+    rng = random.Random(5)
+    shares = [rng.choice([150, 400, 700, 2_500]) for _ in range(80)]
+    payments = [rng.choice([100, 300, 600, 1_000, 3_000]) for _ in range(40)]
+    # Greedy reference: each payment settles the oldest unsettled shares it still covers
+    unsettled = list(range(len(shares)))
+    for cents in payments:
+        for index in list(unsettled):
+            if 0 < shares[index] <= cents:
+                unsettled.remove(index)
+                cents -= shares[index]
+    expected = [index not in unsettled for index in range(len(shares))]
+    assert any(expected) and not all(expected)
+
+    for engine in ENGINES:
+        store = create_store(engine, str(tmp_path / engine))
+        try:
+            ids = {user.name: user.id for user in store.get_all_users()}
+            store.add_group_expenses([
+                GroupExpense.create(ids["User A"], Decimal(2 * cents) / 100, f"Bill {index}", [ids["User A"], ids["User B"]])
+                for index, cents in enumerate(shares)
+            ])
+            for cents in payments:
+                store.add_settlement(Settlement.create(ids["User B"], ids["User A"], Decimal(cents) / 100))
+            assert [expense.is_settled for expense in store.get_all_group_expenses()] == expected, engine
+            settled_cents = sum(cents for cents, settled in zip(shares, expected) if settled)
+            assert store.get_user_spending_total(ids["User B"]) == Decimal(settled_cents) / 100, engine
+        finally:
+            store.close()
+
+def test_persistent_engines_reload_equal_state(tmp_path):
+    for engine in ENGINES[1:]:
+        store = create_store(engine, str(tmp_path / engine))
+        try:
+            apply_operations(store)
+            state = ledger_state(store)
+        finally:
+            store.close()
+
+        reopened = create_store(engine, str(tmp_path / engine))
+        try:
+            assert ledger_state(reopened) == state, engine
+        finally:
+            reopened.close()
+
+
+def test_journal_snapshot_keeps_point_in_time_answers(tmp_path):
+    def views(store, moments):
+        names = {user.id: user.name for user in store.get_all_users()}
+        result = []
+        for moment in moments:
+            view = store.get_ledger_at(moment)
+            result.append((
+                sorted((user.name, user.wallet_balance) for user in view.get_all_users()),
+                sorted((names[a], names[b], amount) for a, b, amount in view.get_outstanding_debts()),
+                {user_id: view.get_user_spending_total(user_id) for user_id in names},
+            ))
+        return result
+
+    started = datetime.now()
+    # Every event is folded into a snapshot, so reopening restores the history from it alone
+    store = JournaledStore(str(tmp_path), snapshot_every=1)
+    ids = {user.name: user.id for user in store.get_all_users()}
+    store.add_group_expense(GroupExpense.create(ids["User A"], Decimal("30.00"), "Dinner", [ids["User A"], ids["User B"]]))
+    ids["User C"] = store.add_user("User C", Decimal("80.00")).id
+    rent = GroupExpense.create(ids["User C"], Decimal("90.00"), "Rent", list(ids.values()))
+    rent.timestamp = started - timedelta(days=2)
+    store.add_group_expense(rent)
+    store.add_settlement(Settlement.create(ids["User B"], ids["User A"], Decimal("15.00")))
+    moments = [started - timedelta(days=3), started - timedelta(days=1), datetime.now() + timedelta(seconds=1)]
+    before = views(store, moments)
+    store.close()
+
+    reopened = JournaledStore(str(tmp_path), snapshot_every=1)
+    try:
+        assert views(reopened, moments) == before
+        # Nobody had joined a day before the store was created, though the rent is dated then
+        assert before[1][0] == []
+    finally:
+        reopened.close()
@@ -0,0 +1,54 @@
+"""Point-in-time state from the checkpointed history matches a fold over the events"""
+
+import random
+
+from storage.history import BalanceHistory, BalanceState
+from storage.records import ExpenseRecord, SettlementRecord, UserRecord
+
+USER_IDS = ["a", "b", "c"]
+
+
+def random_event(rng, number, timestamp_us):
+    if rng.random() < 0.6:
+        participant_ids = rng.sample(USER_IDS, rng.randint(1, len(USER_IDS)))
+        return ExpenseRecord(f"e{number}", rng.choice(USER_IDS), 300, 100, "Bill", timestamp_us, False,
+                             participant_ids, [])
+    from_user_id, to_user_id = rng.sample(USER_IDS, 2)
+    return SettlementRecord(f"s{number}", from_user_id, to_user_id, rng.randint(1, 200), timestamp_us)
+
+
+def folded(events, timestamp_us):
+    state = BalanceState()
+    for event_time, event in events:
+        if event_time <= timestamp_us:
+            state.apply(event)
+    return state
+
+
+def assert_same_state(state, expected):
+    assert state.members == expected.members
+    assert {key: cents for key, cents in state.wallets.items() if cents} == \
+        {key: cents for key, cents in expected.wallets.items() if cents}
+    assert {key: cents for key, cents in state.debts.items() if cents} == \
+        {key: cents for key, cents in expected.debts.items() if cents}
+
+
+def test_back_dated_events_are_filed_at_their_time():
+    rng = random.Random(5)
+    history = BalanceHistory(checkpoint_every=4)
+    events = []
+    for user_id in USER_IDS:
+        user = UserRecord(user_id, user_id.upper(), 10_000)
+        history.append(0, user)
+        events.append((0, user))
+    now = 1_000
+    for number in range(200):
+        now += rng.randint(1, 10)
+        # A fifth of the events are back-dated, like backfilled recurring bills
+        timestamp_us = now - rng.randint(1, 500) if rng.random() < 0.2 else now
+        event = random_event(rng, number, timestamp_us)
+        history.append(timestamp_us, event)
+        events.append((timestamp_us, event))
+
+    for timestamp_us in [0, 500, 999] + sorted(rng.sample(range(1_000, now + 10), 60)):
+        assert_same_state(history.state_at(timestamp_us), folded(events, timestamp_us))
@@ -0,0 +1,56 @@
+"""Idempotency keys replay equivalent requests once and forget attempts that fail"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+from main import create_app
+from routers.idempotency import IdempotencyCache
+from storage.in_memory_store import SimpleStore
+
+
+def test_reformatted_body_replays_the_stored_response():
+    store = SimpleStore()
+    client = TestClient(create_app(store=store))
+    user_ids = [user.id for user in store.get_all_users()]
+    payload = {"payer_id": user_ids[0], "total_amount": "12.00", "description": "Lunch", "participant_ids": user_ids}
+    headers = {"Idempotency-Key": "lunch", "Content-Type": "application/json"}
+
+    first = client.post("/transactions", content=json.dumps(payload), headers=headers)
+    # Same request with its keys reordered and spaced out
+    retry = client.post("/transactions", content=json.dumps(dict(reversed(payload.items())), indent=2), headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(store.get_all_group_expenses()) == 1
+
+    changed = client.post("/transactions", json={**payload, "total_amount": "13.00"}, headers=headers)
+    assert changed.status_code == 400
+
+
+def test_failed_attempt_is_forgotten_and_wakes_its_duplicates():
+    cache = IdempotencyCache()
+    calls = []
+
+    async def crash():
+        calls.append("crash")
+        await asyncio.sleep(0.01)
+        raise RuntimeError("handler crashed")
+
+    async def succeed():
+        calls.append("succeed")
+        return Response(content=b"done")
+
+    async def main():
+        first = asyncio.ensure_future(cache.run("/settle", "key", b"{}", crash))
+        await asyncio.sleep(0)
+        # A duplicate arriving mid-flight waits for the first attempt, then runs itself
+        duplicate = asyncio.ensure_future(cache.run("/settle", "key", b"{}", succeed))
+        with pytest.raises(RuntimeError):
+            await first
+        assert (await duplicate).body == b"done"
+
+    asyncio.run(main())
+    assert calls == ["crash", "succeed"]
@@ -0,0 +1,82 @@
+"""Recurring bills are recorded once per run, dated when they fell due"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from main import create_app
+from models.recurring import RecurringExpense
+from models.transaction import GroupExpense
+from storage.in_memory_store import SimpleStore
+from storage.recurring import RecurringBook
+
+
+def opener(store):
+    @contextmanager
+    def open_ledger(group_id):
+        yield store
+    return open_ledger
+
+
+def daily_rent(store, days_ago):
+    user_ids = [user.id for user in store.get_all_users()]
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+    return RecurringExpense.create(None, user_ids[0], Decimal("10.00"), "Rent", user_ids, "0 12 * * *", start)
+
+
+def test_backfilled_runs_are_dated_when_due(tmp_path):
+    store = SimpleStore()
+    book = RecurringBook(str(tmp_path / "recurring.json"))
+    store.add_group_expense(GroupExpense.create(store.get_all_users()[0].id, Decimal("5.00"), "Coffee",
+                                                [user.id for user in store.get_all_users()]))
+    definition = daily_rent(store, 3)
+    book.add(definition, store)
+
+    book.materialize(opener(store))
+
+    bills = [expense for _, expense in store.iter_group_expenses() if expense.description == "Rent"]
+    assert len(bills) >= 3
+    assert [bill.timestamp for bill in bills] == sorted(bill.timestamp for bill in bills)
+    assert all(bill.timestamp.hour == 12 and bill.timestamp.minute == 0 for bill in bills)
+
+
+def test_rolled_back_book_does_not_record_runs_twice_after_a_reset(tmp_path):
+    store = SimpleStore()
+    for number in range(10):
+        store.add_group_expense(GroupExpense.create(store.get_all_users()[0].id, Decimal("1.00"), f"Old {number}",
+                                                    [user.id for user in store.get_all_users()]))
+    book = RecurringBook(str(tmp_path / "recurring.json"))
+    book.add(daily_rent(store, 0), store)
+    stale_cursor = book.cursors[""]
+
+    # The ledger is reset: positions restart at 0
+    store.reset_users()
+    definition = daily_rent(store, 3)
+    book.add(definition, store)
+    first_run = definition.next_run
+    recorded = book.materialize(opener(store))
+    assert recorded >= 3
+
+    # A crash rolls the book back to before that pass, cursor included
+    book.definitions[definition.id].next_run = first_run
+    book.definitions[definition.id].occurrences = 0
+    book.cursors[""] = stale_cursor
+    book._rebuild_heap()
+    book.materialize(opener(store))
+
+    ids = [expense.id for _, expense in store.iter_group_expenses()]
+    assert len(ids) == len(set(ids)) == recorded
+
+
+def test_reset_forgets_the_ledger_cursor():
+    store = SimpleStore()
+    app = create_app(store=store)
+    client = TestClient(app)
+    app.state.scheduler.book.add(daily_rent(store, 0), store)
+    assert "" in app.state.scheduler.book.cursors
+
+    assert client.post("/reset").status_code == 200
+
+    assert "" not in app.state.scheduler.book.cursors
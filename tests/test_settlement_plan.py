@@ -0,0 +1,90 @@
+"""Carrying out the settlement plan clears every debt"""
+
+import random
+from decimal import Decimal
+from itertools import permutations
+
+from fastapi.testclient import TestClient
+
+from main import create_app
+from storage.in_memory_store import SimpleStore
+
+
+def make_client():
+    store = SimpleStore()
+    client = TestClient(create_app(store=store))
+    client.post("/users", json={"name": "User C", "wallet_balance": 500.00})
+    client.post("/users", json={"name": "User D", "wallet_balance": 500.00})
+    return client, store, {user["name"]: user["id"] for user in client.get("/users").json()["users"]}
+
+
+def wallets(client):
+    return {user["id"]: Decimal(user["wallet_balance"]) for user in client.get("/users").json()["users"]}
+
+
+def assert_all_settled(client, store, user_ids):
+    assert client.get("/settle/status").json()["debt_summary"] == {}
+    assert client.get("/settle/plan").json()["transfers"] == []
+    for user in client.get("/users").json()["users"]:
+        assert Decimal(user["net_balance"]) == 0
+    for from_user_id, to_user_id in permutations(user_ids, 2):
+        assert store.get_amount_owed(from_user_id, to_user_id) == 0
+
+
+def apply_plan(client):
+    """POST /settle/plan, checking each wallet moved by exactly its planned transfers"""
+    before = wallets(client)
+    planned = client.get("/settle/plan").json()
+    response = client.post("/settle/plan")
+    assert response.status_code == 200
+    assert response.json() == planned
+    expected = dict(before)
+    for transfer in planned["transfers"]:
+        expected[transfer["from_user_id"]] -= Decimal(transfer["amount"])
+        expected[transfer["to_user_id"]] += Decimal(transfer["amount"])
+    assert wallets(client) == expected
+
+
+def test_plan_through_a_member_without_direct_debt():
+    client, store, ids = make_client()
+    client.post("/transactions", json={"payer_id": ids["User A"], "total_amount": 20.00, "description": "Lunch",
+                                       "participant_ids": [ids["User A"], ids["User B"]]})
+    client.post("/transactions", json={"payer_id": ids["User B"], "total_amount": 20.00, "description": "Taxi",
+                                       "participant_ids": [ids["User B"], ids["User C"]]})
+    plan = client.get("/settle/plan").json()["transfers"]
+    assert [(t["from_user"], t["to_user"], t["amount"]) for t in plan] == [("User C", "User A", "10.00")]
+
+    apply_plan(client)
+
+    assert_all_settled(client, store, list(ids.values()))
+
+
+def test_applying_the_plan_clears_random_debts():
+    client, store, ids = make_client()
+    user_ids = list(ids.values())
+    rng = random.Random(3)
+    for step in range(60):
+        client.post("/transactions", json={
+            "payer_id": rng.choice(user_ids), "total_amount": str(Decimal(rng.randint(1, 1_500)) / 100),
+            "description": f"Bill {step}", "participant_ids": rng.sample(user_ids, rng.randint(1, len(user_ids)))
+        })
+
+    apply_plan(client)
+
+    assert_all_settled(client, store, user_ids)
+
+
+def test_plan_needing_more_than_a_wallet_is_rejected():
+    client, store, ids = make_client()
+    client.post("/transactions", json={"payer_id": ids["User A"], "total_amount": 400.00, "description": "Flights",
+                                       "participant_ids": [ids["User A"], ids["User B"]]})
+    client.post("/settle", json={"from_user_id": ids["User B"], "to_user_id": ids["User A"], "amount": 1.00})
+    client.post("/transactions", json={"payer_id": ids["User B"], "total_amount": 499.00, "description": "Hotel",
+                                       "participant_ids": [ids["User B"]]})
+    before = wallets(client)
+
+    response = client.post("/settle/plan")
+
+    assert response.status_code == 400
+    assert "Insufficient funds for User B" in response.json()["detail"]
+    assert wallets(client) == before